@@ -0,0 +1,490 @@
+### 헤드리스 HTTP API 서버 (ASGI)
+# 로드밸런서 뒤에서 대시보드 등이 호출할 수 있도록 컴파일된 그래프를 HTTP로 제공합니다.
+# - POST /v1/query         {"question": ..., "thread_id": (선택)} → 분석 결과 JSON (대화를 이어갈 thread_id 포함)
+# - POST /v1/query/stream  같은 입력 → 진행 메시지 / 보고서 토큰 / 최종 결과를 SSE(text/event-stream)로 전송
+# - GET  /healthz          실행 중 / 대기 중 요청 수
+# - 같은 질문이 동시에 들어오면 그래프 실행 하나를 함께 구독 (singleflight, 워커 프로세스 단위)
+#   thread_id를 지정한 후속 질문은 대화 상태에 따라 답이 달라지므로 합치지 않고,
+#   합류한 요청에는 결과 대화 상태를 복사한 각자의 thread_id를 발급
+# - thread_id는 서버가 발급하고 클라이언트(X-Client-Id / 접속 IP)에 HMAC 서명으로 묶음. 다른 클라이언트의 id는 403
+# - 같은 thread_id의 요청은 워커 안에서 순서대로 실행 (하나의 체크포인트를 동시에 갱신하지 않도록)
+# - 클라이언트별 동시 요청 수(429)와 워커별 실행 수 + 대기열(503) 상한을 넘으면 대기시키지 않고 바로 거절
+#
+# 워커 프로세스마다 에이전트(체크포인트 저장소, 커넥션 풀)를 따로 만듭니다.
+# 여러 워커에서 thread_id로 대화를 이어가려면 CHECKPOINT_BACKEND=sqlite 로 체크포인트 파일을 공유하고,
+# API_THREAD_SECRET을 모든 워커에 같은 값으로 설정하세요. (없으면 워커마다 임의 키를 만들어 다른 워커의 id를 거절)
+#
+# 사용법:
+#   python api_server.py --host 0.0.0.0 --port 8000 --workers 4
+#   curl -N -X POST localhost:8000/v1/query/stream -H 'Content-Type: application/json' \
+#        -d '{"question": "2024년 1분기 매출 상위 5개 상권은?"}'
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import uuid
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage
+
+from batch_runner import result_record
+from query_memo import normalize_question
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+### 1. 동일 질문 실행 공유 (singleflight)
+
+class Flight:
+    """진행 중인 그래프 실행 하나와 그 이벤트 기록
+    늦게 합류한 구독자도 처음부터 같은 이벤트를 받도록 실행이 끝날 때까지 이벤트를 보관합니다."""
+
+    def __init__(self, key: Optional[str], thread_id: str):
+        self.key = key
+        self.thread_id = thread_id
+        self.events: List[Tuple[str, Any]] = []
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, kind: str, payload: Any) -> None:
+        async with self._changed:
+            self.events.append((kind, payload))
+            self._changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def subscribe(self, heartbeat: float) -> AsyncIterator[Tuple[str, Any]]:
+        """이벤트를 순서대로 내보냅니다. heartbeat초 동안 새 이벤트가 없으면 ("ping", None)을 내보냅니다."""
+        index = 0
+        while True:
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(
+                        self._changed.wait_for(lambda: index < len(self.events) or self.done), timeout=heartbeat,
+                    )
+                    batch, done = self.events[index:], self.done
+            except asyncio.TimeoutError:
+                yield "ping", None
+                continue
+            index += len(batch)
+            for event in batch:
+                yield event
+            if done:
+                return
+
+
+class SingleFlight:
+    """같은 키의 동시 요청이 하나의 실행을 공유하게 합니다."""
+
+    def __init__(self):
+        self._flights: Dict[str, Flight] = {}
+
+    def attach(self, key: Optional[str]) -> Optional[Flight]:
+        """같은 키로 진행 중인 실행이 있으면 구독자로 합류합니다."""
+        flight = self._flights.get(key) if key else None
+        if flight is not None:
+            flight.subscribers += 1
+        return flight
+
+    def start(self, key: Optional[str], thread_id: str, run: Callable[[Flight], Awaitable[None]]) -> Flight:
+        """새 실행을 시작합니다. key가 None이면 다른 요청과 공유하지 않습니다."""
+        flight = Flight(key, thread_id)
+        flight.subscribers = 1
+        if key:
+            self._flights[key] = flight
+
+        async def runner() -> None:
+            try:
+                await run(flight)
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.exception("그래프 실행 오류")
+                await flight.publish("error", {"status": 500, "error": f"{type(e).__name__}: {e}"})
+            finally:
+                self._forget(flight)
+                await flight.finish()
+
+        flight.task = asyncio.create_task(runner())
+        return flight
+
+    def leave(self, flight: Flight) -> None:
+        """구독자가 떠날 때 호출합니다. 남은 구독자가 없으면 실행을 취소합니다."""
+        flight.subscribers -= 1
+        if flight.subscribers <= 0 and not flight.done and flight.task is not None:
+            # 취소 중인 실행에 새 요청이 합류하지 않도록 먼저 목록에서 뺌
+            self._forget(flight)
+            flight.task.cancel()
+
+    def _forget(self, flight: Flight) -> None:
+        if flight.key and self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+
+### 2. 대화(thread_id) 발급 / 직렬화
+
+_thread_secret = os.environ.get("API_THREAD_SECRET", "").encode() or secrets.token_bytes(32)
+
+
+def _thread_signature(client: str, nonce: str) -> str:
+    return hmac.new(_thread_secret, f"{client}\n{nonce}".encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def issue_thread_id(client: str) -> str:
+    """client에 묶인 새 thread_id를 발급합니다."""
+    nonce = f"api-{uuid.uuid4().hex}"
+    return f"{nonce}.{_thread_signature(client, nonce)}"
+
+
+def verify_thread_id(client: str, thread_id: str) -> bool:
+    """이 서버가 client에게 발급한 thread_id인지 확인합니다."""
+    nonce, _, signature = thread_id.rpartition(".")
+    return bool(nonce) and hmac.compare_digest(signature, _thread_signature(client, nonce))
+
+
+class ThreadLocks:
+    """같은 대화(thread_id)의 그래프 실행을 워커 안에서 하나씩 순서대로 실행합니다."""
+
+    def __init__(self):
+        self._locks: Dict[str, List[Any]] = {}  # thread_id -> [asyncio.Lock, 사용 중 요청 수]
+
+    async def run(self, thread_id: str, work: Callable[[], Awaitable[None]]) -> None:
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await work()
+        finally:
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._locks[thread_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+### 3. 요청 수 제한 / 배압
+
+class AdmissionControl:
+    """클라이언트별 동시 요청 수와 워커별 그래프 실행 수 / 대기열을 제한합니다."""
+
+    def __init__(self, per_client: Optional[int] = None, max_running: Optional[int] = None, max_queued: Optional[int] = None):
+        self.per_client = per_client or int(os.environ.get("API_CLIENT_CONCURRENCY", "4"))
+        self.max_running = max_running or int(os.environ.get("API_MAX_RUNNING", "16"))
+        self.max_queued = max_queued if max_queued is not None else int(os.environ.get("API_MAX_QUEUED", "64"))
+        self._clients: Dict[str, int] = defaultdict(int)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.pending = 0  # 실행 중 + 대기 중 그래프 실행 수
+        self.running = 0
+
+    def enter_client(self, client: str) -> bool:
+        if self._clients[client] >= self.per_client:
+            return False
+        self._clients[client] += 1
+        return True
+
+    def leave_client(self, client: str) -> None:
+        self._clients[client] -= 1
+        if self._clients[client] <= 0:
+            del self._clients[client]
+
+    def reserve(self) -> bool:
+        """새 실행을 대기열에 넣을 수 있으면 자리를 예약합니다."""
+        if self.pending >= self.max_running + self.max_queued:
+            return False
+        self.pending += 1
+        return True
+
+    def release(self) -> None:
+        """reserve()로 예약한 자리를 반납합니다. (실행이 끝났거나 시작 전에 취소되었을 때)"""
+        self.pending -= 1
+
+    async def run(self, work: Callable[[], Awaitable[None]]) -> None:
+        """예약한 자리로 실행 슬롯을 기다렸다가 실행합니다. (예약 반납은 release()에서)"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+        async with self._slots:
+            self.running += 1
+            try:
+                await work()
+            finally:
+                self.running -= 1
+
+
+singleflight = SingleFlight()
+admission = AdmissionControl()
+thread_locks = ThreadLocks()
+_agent = None
+
+
+def get_agent():
+    global _agent
+    if _agent is None:
+        from data_analysis_langgraph import create_agent
+        _agent = create_agent()
+    return _agent
+
+
+async def _execute(flight: Flight, question: str) -> None:
+    """그래프를 실행하며 이벤트를 flight에 기록합니다."""
+    from data_analysis_langgraph import stream_agent
+
+    timeout = float(os.environ.get("AGENT_TIMEOUT_SECONDS", "180"))
+    config = {"configurable": {"thread_id": flight.thread_id}}
+
+    async def stream() -> None:
+        async for kind, payload in stream_agent(get_agent(), {"messages": [HumanMessage(content=question)]}, config):
+            if kind == "final":
+                payload = {"thread_id": flight.thread_id, **result_record(payload), "rows": payload.get("sql_result", [])}
+            await flight.publish(kind, payload)
+
+    try:
+        await asyncio.wait_for(stream(), timeout=timeout)
+    except asyncio.TimeoutError:
+        await flight.publish("error", {"status": 504, "error": f"{timeout:g}초 안에 분석이 끝나지 않아 중단했습니다."})
+
+
+def _start_flight(key: Optional[str], thread_id: str, question: str) -> Optional[Flight]:
+    """실행 자리를 예약하고 새 그래프 실행을 시작합니다. 대기열이 가득 찼으면 None을 반환합니다."""
+    if not admission.reserve():
+        return None
+    flight = singleflight.start(
+        key, thread_id,
+        lambda f: thread_locks.run(f.thread_id, lambda: admission.run(lambda: _execute(f, question))),
+    )
+    # 같은 대화의 앞선 실행을 기다리는 중에 취소되어도 예약한 자리는 반드시 반납
+    flight.task.add_done_callback(lambda _: admission.release())
+    return flight
+
+
+async def _fork_thread(thread_id: str, client: str) -> Optional[str]:
+    """합류한 요청에 줄 새 thread_id를 발급하고, 공유 실행의 대화 상태를 복사해 둡니다."""
+    agent = get_agent()
+    snapshot = await agent.aget_state({"configurable": {"thread_id": thread_id}})
+    if not snapshot.values:
+        return None
+    forked = issue_thread_id(client)
+    await agent.aupdate_state({"configurable": {"thread_id": forked}}, snapshot.values, as_node="generate_report")
+    return forked
+
+
+async def _own_final(payload: Dict[str, Any], flight: Flight, client: str, coalesced: bool) -> Dict[str, Any]:
+    """최종 결과를 이 요청용으로 바꿉니다. 합류한 요청은 원래 요청과 thread_id를 공유하지 않습니다."""
+    if not coalesced:
+        return {**payload, "coalesced": False}
+    try:
+        thread_id = await _fork_thread(flight.thread_id, client)
+    except Exception:
+        logger.exception("대화 상태 복사 실패")
+        thread_id = None
+    return {**payload, "thread_id": thread_id, "coalesced": True}
+
+
+### 4. HTTP (ASGI)
+
+async def _read_json(receive) -> Dict[str, Any] | str:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return "연결이 끊어졌습니다."
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            return "요청 본문이 너무 큽니다."
+        if not message.get("more_body"):
+            break
+    try:
+        payload = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        return f"JSON 형식 오류: {e}"
+    return payload if isinstance(payload, dict) else "JSON 객체가 필요합니다."
+
+
+async def _send_json(send, status: int, payload: Dict[str, Any], headers: Tuple[Tuple[bytes, bytes], ...] = ()) -> None:
+    body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json; charset=utf-8"), (b"content-length", str(len(body)).encode())] + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _client_id(scope) -> str:
+    """X-Client-Id 헤더(게이트웨이가 설정), 없으면 접속 IP"""
+    for name, value in scope.get("headers", []):
+        if name == b"x-client-id" and value:
+            return value.decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+async def _until_disconnect(receive, coro: Awaitable[Any]) -> Tuple[bool, Any]:
+    """coro를 실행하다가 클라이언트 연결이 끊기면 취소합니다. (끊겼는지, 결과)"""
+    async def wait_disconnect() -> None:
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    work = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(wait_disconnect())
+    try:
+        await asyncio.wait({work, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+    if not work.done():
+        work.cancel()
+        try:
+            await work
+        except asyncio.CancelledError:
+            pass
+        return True, None
+    return False, work.result()
+
+
+async def _handle_query(scope, receive, send, streaming: bool) -> None:
+    request = await _read_json(receive)
+    if isinstance(request, str):
+        await _send_json(send, 400, {"error": request})
+        return
+    question = str(request.get("question") or "").strip()
+    if not question:
+        await _send_json(send, 400, {"error": "question 필드가 필요합니다."})
+        return
+    thread_id = request.get("thread_id")
+
+    client = _client_id(scope)
+    if thread_id is not None and (not isinstance(thread_id, str) or not verify_thread_id(client, thread_id)):
+        await _send_json(send, 403, {"error": "이 클라이언트에 발급된 thread_id가 아닙니다. thread_id 없이 새 대화를 시작하세요."})
+        return
+    retry_after = ((b"retry-after", os.environ.get("API_RETRY_AFTER", "5").encode()),)
+    if not admission.enter_client(client):
+        await _send_json(send, 429, {"error": f"클라이언트당 동시 요청은 {admission.per_client}개까지입니다."}, retry_after)
+        return
+
+    try:
+        # 대화를 이어가는 요청은 상태에 따라 답이 다르므로 합치지 않음
+        key = None if thread_id else normalize_question(question)
+        flight = singleflight.attach(key)
+        coalesced = flight is not None
+        if flight is None:
+            # 새 실행만 워커의 실행 슬롯 / 대기열을 차지 (합류한 요청은 추가 비용 없음)
+            flight = _start_flight(key, thread_id or issue_thread_id(client), question)
+            if flight is None:
+                await _send_json(send, 503, {"error": "요청이 많아 처리할 수 없습니다. 잠시 후 다시 시도해 주세요."}, retry_after)
+                return
+        else:
+            logger.info("-> 진행 중인 동일 질문에 합류 (구독자 %s명): %s", flight.subscribers, question)
+
+        try:
+            if streaming:
+                await _until_disconnect(receive, _stream_events(send, flight, client, coalesced))
+            else:
+                disconnected, final = await _until_disconnect(receive, _collect_final(flight))
+                if not disconnected:
+                    kind, payload = final
+                    if kind == "final":
+                        await _send_json(send, 200, await _own_final(payload, flight, client, coalesced))
+                    else:
+                        await _send_json(send, payload["status"], {"error": payload["error"]})
+        finally:
+            singleflight.leave(flight)
+    finally:
+        admission.leave_client(client)
+
+
+async def _collect_final(flight: Flight) -> Tuple[str, Any]:
+    result: Tuple[str, Any] = ("error", {"status": 500, "error": "결과 없이 실행이 종료되었습니다."})
+    async for kind, payload in flight.subscribe(heartbeat=3600):
+        if kind in ("final", "error"):
+            result = (kind, payload)
+    return result
+
+
+async def _stream_events(send, flight: Flight, client: str, coalesced: bool) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            # 프록시가 이벤트를 모아 보내지 않도록
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+    heartbeat = float(os.environ.get("API_SSE_HEARTBEAT", "15"))
+    async for kind, payload in flight.subscribe(heartbeat=heartbeat):
+        if kind == "ping":
+            # 유휴 연결을 끊는 로드밸런서를 위한 주석 이벤트
+            chunk = ": ping\n\n"
+        else:
+            if kind == "final":
+                payload = await _own_final(payload, flight, client, coalesced)
+            chunk = f"event: {kind}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+        await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def app(scope, receive, send) -> None:
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    # 첫 요청에서 스키마 조회 / 그래프 컴파일 지연이 생기지 않도록 미리 생성
+                    get_agent()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                from db_pool import query_pool
+                await query_pool.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    path, method = scope["path"].rstrip("/"), scope["method"]
+    if path == "/healthz" and method == "GET":
+        await _send_json(send, 200, {
+            "status": "ok", "running": admission.running, "pending": admission.pending, "coalescing": len(singleflight),
+            "threads": len(thread_locks),
+        })
+    elif path in ("/v1/query", "/v1/query/stream"):
+        if method != "POST":
+            await _send_json(send, 405, {"error": "POST만 지원합니다."}, ((b"allow", b"POST"),))
+            return
+        await _handle_query(scope, receive, send, streaming=path.endswith("/stream"))
+    else:
+        await _send_json(send, 404, {"error": "존재하지 않는 경로입니다."})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="상권 분석 에이전트 HTTP API 서버")
+    parser.add_argument("--host", default=os.environ.get("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("API_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("API_WORKERS", "1")), help="워커 프로세스 수")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(message)s")
+    if args.workers > 1 and not os.environ.get("API_THREAD_SECRET"):
+        logger.warning("API_THREAD_SECRET이 없어 워커마다 다른 키로 thread_id를 서명합니다. 대화가 다른 워커로 가면 403이 됩니다.")
+    # 워커 프로세스가 각자 모듈을 임포트하도록 import 문자열로 전달
+    uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
@@ -2,13 +2,10 @@ import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
-import asyncio
 import os
-import pandas as pd
+import uuid
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage
-# data_analysis_langgraph 파일이 같은 경로에 있어야 합니다.
-from data_analysis_langgraph import create_agent 
 
 # 1. 환경 설정 및 세션 상태 초기화
 st.set_page_config(page_title="서울시 상권 분석 BI", layout="wide")
@@ -43,12 +40,14 @@ config = {
 }
 
 # [핵심 수정] 1234에 대한 해시값 생성 (v0.2.3 호환)
-# 복잡한 try-except 없이 명확하게 호출합니다.
-from streamlit_authenticator import Hasher
-hashed_passwords = Hasher(['1234']).generate()
+# bcrypt 해시는 느리므로 프로세스당 한 번만 계산하고 모든 세션 / rerun에서 재사용합니다.
+@st.cache_resource(show_spinner=False)
+def get_hashed_passwords():
+    from streamlit_authenticator import Hasher
+    return Hasher(['1234']).generate()
 
 # 생성된 해시값을 config에 주입
-config['credentials']['usernames']['admin']['password'] = hashed_passwords[0]
+config['credentials']['usernames']['admin']['password'] = get_hashed_passwords()[0]
 
 # 인증 객체 생성
 authenticator = stauth.Authenticate(
@@ -74,38 +73,59 @@ elif authentication_status is None:
 st.sidebar.write(f'Welcome *{name}*')
 authenticator.logout('Logout', 'sidebar')
 
-# 3. LangGraph 에이전트 초기화 (세션 상태에 저장)
-if "agent" not in st.session_state:
-    st.session_state.agent = create_agent()
+# 3. LangGraph 에이전트 초기화
+# 컴파일된 그래프 / LLM 클라이언트 / 스키마 카탈로그는 프로세스 전역으로 한 번만 만들어 모든 세션이 공유합니다.
+# (대화 상태는 thread_id별 체크포인트로 분리되므로 그래프를 공유해도 안전)
+# 에이전트 모듈은 로그인 이후 첫 사용 시점에 임포트하여 로그인 화면을 가볍게 유지합니다.
+@st.cache_resource(show_spinner="에이전트를 준비하는 중입니다...")
+def get_agent():
+    import data_analysis_langgraph
+    agent = data_analysis_langgraph.create_agent()
+    data_analysis_langgraph.get_llm()
+    return agent
+
+# 세션 상태에는 대화 데이터만 저장
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "thread_id" not in st.session_state:
-    import uuid
     st.session_state.thread_id = str(uuid.uuid4())
 
-# 4. Async Helper Function
-# 비동기 충돌 방지를 위한 안전한 래퍼 함수
-def run_async(coroutine):
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
-    
-    if loop and loop.is_running():
-        import nest_asyncio
-        nest_asyncio.apply()
-        return loop.run_until_complete(coroutine)
-    else:
-        return asyncio.run(coroutine)
+# 4. 에이전트 실행 루프
+# 모든 에이전트 코루틴은 프로세스 전역 백그라운드 이벤트 루프 하나에서 실행합니다.
+# (LLM HTTP keep-alive 연결과 DB 커넥션 풀이 질문 간에 재사용됨)
+# 질문 하나의 전체 실행 시간 상한 (초과 시 그래프 실행 취소)
+AGENT_TIMEOUT_SECONDS = float(os.environ.get("AGENT_TIMEOUT_SECONDS", "180"))
 
 # 5. UI 구성
 st.title("📊 서울시 상권 분석 AI 비서")
 st.markdown("서울시 상권 데이터를 기반으로 질문에 답변하고 시각화를 제공합니다.")
 
-# 기존 대화 내용 표시
+def render_chart(chart, sample_note=None):
+    """준비된 ChartData로 원본 데이터와 막대 차트를 그립니다."""
+    if chart is None or chart.frame.empty:
+        return
+    st.divider()
+    st.subheader("📈 데이터 시각화")
+    if sample_note:
+        st.caption(sample_note)
+
+    # 1. 데이터 원본 확인
+    with st.expander("데이터 원본 보기"):
+        st.dataframe(chart.frame)
+
+    # 2. 차트 그리기 (X축 / Y축은 prepare_chart에서 자동 탐지)
+    if chart.chart_frame is not None:
+        if chart.downsampled:
+            st.caption(f"※ 데이터가 많아 상위 {len(chart.chart_frame)}개 항목만 시각화합니다.")
+        st.bar_chart(chart.chart_frame)
+    else:
+        st.info("시각화할 적절한 수치 데이터를 찾지 못했습니다.")
+
+# 기존 대화 내용 표시 (차트는 저장된 ChartData를 그대로 사용)
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        render_chart(msg.get("chart"), msg.get("sample_note"))
 
 # 사용자 입력 처리
 if prompt := st.chat_input("질문을 입력하세요 (예: 2024년 1분기 강남구 매출 보여줘)"):
@@ -116,96 +136,62 @@ if prompt := st.chat_input("질문을 입력하세요 (예: 2024년 1분기 강
 
     # AI 답변 생성
     with st.chat_message("assistant"):
-        with st.spinner("분석 중입니다..."):
-            try:
-                # LangGraph 실행 설정
-                graph_config = {"configurable": {"thread_id": st.session_state.thread_id}}
-                
-                # 비동기 실행
-                final_state = run_async(
-                    st.session_state.agent.ainvoke(
-                        {"messages": [HumanMessage(content=prompt)]},
-                        config=graph_config
-                    )
-                )
-                
-                # 결과 파싱 및 출력
-                response_content = final_state['messages'][-1].content
-                st.markdown(response_content)
-
-                # ... (위쪽 코드는 그대로 유지) ...
-                
-                # [수정된 시각화 처리 로직]
-                # state에 sql_result가 있고 데이터가 존재하면 시각화 시도
-                # [수정된 시각화 처리 로직]
-                # state에 sql_result가 있고 데이터가 존재하면 시각화 시도
-                if 'sql_result' in final_state and final_state['sql_result']:
-                    data = final_state['sql_result']
-                    df = pd.DataFrame(data)
-                    
-                    if not df.empty:
-                        # [수정] Decimal 타입을 실제 숫자(float/int)로 변환
-                        # 이 부분이 없으면 Pandas가 숫자를 object로 인식해서 그래프를 못 그립니다.
-                        for col in df.columns:
-                            # 숫자로 변환 가능한 컬럼은 강제로 변환 (에러나면 무시하고 원래대로 유지)
-                            df[col] = pd.to_numeric(df[col], errors='ignore')
-
-                        st.divider()
-                        st.subheader("📈 데이터 시각화")
-                        
-                        # 1. 데이터 원본 확인
-                        with st.expander("데이터 원본 보기"):
-                            st.dataframe(df)
-
-                        # 2. X축(이름), Y축(수치) 자동 탐지 로직
-                        # 이제 변환된 df에서 숫자를 찾으므로 정확하게 동작합니다.
-                        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                        object_cols = df.select_dtypes(include=['object']).columns.tolist()
-
-                        x_col = None
-                        y_cols = []
-
-                        # X축 찾기: 'name', '명', 'code' 등이 포함된 문자열 컬럼 우선
-                        for col in object_cols:
-                            if any(k in col.lower() for k in ['name', '명', 'nm', 'district', 'trdar']):
-                                x_col = col
-                                break
-                        # 못 찾았으면 첫 번째 문자열 컬럼 사용
-                        if not x_col and object_cols:
-                            x_col = object_cols[0]
-
-                        # Y축 찾기: 매출, 금액 관련 컬럼
-                        for col in numeric_cols:
-                            lower_col = col.lower()
-                            if any(k in lower_col for k in ['amount', 'sales', '매출', 'sum', 'total', 'amt']):
-                                y_cols.append(col)
-                        
-                        # 특정한 Y축을 못 찾았으면, 'year', 'id'가 아닌 첫 번째 숫자 컬럼 선택
-                        if not y_cols and numeric_cols:
-                            for col in numeric_cols:
-                                if 'year' not in col.lower() and 'id' not in col.lower():
-                                    y_cols.append(col)
-                                    break
-                        
-                        # 3. 차트 그리기
-                        if x_col and y_cols:
-                            # 데이터가 너무 많으면 상위 10개만 시각화
-                            if len(df) > 10:
-                                st.caption("※ 데이터가 많아 상위 10개 항목만 시각화합니다.")
-                                chart_df = df.set_index(x_col)[y_cols].head(10)
-                            else:
-                                chart_df = df.set_index(x_col)[y_cols]
-                            
-                            st.bar_chart(chart_df)
-                        else:
-                            st.info("시각화할 적절한 수치 데이터를 찾지 못했습니다.")
-
-                # 대화 기록 저장
-                st.session_state.messages.append({"role": "assistant", "content": response_content})
-                
-            except Exception as e:
-                st.error(f"오류가 발생했습니다: {e}")
-                
+        # 진행 상황과 보고서 토큰을 실시간으로 표시할 영역
+        progress_placeholder = st.empty()
+        report_placeholder = st.empty()
+        progress_placeholder.caption("분석 중입니다...")
+        try:
+            # LangGraph 실행 설정
+            graph_config = {"configurable": {"thread_id": st.session_state.thread_id}}
+
+            from data_analysis_langgraph import stream_agent
+            from background_loop import background_loop
+            agent = get_agent()
+
+            # 스트리밍 실행: 백그라운드 루프가 보낸 진행 이벤트와 보고서 토큰을 스크립트 스레드에서 도착하는 대로 렌더링
+            report_text = ""
+            final_state = None
+            events = stream_agent(
+                agent,
+                {"messages": [HumanMessage(content=prompt)]},
+                config=graph_config
+            )
+            for kind, payload in background_loop.iterate(events, timeout=AGENT_TIMEOUT_SECONDS):
+                if kind == "progress":
+                    progress_placeholder.caption(payload)
+                elif kind == "token":
+                    report_text += payload
+                    report_placeholder.markdown("### 분석 보고서\n" + report_text + "▌")
+                elif kind == "final":
+                    final_state = payload
+
+            # 결과 파싱 및 출력 (스트리밍된 본문을 SQL이 포함된 최종 보고서로 교체)
+            response_content = final_state['messages'][-1].content
+            progress_placeholder.empty()
+            report_placeholder.markdown(response_content)
+
+            # 시각화 데이터는 결과마다 한 번만 준비하고 대화 기록에 저장 (rerun 시 재계산하지 않음)
+            chart = None
+            sample_note = None
+            if final_state.get('sql_result'):
+                from chart_data import prepare_chart
+                chart = prepare_chart(final_state['sql_result'])
+                if final_state.get('sql_truncated'):
+                    sample_note = f"※ 전체 {final_state['sql_row_count']}개 행 중 {len(chart.frame)}개 행만 조회된 표본입니다."
+                render_chart(chart, sample_note)
+
+            # 대화 기록 저장
+            st.session_state.messages.append(
+                {"role": "assistant", "content": response_content, "chart": chart, "sample_note": sample_note}
+            )
+            
+        except TimeoutError:
+            progress_placeholder.empty()
+            st.error(f"{AGENT_TIMEOUT_SECONDS:.0f}초 내에 분석이 끝나지 않아 중단했습니다. 질문을 좁혀 다시 시도해 주세요.")
+        except Exception as e:
+            progress_placeholder.empty()
+            st.error(f"오류가 발생했습니다: {e}")
+            
             #     # 데이터 시각화 처리
             #     if 'sql_result' in final_state and final_state['sql_result']:
             #         data = final_state['sql_result']
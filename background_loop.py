@@ -0,0 +1,98 @@
+### 장수명 백그라운드 이벤트 루프
+# Streamlit 스크립트는 rerun마다 동기 코드로 실행되므로, 질문마다 asyncio.run(또는 nest_asyncio)으로
+# 루프를 새로 만들면 ChatOpenAI의 비동기 HTTP 클라이언트 keep-alive 연결과 루프별 DB 커넥션 풀이 매번 버려집니다.
+# 전용 데몬 스레드의 이벤트 루프 하나가 모든 에이전트 코루틴을 실행하고,
+# 스크립트 스레드는 submit / run / iterate로 결과를 기다립니다. (타임아웃 시 코루틴 취소)
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class BackgroundLoop:
+    """데몬 스레드에서 계속 실행되는 asyncio 이벤트 루프"""
+
+    def __init__(self, name: str = "agent-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """이벤트 루프를 반환합니다. (첫 사용 시 스레드 시작)"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                started = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(started.set)
+                    loop.run_forever()
+
+                threading.Thread(target=run, name=self.name, daemon=True).start()
+                started.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro: Awaitable[T]) -> "concurrent.futures.Future[T]":
+        """코루틴을 루프에 예약하고 스레드 안전한 Future를 반환합니다. (future.cancel()로 취소 가능)"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """코루틴을 루프에서 실행하고 결과를 기다립니다. 시간 초과나 인터럽트 시 코루틴을 취소합니다."""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # TimeoutError / KeyboardInterrupt / Streamlit의 StopException 등
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator[T], timeout: Optional[float] = None) -> Iterator[T]:
+        """비동기 이터레이터를 루프에서 소비하며 항목을 호출 스레드로 하나씩 넘겨주는 동기 제너레이터
+        (timeout은 전체 소요 시간 상한, 시간 초과나 호출자가 중간에 멈추면 루프 쪽 실행도 취소됨)"""
+        items: "queue.Queue[tuple]" = queue.Queue()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+            except BaseException as e:
+                items.put((_DONE, e))
+                raise
+            items.put((_DONE, None))
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        future = self.submit(pump())
+        try:
+            while True:
+                remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+                try:
+                    item, error = items.get(timeout=remaining)
+                except queue.Empty:
+                    raise TimeoutError(f"{timeout:g}초 내에 실행이 완료되지 않았습니다.") from None
+                if item is _DONE:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            # 진행 중인 그래프 실행(LLM 스트림, DB 쿼리)을 취소 (이미 끝났으면 무시됨)
+            future.cancel()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+
+# 프로세스 전역 백그라운드 루프 인스턴스
+background_loop = BackgroundLoop()
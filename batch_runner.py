@@ -0,0 +1,229 @@
+### 질문 일괄 실행 (CLI 배치 모드)
+# JSONL 질문 파일을 컴파일된 그래프로 동시에 실행하고, 끝나는 순서대로 결과를 JSONL로 기록합니다.
+# - 동시 실행 수 제한 (--concurrency)
+# - LLM 분당 요청 / 토큰 수 제한 (--rpm / --tpm, 모델의 rate_limiter로 적용)
+# - 예외 발생 시 지수 백오프 재시도 (--retries)
+# - 결과 파일에 이미 성공으로 기록된 질문은 건너뛰어 중단 후 이어서 실행 가능
+#
+# 사용법:
+#   python data_analysis_langgraph.py --batch questions.jsonl --output results.jsonl --concurrency 8 --rpm 300
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from sql_templates import inline_binds
+from telemetry import token_usage
+
+logger = logging.getLogger(__name__)
+
+
+### 1. LLM 호출 속도 제한
+
+class TokenRateLimiter(BaseRateLimiter):
+    """최근 60초 동안의 요청 수 / 토큰 수를 제한하는 슬라이딩 윈도우 리미터
+    호출 전에는 토큰 수를 알 수 없으므로 최근 평균 사용량으로 예약하고, 호출이 끝나면 실제 사용량과의 차이를 보정합니다."""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, initial_tokens_per_request: int = 2000):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.tokens_per_request = float(initial_tokens_per_request)
+        self._events: deque = deque()  # (시각, 요청 수, 토큰 수)
+        self._lock = threading.Lock()
+
+    def _try_reserve(self) -> float:
+        """예약에 성공하면 0, 아니면 다시 시도할 때까지 기다릴 시간(초)을 반환합니다."""
+        now = time.monotonic()
+        with self._lock:
+            while self._events and now - self._events[0][0] >= self.WINDOW_SECONDS:
+                self._events.popleft()
+            requests = sum(event[1] for event in self._events)
+            tokens = sum(event[2] for event in self._events)
+            over_requests = self.requests_per_minute and requests + 1 > self.requests_per_minute
+            # 한도보다 큰 단일 요청도 윈도우가 비어 있으면 통과시켜 영구 대기를 막음
+            over_tokens = self.tokens_per_minute and self._events and tokens + self.tokens_per_request > self.tokens_per_minute
+            if not (over_requests or over_tokens):
+                self._events.append((now, 1, self.tokens_per_request))
+                return 0.0
+            return max(self.WINDOW_SECONDS - (now - self._events[0][0]), 0.05)
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        while True:
+            wait = self._try_reserve()
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            time.sleep(wait)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        while True:
+            wait = self._try_reserve()
+            if not wait:
+                return True
+            if not blocking:
+                return False
+            await asyncio.sleep(wait)
+
+    def record_usage(self, tokens: int) -> None:
+        """실제 사용 토큰으로 예약량을 보정하고 다음 예약에 쓸 평균을 갱신합니다."""
+        with self._lock:
+            self._events.append((time.monotonic(), 0, tokens - self.tokens_per_request))
+            self.tokens_per_request = 0.8 * self.tokens_per_request + 0.2 * tokens
+
+
+class _UsageRecorder(BaseCallbackHandler):
+    """LLM 호출이 끝날 때 실제 토큰 사용량을 리미터에 전달하는 콜백"""
+
+    run_inline = True
+
+    def __init__(self, limiter: TokenRateLimiter):
+        self.limiter = limiter
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        prompt_tokens, completion_tokens = token_usage(response)
+        if prompt_tokens or completion_tokens:
+            self.limiter.record_usage(prompt_tokens + completion_tokens)
+
+
+### 2. 입력 / 이어 실행
+
+@dataclass
+class BatchQuestion:
+    id: str
+    question: str
+
+
+def load_batch_questions(path: str) -> List[BatchQuestion]:
+    """JSONL 질문 파일을 읽습니다. (question 또는 title 필드, id가 없으면 질문 해시를 id로 사용)"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or record.get("title")
+            if not question:
+                continue
+            question_id = str(record.get("id") or hashlib.sha1(question.encode("utf-8")).hexdigest()[:12])
+            questions.append(BatchQuestion(id=question_id, question=question))
+    return questions
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """이전 실행 결과 파일에서 성공한 질문 id를 읽습니다. (중단으로 잘린 마지막 줄은 무시)"""
+    done: Set[str] = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(str(record.get("id")))
+    return done
+
+
+### 3. 실행
+
+async def _run_question(agent, item: BatchQuestion, callbacks: List[BaseCallbackHandler]) -> Dict[str, Any]:
+    config = {"configurable": {"thread_id": f"batch-{uuid.uuid4()}"}, "callbacks": callbacks}
+    timings: Dict[str, float] = {}
+    start = previous = time.perf_counter()
+    async for update in agent.astream({"messages": [HumanMessage(content=item.question)]}, config=config, stream_mode="updates"):
+        now = time.perf_counter()
+        for node_name in update:
+            timings[node_name] = round(now - previous, 4)
+        previous = now
+    timings["total"] = round(time.perf_counter() - start, 4)
+
+    state = (await agent.aget_state(config)).values
+    return {"id": item.id, "question": item.question, **result_record(state), "timings": timings}
+
+
+def result_record(state: Dict[str, Any]) -> Dict[str, Any]:
+    """그래프 최종 상태에서 결과 요약을 만듭니다. (배치 결과 파일 / API 응답 공용)"""
+    # 검증 / 실행 오류는 그래프가 사용자용 메시지로 보고서를 대신하므로 재시도 대상이 아님
+    return {
+        "status": "error" if state.get("error") else "ok",
+        "error": state.get("error", ""),
+        "report": state["messages"][-1].content,
+        "sql": inline_binds(state.get("routed_sql") or state.get("sql_query", ""), state.get("sql_params")),
+        "row_count": state.get("sql_row_count", 0),
+        "truncated": state.get("sql_truncated", False),
+    }
+
+
+async def run_batch(
+    agent,
+    questions: List[BatchQuestion],
+    output_path: str,
+    concurrency: int = 4,
+    retries: int = 3,
+    backoff_seconds: float = 2.0,
+    limiter: Optional[TokenRateLimiter] = None,
+) -> Dict[str, int]:
+    """질문들을 동시에 실행하고 끝나는 순서대로 output_path에 JSONL로 추가합니다."""
+    done = completed_ids(output_path)
+    pending = [item for item in questions if item.id not in done]
+    logger.info("배치 실행: 전체 %s건 중 완료 %s건 건너뜀, %s건 실행", len(questions), len(questions) - len(pending), len(pending))
+
+    callbacks = [_UsageRecorder(limiter)] if limiter else []
+    semaphore = asyncio.Semaphore(concurrency)
+    summary = {"ok": 0, "error": 0, "skipped": len(questions) - len(pending)}
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    # 중단으로 마지막 줄이 잘렸다면 새 결과가 그 줄에 이어 붙지 않도록 줄바꿈부터 씀
+    needs_newline = False
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        if needs_newline:
+            out.write("\n")
+
+        def write(record: Dict[str, Any]) -> None:
+            # 한 줄씩 바로 flush하여 중단되더라도 완료된 결과는 남김
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+            summary[record["status"]] += 1
+
+        async def worker(item: BatchQuestion) -> None:
+            async with semaphore:
+                for attempt in range(1, retries + 2):
+                    try:
+                        record = await _run_question(agent, item, callbacks)
+                        record["attempts"] = attempt
+                        write(record)
+                        return
+                    except Exception as e:
+                        if attempt > retries:
+                            write({"id": item.id, "question": item.question, "status": "error",
+                                   "error": f"{type(e).__name__}: {e}", "attempts": attempt})
+                            return
+                        # 지수 백오프 + 지터 (동시에 실패한 요청들이 한꺼번에 재시도하지 않도록)
+                        delay = backoff_seconds * 2 ** (attempt - 1) * (0.5 + random.random())
+                        logger.warning("[%s] %s → %.1f초 후 재시도 (%s/%s)", item.id, e, delay, attempt, retries)
+                        await asyncio.sleep(delay)
+
+        await asyncio.gather(*(worker(item) for item in pending))
+    return summary
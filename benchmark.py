@@ -0,0 +1,329 @@
+### 오프라인 파이프라인 벤치마크
+# OpenAI / PostgreSQL 없이 create_agent() 그래프의 성능을 측정합니다.
+# - 지연 시간을 설정할 수 있는 결정적 가짜 채팅 모델 (SQL 생성 / 보고서 프롬프트를 구분해 응답)
+# - 합성 quarterly_sales 데이터를 담은 로컬 DuckDB(Parquet) 데이터베이스
+# - 노드별 / 전체 p50·p95·p99 지연, 지정 동시성에서의 처리량, 최대 메모리 사용량 보고
+#
+# 사용법:
+#   python benchmark.py --questions benchmark_questions.jsonl --concurrency 8 --repeat 5
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from result_encoding import estimate_tokens
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+### 1. 결정적 가짜 채팅 모델
+
+# 질문 키워드 → 지표 컬럼
+_METRIC_KEYWORDS = {
+    "30대": "sales_by_age_30s",
+    "20대": "sales_by_age_20s",
+    "주말": "weekend_sales_amount",
+    "주중": "weekday_sales_amount",
+    "점심": "sales_time_11_14",
+    "저녁": "sales_time_17_21",
+    "여성": "female_sales_amount",
+    "남성": "male_sales_amount",
+}
+
+
+def _question_from_prompt(prompt: str) -> str:
+    marker = "### 사용자의 질문:"
+    return prompt.rsplit(marker, 1)[-1].strip() if marker in prompt else prompt
+
+
+def fake_sql_for(question: str) -> str:
+    """질문에서 분기·지표·N을 뽑아 결정적으로 SQL을 만듭니다."""
+    quarters = [f"{year}{q}" for year, q in re.findall(r"(\d{4})년\s*(\d)분기", question)] or ["20241"]
+    metric = next((col for key, col in _METRIC_KEYWORDS.items() if key in question), "monthly_sales_amount")
+    limit_match = re.search(r"(?:상위|top)\s*(\d+)", question, re.IGNORECASE)
+    limit = int(limit_match.group(1)) if limit_match else 5
+    type_filter = " AND district_type LIKE '%골목상권%'" if "골목" in question else ""
+
+    if len(quarters) >= 2:
+        prev, curr = quarters[0], quarters[1]
+        return (
+            f"WITH q1 AS (SELECT district_name, SUM({metric}) AS sales_prev FROM quarterly_sales "
+            f"WHERE year_quarter = '{prev}'{type_filter} GROUP BY district_name), "
+            f"q2 AS (SELECT district_name, SUM({metric}) AS sales_curr FROM quarterly_sales "
+            f"WHERE year_quarter = '{curr}'{type_filter} GROUP BY district_name) "
+            "SELECT q2.district_name, (q2.sales_curr - q1.sales_prev) AS sales_increase "
+            "FROM q2 JOIN q1 ON q2.district_name = q1.district_name "
+            f"ORDER BY sales_increase DESC LIMIT {limit};"
+        )
+    return (
+        f"SELECT district_name, SUM({metric}) AS total_sales FROM quarterly_sales "
+        f"WHERE year_quarter = '{quarters[0]}'{type_filter} GROUP BY district_name "
+        f"ORDER BY total_sales DESC LIMIT {limit};"
+    )
+
+
+class FakeAnalystChatModel(BaseChatModel):
+    """네트워크 없이 고정 지연 후 결정적 응답을 돌려주는 채팅 모델"""
+
+    latency: float = 0.5
+    """호출당 첫 토큰까지의 지연 (초)"""
+    token_latency: float = 0.0
+    """스트리밍 시 토큰 간 지연 (초)"""
+    report_tokens: int = 120
+    """보고서 응답 길이 (토큰 수)"""
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-analyst"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        question = _question_from_prompt(prompt)
+        if "쿼리 작성 전문가" in prompt:
+            return fake_sql_for(question)
+        seed = hashlib.sha256(question.encode()).hexdigest()[:8]
+        words = [f"분석{seed}" if i == 0 else f"인사이트{i}" for i in range(self.report_tokens)]
+        return "## 요약\n" + " ".join(words)
+
+    def _message(self, messages: List[BaseMessage]) -> AIMessage:
+        content = self._respond(messages)
+        prompt_tokens = estimate_tokens("\n".join(str(message.content) for message in messages))
+        completion_tokens = estimate_tokens(content)
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        })
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = self._message(messages)
+        tokens = message.content.split(" ")
+        for i, token in enumerate(tokens):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            # 마지막 청크에 사용량을 실어 실제 모델(stream_usage)과 같은 형태로 전달
+            usage = message.usage_metadata if i == len(tokens) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token, usage_metadata=usage))
+
+
+### 2. 합성 데이터베이스
+
+def seeded_quarters(quarters: int) -> List[str]:
+    """합성 데이터에 들어가는 year_quarter 값 (2023년 1분기부터 quarters개)"""
+    return [f"{2023 + q // 4}{q % 4 + 1}" for q in range(quarters)]
+
+
+def seed_synthetic_database(path: str, districts: int = 1600, categories: int = 60, quarters: int = 9) -> None:
+    """합성 quarterly_sales를 Parquet 스냅샷으로 생성합니다. (상권 × 업종 × 분기, year_quarter 정렬)"""
+    import duckdb
+
+    quarter_list = ", ".join(f"'{yq}'" for yq in seeded_quarters(quarters))
+    metrics = [
+        "monthly_sales_amount", "weekday_sales_amount", "weekend_sales_amount",
+        "sales_time_11_14", "sales_time_17_21", "male_sales_amount", "female_sales_amount",
+        "sales_by_age_10s", "sales_by_age_20s", "sales_by_age_30s", "sales_by_age_40s",
+        "sales_by_age_50s", "sales_by_age_60s_above",
+    ]
+    metric_sql = ",\n".join(
+        f"(hash(d.i, c.i, q.yq, {salt}) % 500000000)::BIGINT AS {col}" for salt, col in enumerate(metrics)
+    )
+    with duckdb.connect() as conn:
+        conn.execute(f"""
+            COPY (
+                SELECT
+                    q.yq AS year_quarter,
+                    CASE d.i % 4 WHEN 0 THEN '골목상권' WHEN 1 THEN '발달상권'
+                                 WHEN 2 THEN '전통시장' ELSE '관광특구' END AS district_type,
+                    (3110000 + d.i)::VARCHAR AS district_code,
+                    '상권' || d.i AS district_name,
+                    'CS' || lpad(c.i::VARCHAR, 6, '0') AS service_category_code,
+                    '업종' || c.i AS service_category_name,
+                    {metric_sql},
+                    (hash(d.i, c.i, q.yq) % 50000)::BIGINT AS monthly_sales_count
+                FROM range({districts}) d(i), range({categories}) c(i),
+                     (SELECT unnest([{quarter_list}]) AS yq) q
+                WHERE hash(d.i, c.i) % 3 = 0
+                ORDER BY year_quarter
+            ) TO '{path}' (FORMAT parquet)
+        """)
+
+
+### 3. 측정
+
+def percentile(values: List[float], q: float) -> float:
+    """선형 보간 백분위수"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+def unseeded_quarters(questions: List[str], seeded: List[str]) -> List[str]:
+    """합성 데이터에 없는 분기를 묻는 질문 (결과 0행으로 보고서 LLM을 건너뛰어 지연 측정을 왜곡)"""
+    return [
+        question for question in questions
+        if any(f"{year}{q}" not in seeded for year, q in re.findall(r"(\d{4})년\s*(\d)분기", question))
+    ]
+
+
+def load_questions(path: str) -> List[str]:
+    """JSONL 질문 목록을 읽습니다. (question 필드, 없으면 title 필드)"""
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or record.get("title")
+            if question:
+                questions.append(question)
+    return questions
+
+
+async def run_one(agent, question: str, node_timings: Dict[str, List[float]]) -> float:
+    """질문 하나를 실행하고 전체 지연을 반환합니다. 노드별 지연은 updates 이벤트 간격으로 측정합니다."""
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    start = previous = time.perf_counter()
+    async for update in agent.astream({"messages": [HumanMessage(content=question)]}, config=config, stream_mode="updates"):
+        now = time.perf_counter()
+        for node_name in update:
+            node_timings[node_name].append(now - previous)
+        previous = now
+    return time.perf_counter() - start
+
+
+async def run_benchmark(agent, questions: List[str], concurrency: int, repeat: int) -> Dict[str, Any]:
+    node_timings: Dict[str, List[float]] = defaultdict(list)
+    totals: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(question: str):
+        nonlocal errors
+        async with semaphore:
+            try:
+                totals.append(await run_one(agent, question, node_timings))
+            except Exception as e:
+                errors += 1
+                print(f"[ERROR] {question}: {e}", file=sys.stderr)
+
+    workload = [question for _ in range(repeat) for question in questions]
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker(question) for question in workload))
+    wall = time.perf_counter() - wall_start
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summarize = lambda values: {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+    }
+    return {
+        "requests": len(workload),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "throughput_rps": len(totals) / wall if wall else 0.0,
+        "end_to_end": summarize(totals),
+        "nodes": {node: summarize(values) for node, values in node_timings.items()},
+        "peak_traced_mb": peak_traced / 1024 / 1024,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print("=" * 62)
+    print(f"요청 {report['requests']}건 (오류 {report['errors']}건), 동시성 {report['concurrency']}")
+    print(f"처리량: {report['throughput_rps']:.2f} req/s  (총 {report['wall_seconds']:.2f}초)")
+    print(f"최대 메모리: tracemalloc {report['peak_traced_mb']:.1f} MB / RSS {report['max_rss_mb']:.1f} MB")
+    print("-" * 62)
+    print(f"{'구간':<20}{'count':>8}{'p50(ms)':>11}{'p95(ms)':>11}{'p99(ms)':>11}")
+    rows = list(report["nodes"].items()) + [("end_to_end", report["end_to_end"])]
+    for name, stats in rows:
+        print(f"{name:<20}{stats['count']:>8}{stats['p50_ms']:>11.1f}{stats['p95_ms']:>11.1f}{stats['p99_ms']:>11.1f}")
+    print("=" * 62)
+
+
+### 4. 실행
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="LangGraph 파이프라인 오프라인 벤치마크")
+    parser.add_argument("--questions", default=os.path.join(folder_path, "benchmark_questions.jsonl"))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="가짜 LLM 호출 지연 (초)")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="가짜 LLM 토큰 간 지연 (초)")
+    parser.add_argument("--districts", type=int, default=1600, help="합성 데이터 상권 수")
+    parser.add_argument("--quarters", type=int, default=9, help="합성 데이터 분기 수 (2023년 1분기부터)")
+    parser.add_argument("--with-caches", action="store_true", help="질문 메모 / 결과 캐시를 켠 상태로 측정")
+    parser.add_argument("--no-templates", action="store_true", help="SQL 템플릿 빠른 경로를 끄고 모든 SQL을 LLM으로 생성")
+    parser.add_argument("--json", dest="json_path", help="결과를 JSON 파일로 저장")
+    parser.add_argument("--verbose", action="store_true", help="노드 로그 출력")
+    args = parser.parse_args(argv)
+
+    # 노드 로그는 logging으로 나가므로 레벨로 출력 여부를 정함
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(message)s")
+
+    questions = load_questions(args.questions)
+    outside = unseeded_quarters(questions, seeded_quarters(args.quarters))
+    if outside:
+        parser.error(f"합성 데이터({args.quarters}개 분기)에 없는 분기를 묻는 질문이 있습니다: {outside}")
+
+    with tempfile.TemporaryDirectory(prefix="biz-agent-bench-") as workdir:
+        snapshot = os.path.join(workdir, "quarterly_sales.parquet")
+        seed_synthetic_database(snapshot, districts=args.districts, quarters=args.quarters)
+
+        # 에이전트 모듈을 임포트하기 전에 로컬 백엔드와 캐시 설정을 고정
+        os.environ["SQL_BACKEND"] = "duckdb"
+        os.environ["DUCKDB_SNAPSHOT_PATH"] = snapshot
+        os.environ["QUERY_MEMO_PATH"] = os.path.join(workdir, "query_memo.sqlite3")
+        if not args.with_caches:
+            os.environ["QUERY_MEMO_ENABLED"] = "0"
+            os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+        if args.no_templates:
+            os.environ["SQL_TEMPLATES_ENABLED"] = "0"
+
+        import data_analysis_langgraph
+
+        data_analysis_langgraph.set_llm(FakeAnalystChatModel(latency=args.llm_latency, token_latency=args.token_latency))
+        agent = data_analysis_langgraph.create_agent()
+        report = asyncio.run(run_benchmark(agent, questions, args.concurrency, args.repeat))
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+### 조회 결과 → 차트 데이터 준비
+# 결과마다 한 번만 DataFrame을 만들고 X축(이름) / Y축(수치) 컬럼을 탐지해 차트용 프레임까지 계산합니다.
+# 계산 결과(ChartData)는 app.py가 대화 기록에 함께 저장하여 rerun 때 다시 계산하지 않습니다.
+# DB 계층이 numeric을 int / float로 돌려주므로 컬럼별 pd.to_numeric 변환 없이 숫자 dtype이 바로 잡힙니다.
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# X축 후보: 이름 / 코드 성격의 문자열 컬럼
+X_KEYWORDS = ['name', '명', 'nm', 'district', 'trdar']
+# Y축 후보: 매출 / 금액 관련 수치 컬럼
+Y_KEYWORDS = ['amount', 'sales', '매출', 'sum', 'total', 'amt']
+
+
+@dataclass
+class ChartData:
+    """시각화에 필요한 결과 프레임과 차트 프레임"""
+    frame: pd.DataFrame
+    chart_frame: Optional[pd.DataFrame] = None
+    x_col: Optional[str] = None
+    y_cols: List[str] = field(default_factory=list)
+    downsampled: bool = False
+
+
+def to_frame(rows: List[Dict]) -> pd.DataFrame:
+    """조회 결과 행을 NumPy 기반 DataFrame으로 변환합니다. (int / float 값은 그대로 숫자 dtype)"""
+    return pd.DataFrame.from_records(rows)
+
+
+def detect_axes(frame: pd.DataFrame) -> tuple[Optional[str], List[str]]:
+    """X축(이름) 컬럼과 Y축(수치) 컬럼 목록을 탐지합니다."""
+    numeric_cols = frame.select_dtypes(include=['number']).columns.tolist()
+    text_cols = [col for col in frame.columns if col not in numeric_cols]
+
+    # X축 찾기: 'name', '명', 'code' 등이 포함된 문자열 컬럼 우선, 없으면 첫 번째 문자열 컬럼
+    x_col = next((col for col in text_cols if any(k in col.lower() for k in X_KEYWORDS)), None)
+    if not x_col and text_cols:
+        x_col = text_cols[0]
+
+    # Y축 찾기: 매출, 금액 관련 컬럼, 없으면 'year', 'id'가 아닌 첫 번째 숫자 컬럼
+    y_cols = [col for col in numeric_cols if any(k in col.lower() for k in Y_KEYWORDS)]
+    if not y_cols:
+        y_cols = [col for col in numeric_cols if 'year' not in col.lower() and 'id' not in col.lower()][:1]
+    return x_col, y_cols
+
+
+def prepare_chart(rows: List[Dict], top_k: Optional[int] = None) -> ChartData:
+    """결과 행에서 차트 데이터를 만듭니다. 항목이 top_k개를 넘으면 벡터 연산으로 상위 top_k개만 남깁니다."""
+    if top_k is None:
+        top_k = int(os.environ.get("CHART_TOP_K", "10"))
+
+    frame = to_frame(rows)
+    x_col, y_cols = detect_axes(frame)
+    if frame.empty or not x_col or not y_cols:
+        return ChartData(frame=frame)
+
+    chart_frame = frame[[x_col] + y_cols]
+    # 업종별로 나뉜 결과처럼 X축 값이 중복되면 합산 (막대가 겹치지 않게)
+    if not chart_frame[x_col].is_unique:
+        chart_frame = chart_frame.groupby(x_col, sort=False, as_index=False)[y_cols].sum()
+
+    downsampled = len(chart_frame) > top_k
+    if downsampled:
+        primary = chart_frame[y_cols[0]]
+        if primary.is_monotonic_decreasing or primary.is_monotonic_increasing:
+            # 이미 SQL에서 정렬된 결과는 보고서와 같은 순서를 유지
+            chart_frame = chart_frame.head(top_k)
+        else:
+            chart_frame = chart_frame.nlargest(top_k, y_cols[0])
+
+    return ChartData(
+        frame=frame,
+        chart_frame=chart_frame.set_index(x_col),
+        x_col=x_col,
+        y_cols=y_cols,
+        downsampled=downsampled,
+    )
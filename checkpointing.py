@@ -0,0 +1,254 @@
+### 대화 체크포인트 저장소 (용량 / 유휴 시간 제한) 및 메시지 윈도우 정책
+# MemorySaver는 thread_id마다 모든 단계의 체크포인트를 프로세스가 끝날 때까지 보관하므로
+# 오래 떠 있는 Streamlit 서버에서 세션 수에 비례해 메모리가 늘어나고, 재시작하면 모두 사라집니다.
+# - BoundedCheckpointer: 유휴 시간(CHECKPOINT_IDLE_TTL)이 지난 스레드와, 전체 추정 용량
+#   (CHECKPOINT_MAX_BYTES)을 넘을 때 가장 오래 사용되지 않은 스레드를 삭제
+# - CHECKPOINT_BACKEND=sqlite 이면 로컬 SQLite 파일에 영속화 (langgraph-checkpoint-sqlite 필요)
+# - trim_history: 대화 메시지를 최근 MESSAGE_WINDOW개로 유지하고, 밀려난 질문은 요약 문자열로 보존
+# - conversation_context: 요약과 윈도우 안의 이전 질문을 SQL 생성 / 보고서 프롬프트의 후속 질문 문맥으로 제공
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver, ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import MemorySaver
+
+from result_cache import estimate_size
+
+logger = logging.getLogger(__name__)
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+
+### 1. 체크포인트 저장소
+
+class BoundedCheckpointer(BaseCheckpointSaver):
+    """내부 체크포인트 저장소에 유휴 시간 / 전체 용량 기반 스레드 제거를 더한 래퍼"""
+
+    def __init__(self, inner: BaseCheckpointSaver, idle_ttl_seconds: float, max_bytes: int, sync_only: bool = False):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_bytes = max_bytes
+        # SqliteSaver처럼 비동기 메서드가 없는 저장소는 스레드에서 동기 메서드를 호출
+        self.sync_only = sync_only
+        self._threads: "OrderedDict[str, List[float]]" = OrderedDict()  # thread_id -> [마지막 사용 시각, 추정 바이트]
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._seed_from_storage()
+
+    def _seed_from_storage(self) -> None:
+        """영속 저장소에 이미 있는 스레드를 마지막 체크포인트 시각과 저장된 추정 바이트로 등록합니다.
+        (put과 같은 기준: 저장소에 채널 값이 버전별로 한 번씩 저장되므로 (네임스페이스, 채널, 버전)마다 한 번 합산)"""
+        try:
+            latest: Dict[str, float] = {}
+            sizes: Dict[str, Dict[Tuple[str, str, str], int]] = {}
+            for checkpoint_tuple in self.inner.list(None):
+                configurable = checkpoint_tuple.config["configurable"]
+                thread_id = configurable["thread_id"]
+                ts = datetime.fromisoformat(checkpoint_tuple.checkpoint["ts"]).timestamp()
+                latest[thread_id] = max(latest.get(thread_id, 0.0), ts)
+                blobs = sizes.setdefault(thread_id, {})
+                values = checkpoint_tuple.checkpoint.get("channel_values", {})
+                for channel, version in checkpoint_tuple.checkpoint.get("channel_versions", {}).items():
+                    key = (configurable.get("checkpoint_ns", ""), channel, str(version))
+                    if key not in blobs:
+                        blobs[key] = estimate_size(values.get(channel))
+        except Exception as e:
+            logger.warning("기존 체크포인트 스레드 목록을 읽지 못했습니다: %s", e)
+            return
+        for thread_id, ts in sorted(latest.items(), key=lambda item: item[1]):
+            size = sum(sizes[thread_id].values())
+            self._threads[thread_id] = [ts, size]
+            self._total_bytes += size
+
+    # --- 사용 기록 / 제거 ---
+
+    def _touch(self, config: RunnableConfig, added_bytes: int = 0) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        with self._lock:
+            entry = self._threads.pop(thread_id, None) or [0.0, 0]
+            entry[0] = time.time()
+            entry[1] += added_bytes
+            self._total_bytes += added_bytes
+            self._threads[thread_id] = entry
+
+    def _select_victims(self, current_thread_id: str) -> List[str]:
+        now = time.time()
+        victims = []
+        with self._lock:
+            total = self._total_bytes
+            for thread_id, (last_used, size) in self._threads.items():
+                if thread_id == current_thread_id:
+                    continue
+                if now - last_used > self.idle_ttl_seconds or total > self.max_bytes:
+                    victims.append(thread_id)
+                    total -= size
+            for thread_id in victims:
+                _, size = self._threads.pop(thread_id)
+                self._total_bytes -= size
+        return victims
+
+    def _evict(self, config: RunnableConfig) -> None:
+        for thread_id in self._select_victims(str(config["configurable"]["thread_id"])):
+            self.inner.delete_thread(thread_id)
+            logger.info("-> 체크포인트 스레드 제거: %s", thread_id)
+
+    async def _aevict(self, config: RunnableConfig) -> None:
+        for thread_id in self._select_victims(str(config["configurable"]["thread_id"])):
+            if self.sync_only:
+                await asyncio.to_thread(self.inner.delete_thread, thread_id)
+            else:
+                await self.inner.adelete_thread(thread_id)
+            logger.info("-> 체크포인트 스레드 제거: %s", thread_id)
+
+    @staticmethod
+    def _new_bytes(checkpoint: Checkpoint, new_versions: ChannelVersions) -> int:
+        # 이번 단계에서 새 버전이 기록된 채널 값만 저장소에 추가됨
+        values = checkpoint.get("channel_values", {})
+        return sum(estimate_size(values.get(channel)) for channel in new_versions)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"threads": len(self._threads), "bytes": self._total_bytes}
+
+    # --- 동기 API ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        result = self.inner.get_tuple(config)
+        if result is not None:
+            self._touch(config)
+        return result
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        return self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        result = self.inner.put(config, checkpoint, metadata, new_versions)
+        self._touch(config, self._new_bytes(checkpoint, new_versions))
+        self._evict(config)
+        return result
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        self.inner.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            entry = self._threads.pop(str(thread_id), None)
+            if entry:
+                self._total_bytes -= entry[1]
+        self.inner.delete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    # --- 비동기 API ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        if self.sync_only:
+            return await asyncio.to_thread(self.get_tuple, config)
+        result = await self.inner.aget_tuple(config)
+        if result is not None:
+            self._touch(config)
+        return result
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        if self.sync_only:
+            items = await asyncio.to_thread(
+                lambda: list(self.inner.list(config, filter=filter, before=before, limit=limit))
+            )
+            for item in items:
+                yield item
+            return
+        async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        if self.sync_only:
+            result = await asyncio.to_thread(self.inner.put, config, checkpoint, metadata, new_versions)
+        else:
+            result = await self.inner.aput(config, checkpoint, metadata, new_versions)
+        self._touch(config, self._new_bytes(checkpoint, new_versions))
+        await self._aevict(config)
+        return result
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        if self.sync_only:
+            await asyncio.to_thread(self.inner.put_writes, config, writes, task_id, task_path)
+        else:
+            await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def create_checkpointer() -> BaseCheckpointSaver:
+    """환경변수 설정에 따라 메모리 또는 SQLite 기반의 용량 제한 체크포인트 저장소를 만듭니다."""
+    idle_ttl = float(os.environ.get("CHECKPOINT_IDLE_TTL", str(6 * 3600)))
+    max_bytes = int(os.environ.get("CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    if os.environ.get("CHECKPOINT_BACKEND", "memory").lower() == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError:
+            logger.warning("langgraph-checkpoint-sqlite가 설치되지 않아 메모리 체크포인트를 사용합니다.")
+        else:
+            path = os.environ.get("CHECKPOINT_SQLITE_PATH", os.path.join(folder_path, ".cache", "checkpoints.sqlite3"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            saver = SqliteSaver(conn)
+            saver.setup()
+            return BoundedCheckpointer(saver, idle_ttl, max_bytes, sync_only=True)
+
+    return BoundedCheckpointer(MemorySaver(), idle_ttl, max_bytes)
+
+
+### 2. 메시지 윈도우 / 요약 정책
+
+def trim_history(messages: List[BaseMessage], summary: str, incoming: int = 1) -> Tuple[List[RemoveMessage], str]:
+    """새 메시지 incoming개를 더했을 때 최근 MESSAGE_WINDOW개만 남도록 지울 메시지와 갱신된 요약을 반환합니다."""
+    window = int(os.environ.get("MESSAGE_WINDOW", "10"))
+    max_summary_chars = int(os.environ.get("SUMMARY_MAX_CHARS", "2000"))
+
+    overflow = len(messages) + incoming - window
+    if overflow <= 0:
+        return [], summary
+
+    dropped = messages[:overflow]
+    # 밀려난 질문은 한 줄 요약으로 남겨 이전 맥락을 잃지 않게 함 (LLM 호출 없는 추출 요약)
+    lines = [line for line in summary.splitlines() if line]
+    for message in dropped:
+        if isinstance(message, HumanMessage):
+            lines.append(f"- 이전 질문: {str(message.content)[:120]}")
+    while lines and sum(len(line) + 1 for line in lines) > max_summary_chars:
+        lines.pop(0)
+
+    removals = [RemoveMessage(id=message.id) for message in dropped if message.id]
+    return removals, "\n".join(lines)
+
+
+def conversation_context(messages: List[BaseMessage], summary: str) -> str:
+    """후속 질문 해석용 이전 대화 문맥: 윈도우 밖 요약 + 윈도우 안의 이전 질문 (마지막 메시지인 현재 질문 제외)"""
+    max_context_chars = int(os.environ.get("CONTEXT_MAX_CHARS", "1000"))
+    lines = [line for line in summary.splitlines() if line]
+    for message in messages[:-1]:
+        if isinstance(message, HumanMessage):
+            lines.append(f"- 이전 질문: {str(message.content)[:120]}")
+    # 최근 질문이 남도록 오래된 줄부터 제거
+    while lines and sum(len(line) + 1 for line in lines) > max_context_chars:
+        lines.pop(0)
+    return "\n".join(lines)
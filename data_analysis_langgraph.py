@@ -1,18 +1,29 @@
 ### 1. 필요한 라이브러리 / 모듈 / 함수 임포트
 import os
-import json
+import time
+import logging
+import argparse
 import asyncio
 import uuid
-import psycopg2
-import decimal
-from typing import List, Dict, Any, Annotated
+from typing import List, Dict, Any, Annotated, AsyncIterator, Optional, Tuple
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, AIMessageChunk
 from langchain_openai import ChatOpenAI
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from langgraph.checkpoint.memory import MemorySaver
+from schema_catalog import schema_catalog
+from db_pool import query_pool, QueryResult, sql_backend
+from result_cache import result_cache
+from query_memo import query_memo
+from result_encoding import encode_result_for_prompt
+from rollups import route_to_rollup
+from telemetry import traced_node, span, record_cache, start_metrics_server
+from checkpointing import create_checkpointer, trim_history, conversation_context
+from sql_guard import check_sql, admit_sql
+from prompt_builder import build_sql_prompt
+from sql_templates import match_template, inline_binds
+from result_refine import match_refinement, primary_metric, apply_refinement, wrap_sql, fits_previous_result
 
 ### 2. 환경 설정
 
@@ -23,8 +34,24 @@ folder_path = os.path.dirname(os.path.abspath(__file__))
 env_file_path = os.path.join(folder_path, '.env')
 load_dotenv(env_file_path)
 
-# llm 생성하기
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+# 노드 실행 로그 (CLI에서는 main()이 콘솔 출력 형식을 설정)
+logger = logging.getLogger(__name__)
+
+# llm 생성하기 (첫 사용 시 생성하며, 벤치마크 등에서는 set_llm()으로 교체할 수 있음)
+_llm = None
+
+def get_llm():
+    """노드가 사용할 채팅 모델을 반환합니다."""
+    global _llm
+    if _llm is None:
+        # stream_usage: 스트리밍 호출에서도 토큰 사용량을 받아 계측에 기록 (계측 콜백은 telemetry에서 전역 등록)
+        _llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, stream_usage=True)
+    return _llm
+
+def set_llm(model) -> None:
+    """노드가 사용할 채팅 모델을 교체합니다. (예: 오프라인 벤치마크용 가짜 모델)"""
+    global _llm
+    _llm = model
 
 ### 3. LangGraph 상태 정의 
 class AnalysisState(BaseModel):
@@ -32,37 +59,25 @@ class AnalysisState(BaseModel):
     original_query: str = Field(default="", description="사용자의 원본 질문")
     sql_query: str = Field(default="", description="생성된 SQL 쿼리")
     sql_result: List[Dict] = Field(default_factory=list, description="SQL 실행 결과")
+    sql_row_count: int = Field(default=0, description="상한 적용 전 전체 결과 행 수")
+    sql_truncated: bool = Field(default=False, description="결과가 행/바이트 상한으로 잘렸는지 여부")
     error: str = Field(default="", description="에러 메시지")
+    routed_sql: str = Field(default="", description="롤업으로 라우팅된 실제 실행 SQL (없으면 sql_query 실행)")
+    cached_report: str = Field(default="", description="동일 질문에 대해 저장된 보고서 (있으면 보고서 LLM 호출 생략)")
+    conversation_summary: str = Field(default="", description="메시지 윈도우 밖으로 밀려난 이전 대화 요약")
+    sql_template: str = Field(default="", description="SQL을 만든 템플릿 이름 (LLM으로 생성했으면 빈 문자열)")
+    refinement: str = Field(default="", description="후속 질문으로 직전 결과에 적용한 후처리 설명 (없으면 빈 문자열)")
+    refine_requery: bool = Field(default=False, description="후속 질문을 직전 SQL을 감싸 DB에서 다시 실행하는지 여부")
+    sql_params: Dict[str, Any] = Field(default_factory=dict, description="SQL의 %(name)s 자리표시자에 바인딩할 값 (템플릿 SQL)")
+    sql_from_context: bool = Field(default=False, description="SQL을 이전 대화 문맥을 참고해 LLM으로 생성했는지 여부 (메모 저장 제외)")
 
 ### 4. 핵심 도구 함수 정의
 
 # DB 스키마 정보 생성 함수 정의
 
 def get_db_schema_info() -> str | None:
-    """데이터베이스 스키마 정보를 반환합니다."""
-    db_url = os.environ.get('DATABASE_URL')
-    if not db_url:
-        return "DATABASE_URL 환경변수가 설정되지 않았습니다."
-    
-    try:
-        with psycopg2.connect(db_url) as conn:
-            cursor = conn.cursor()
-            # PostgreSQL 정보 스키마 조회
-            cursor.execute("""
-                SELECT column_name, data_type 
-                FROM information_schema.columns 
-                WHERE table_name = 'quarterly_sales';
-            """)
-            columns = cursor.fetchall()
-            if not columns:
-                return "테이블 정보를 찾을 수 없습니다."
-            
-            schema_str = "Table: quarterly_sales\nColumns:\n"
-            for col_name, data_type in columns:
-                schema_str += f"- {col_name}: {data_type}\n"
-            return schema_str
-    except Exception as e:
-        return f"스키마 조회 중 오류 발생: {e}"
+    """데이터베이스 스키마 정보를 반환합니다. (TTL 캐시된 카탈로그 사용)"""
+    return schema_catalog.get_prompt()
 
 # # 기존 get_db_schema_info 함수를 아래 코드로 대체
 # def get_db_schema_info() -> str | None:
@@ -95,144 +110,209 @@ def get_db_schema_info() -> str | None:
 #     """
 #     return schema_str
 
-def execute_sql_query(sql: str) -> List[Dict] | str:
-    """SQL 쿼리를 실행하고 결과를 반환합니다."""
-    db_url = os.environ.get('DATABASE_URL')
-    if not db_url:
-        return "DATABASE_URL 환경변수가 설정되지 않았습니다."
-
-    try:
-        with psycopg2.connect(db_url) as conn:
-            from psycopg2.extras import RealDictCursor
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(sql)
-            return [dict(row) for row in cursor.fetchall()]
-    except psycopg2.Error as e:
-        return f"SQL 실행 오류: {e}"
+async def execute_sql_query(sql: str, params: Optional[Dict[str, Any]] = None) -> QueryResult | str:
+    """커넥션 풀에서 SQL 쿼리를 실행하고 상한이 적용된 결과를 반환합니다. (정규화 SQL 기준 결과 캐시 사용)
+    params는 SQL의 %(name)s 자리표시자 값이며, 캐시 키는 값을 채운 SQL이라 같은 질문의 LLM 생성 SQL과도 공유됩니다."""
+    cache_key = inline_binds(sql, params)
+    cached = result_cache.get(cache_key)
+    record_cache("result", cached is not None)
+    if cached is not None:
+        stats = result_cache.stats()
+        logger.info("-> 결과 캐시 적중 (hit %s / miss %s)", stats['hits'], stats['misses'])
+        return cached
+
+    # 실행 전 EXPLAIN 추정 비용 / 행 수가 예산을 넘는 쿼리는 거부 (PostgreSQL 백엔드)
+    with span("db.explain", backend=sql_backend()) as record:
+        rejection = await admit_sql(sql, params)
+        if rejection:
+            record["rejected"] = rejection
+            logger.warning("-> %s", rejection)
+            return rejection
+
+    # 서버 측 statement_timeout에 여유를 둔 클라이언트 측 상한 (초과 시 서버 쿼리도 취소됨)
+    timeout_sec = query_pool.statement_timeout_ms / 1000 + 5
+    if sql_backend() == "duckdb":
+        # 로컬 Parquet 스냅샷 위의 DuckDB 컬럼형 엔진으로 실행 (PostgreSQL 방언은 자동 변환)
+        from duckdb_backend import duckdb_backend
+        query = duckdb_backend.fetch_bounded(sql, params)
+    else:
+        query = query_pool.fetch_bounded(sql, params)
+    with span("db.query", backend=sql_backend()) as record:
+        try:
+            result = await asyncio.wait_for(query, timeout=timeout_sec)
+        except asyncio.TimeoutError:
+            record["timeout"] = True
+            return f"SQL 실행 오류: {timeout_sec:.0f}초 내에 쿼리가 완료되지 않아 취소했습니다."
+        if isinstance(result, str):
+            record["error"] = result
+        else:
+            record["rows"] = len(result.rows)
+            record["total_rows"] = result.total_rows
+
+    # 에러 메시지는 캐시하지 않음
+    if not isinstance(result, str):
+        result_cache.put(cache_key, result)
+    return result
 
 ### 5. LangGraph 노드(Node) 정의
 
-async def sql_generation_node(state: AnalysisState) -> Dict[str, Any]:
-    """사용자 질문을 바탕으로 최적화된 SQL을 생성하는 노드"""
-    print("\n[Node: SQL Generation]")
+def refine_result_node(state: AnalysisState) -> Dict[str, Any]:
+    """직전 결과만으로 답할 수 있는 후속 질문(상위 N개, 정렬, 비중)을 SQL 생성·실행 없이 처리하는 노드"""
     user_query = state.messages[-1].content
-    db_schema = get_db_schema_info()
 
-    # [전문가 수정] WITH문(CTE)과 집계(Aggregation) 전략이 포함된 프롬프트
-    prompt = f"""
-    당신은 대한민국 서울시 상권분석을 위한 PostgreSQL 쿼리 작성 전문가입니다.
-    아래 가이드라인을 엄격히 준수하여 사용자 질문에 가장 적합한 SQL을 작성하세요.
+    refinement = None
+    # 체크포인트에 남아 있는 직전 턴의 결과가 있을 때만 후보
+    if os.environ.get("REFINE_ENABLED", "1") != "0" and state.sql_result and state.sql_query and not state.error:
+        refinement = match_refinement(user_query, list(state.sql_result[0].keys()), primary_metric(state.sql_result))
+    record_cache("refine", refinement is not None)
+    if refinement is None:
+        return {"refinement": ""}
+
+    update = {
+        "original_query": user_query, "refinement": refinement.description,
+        "cached_report": "", "sql_template": "", "error": "",
+    }
+    if not fits_previous_result(refinement, state.sql_query, state.sql_row_count, state.sql_truncated):
+        # 행 상한이나 직전 SQL의 LIMIT으로 잘린 결과 밖의 행이 필요하면 (다른 정렬, 더 많은 개수, 전체 대비 비중)
+        # 직전 SQL을 서브쿼리로 감싸 DB에서 처리
+        logger.info("-> 후속 질문: 직전 SQL을 감싸 재실행 (%s)", refinement.description)
+        return {**update, "sql_query": wrap_sql(state.sql_query, refinement), "refine_requery": True}
+
+    rows = apply_refinement(state.sql_result, refinement)
+    logger.info("-> 후속 질문: 직전 결과 %s개 행에 로컬 후처리 (%s)", len(state.sql_result), refinement.description)
+    # 로컬 결과와 같은 행을 내는 SQL을 남겨 다음 후속 질문이 줄어든 결과의 정렬 / 개수를 기준으로 판단하게 함
+    return {
+        **update, "sql_query": wrap_sql(state.sql_query, refinement), "sql_result": rows, "sql_row_count": len(rows),
+        "sql_truncated": False, "routed_sql": "", "refine_requery": False,
+    }
 
-    ### 1. 데이터베이스 스키마 정보
-    {db_schema}
+async def sql_generation_node(state: AnalysisState) -> Dict[str, Any]:
+    """사용자 질문을 바탕으로 최적화된 SQL을 생성하는 노드"""
+    user_query = state.messages[-1].content
 
-    ### 2. [필수] SQL 작성 전략 가이드
+    # 이전에 답한 (근사) 동일 질문이면 LLM 호출 없이 저장된 SQL을 재사용
+    memo = query_memo.lookup(user_query)
+    record_cache("query_memo", memo is not None)
+    if memo is not None:
+        match_type = "정확 일치" if memo.exact else f"유사 질문 일치 ({memo.score:.2f})"
+        logger.info("-> 질문 메모 캐시 적중: %s\n%s", match_type, memo.sql)
+        return {
+            "original_query": user_query, "sql_query": memo.sql, "sql_params": memo.params, "cached_report": memo.report,
+            "sql_template": "", "sql_from_context": False,
+        }
 
-    **상황 A: 시계열 비교 (성장률, 증가량 분석)**
-    - 질문 예: "2024년 1분기 대비 2025년 1분기 30대 매출이 가장 많이 늘어난 상권은?"
-    - **전략:** 반드시 **WITH문(CTE)**을 사용하여 각 시점의 데이터를 먼저 집계한 후 조인(Join)하십시오.
-    - **주의:** `quarterly_sales` 테이블은 '상권+업종' 단위로 데이터가 있습니다. 특정 업종을 언급하지 않았다면 반드시 `district_name`으로 `GROUP BY`하여 합계를 구해야 합니다.
-    
-    *(올바른 작성 예시)*
-    ```sql
-    WITH q1 AS (
-        -- 과거 시점 집계
-        SELECT district_name, SUM(sales_by_age_30s) as sales_prev
-        FROM quarterly_sales 
-        WHERE year_quarter = '20241' 
-        GROUP BY district_name
-    ),
-    q2 AS (
-        -- 현재 시점 집계
-        SELECT district_name, SUM(sales_by_age_30s) as sales_curr
-        FROM quarterly_sales 
-        WHERE year_quarter = '20251' 
-        GROUP BY district_name
-    )
-    SELECT 
-        q2.district_name,
-        (q2.sales_curr - q1.sales_prev) as sales_increase
-    FROM q2
-    JOIN q1 ON q2.district_name = q1.district_name
-    ORDER BY sales_increase DESC
-    LIMIT 3;
-    ```
-
-    **상황 B: 단순 순위 및 조건 검색**
-    - 질문 예: "2024년 전체 기간 동안 골목상권 중 매출 1위는?"
-    - **전략:** `WHERE` 절로 조건을 걸고, `GROUP BY district_name` 후 `SUM`을 사용합니다.
-    - 예: `WHERE district_type LIKE '%골목상권%' AND year_quarter LIKE '2024%'`
-
-    ### 3. 출력 제약 사항
-    - 오직 실행 가능한 순수 PostgreSQL 쿼리 텍스트만 반환하세요.
-    - Markdown 코드 블록(```sql ... ```)이나 설명은 절대 포함하지 마세요.
-    - 결과 행 수는 질문에 명시되지 않았다면 기본 `LIMIT 5`를 적용하세요.
-
-    ### 사용자의 질문:
-    {user_query}
-    """
+    # 자주 나오는 질문 유형(분기별 상위 N개, 분기 대비 증가)은 템플릿으로 바로 SQL 생성 (해석이 애매하면 LLM으로)
+    if os.environ.get("SQL_TEMPLATES_ENABLED", "1") != "0":
+        template = match_template(user_query)
+        record_cache("sql_template", template is not None)
+        if template is not None:
+            logger.info("-> 템플릿 SQL 사용: %s %s\n%s", template.name, template.params, template.sql)
+            return {
+                "original_query": user_query, "sql_query": template.sql, "sql_params": template.binds,
+                "cached_report": "", "sql_template": template.name, "sql_from_context": False,
+            }
+
+    # 고정 접두사(지침 + 스키마)는 시스템 메시지로, 유사 예시와 질문은 마지막 메시지로 구성 (프롬프트 캐시 친화)
+    # 이전 대화(윈도우 밖 요약 + 최근 질문)는 "그중", "같은 기간" 같은 후속 질문 해석에 사용
+    context = conversation_context(state.messages, state.conversation_summary)
+    prompt = build_sql_prompt(user_query, context)
     
-    response = await llm.ainvoke(prompt)
+    response = await get_llm().ainvoke(prompt)
     # 마크다운 코드 블록 제거 및 공백 정리
     sql_query = response.content.strip().replace('```sql', '').replace('```', '').strip()
     
-    print(f"-> 생성된 SQL:\n{sql_query}")
-    return {"original_query": user_query, "sql_query": sql_query}
+    logger.info("-> 생성된 SQL:\n%s", sql_query)
+    return {
+        "original_query": user_query, "sql_query": sql_query, "sql_params": {}, "cached_report": "",
+        "sql_template": "", "sql_from_context": bool(context),
+    }
 
 def sql_validation_node(state: AnalysisState) -> Dict[str, Any]:
-    """생성된 SQL을 검증하는 노드"""
-    print("\n[Node: SQL Validation]")
-    sql_query = state.sql_query.upper()
-    
-    forbidden_keywords = ["DROP", "DELETE", "TRUNCATE", "ALTER", "UPDATE", "INSERT"]
-    for keyword in forbidden_keywords:
-        if keyword in sql_query:
-            error_msg = f"보안 경고: 허용되지 않는 키워드({keyword})가 포함되어 있습니다."
-            print(f"-> {error_msg}")
-            return {"error": error_msg}
-    
-    return {"error": ""}
+    """생성된 SQL을 AST로 검증하는 노드 (단일 읽기 전용 SELECT만 허용, LIMIT 자동 추가)"""
+    sql_query, error_msg = check_sql(state.sql_query)
+    if error_msg:
+        logger.warning("-> %s", error_msg)
+        return {"error": error_msg}
+
+    if sql_query != state.sql_query:
+        logger.info("-> LIMIT 자동 추가:\n%s", sql_query)
+    return {"sql_query": sql_query, "error": ""}
+
+def sql_routing_node(state: AnalysisState) -> Dict[str, Any]:
+    """검증된 SQL 중 사전 집계(롤업)로 계산 가능한 부분을 가장 작은 롤업으로 바꾸는 노드"""
+    routed_sql, rollups_used = route_to_rollup(state.sql_query)
+    if not rollups_used:
+        return {"routed_sql": ""}
+
+    logger.info("-> 롤업 사용: %s\n%s", ', '.join(rollups_used), routed_sql)
+    return {"routed_sql": routed_sql}
 
 async def sql_execution_node(state: AnalysisState) -> Dict[str, Any]:
     """생성된 SQL을 실행하는 노드"""
-    print("\n[Node: SQL Execution]")
     
     if state.error:
-        print("-> 에러가 존재하여 실행을 건너뜀")
-        return {"sql_result": []}
+        logger.info("-> 에러가 존재하여 실행을 건너뜀")
+        return {"sql_result": [], "sql_row_count": 0, "sql_truncated": False}
 
-    sql_query = state.sql_query
-    # 비동기 환경에서 동기 함수 실행을 위해 run_in_executor 사용 권장 (혹은 to_thread)
-    result = await asyncio.to_thread(execute_sql_query, sql_query)
+    # 롤업으로 라우팅된 SQL이 있으면 그것을 실행
+    sql_query = state.routed_sql or state.sql_query
+    # asyncio 네이티브 커넥션 풀을 직접 await (스레드 점유 없음)
+    result = await execute_sql_query(sql_query, state.sql_params)
     
     if isinstance(result, str):
         # 실행 에러 발생 시
-        return {"error": result, "sql_result": []}
-        
-    print(f"-> 실행 결과: {len(result)}개 행 조회")
-    return {"sql_result": result}
+        return {"error": result, "sql_result": [], "sql_row_count": 0, "sql_truncated": False}
+
+    if result.truncated:
+        logger.info("-> 실행 결과: 전체 %s개 행 중 %s개 행만 조회 (상한 적용)", result.total_rows, len(result.rows))
+    else:
+        logger.info("-> 실행 결과: %s개 행 조회", len(result.rows))
+    return {"sql_result": result.rows, "sql_row_count": result.total_rows, "sql_truncated": result.truncated}
+
+def _append_answer(state: AnalysisState, content: str) -> Dict[str, Any]:
+    """답변 메시지를 추가하면서 메시지 윈도우를 넘는 이전 대화는 지우고 요약에 남깁니다."""
+    removals, summary = trim_history(state.messages, state.conversation_summary)
+    return {"messages": removals + [AIMessage(content=content)], "conversation_summary": summary}
 
 async def report_generation_node(state: AnalysisState) -> Dict[str, Any]:
     """최종 보고서를 생성하는 노드 (SQL 해석 능력 강화)"""
-    print("\n[Node: Report Generation]")
     
     if state.error:
-        return {"messages": [AIMessage(content=f"요청을 처리하는 중 문제가 발생했습니다.\n이유: {state.error}")]}
+        return _append_answer(state, f"요청을 처리하는 중 문제가 발생했습니다.\n이유: {state.error}")
 
     original_query = state.original_query
-    sql_query = state.sql_query
+    # 템플릿 SQL은 바인드 값을 채워 보여 줌 (실행은 자리표시자 + 바인드 값으로 함)
+    sql_query = inline_binds(state.sql_query, state.sql_params)
     sql_result = state.sql_result
 
     if not sql_result:
         report = "분석 결과, 해당 조건에 맞는 데이터가 없습니다.\n조건을 변경하여 다시 질문해 주세요."
+    elif state.cached_report:
+        logger.info("-> 동일 질문의 저장된 보고서 재사용")
+        report = state.cached_report
     else:
-        # Decimal 등 JSON 직렬화 불가 객체 처리
-        def default_converter(o):
-            if isinstance(o, decimal.Decimal):
-                return int(o)
-            return str(o)
+        # 행 수와 토큰 예산에 따라 JSON / 컬럼형 테이블 / 테이블+통계 요약 중 하나로 인코딩
+        json_result, encoding = encode_result_for_prompt(sql_result)
+        logger.info("-> 결과 인코딩: %s", encoding)
+
+        # 상한으로 잘린 결과라면 표본임을 명시하여 전체 합계·순위로 오해하지 않게 함
+        sample_note = ""
+        if state.sql_truncated:
+            sample_note = (
+                f"\n        (주의: 전체 {state.sql_row_count}개 행 중 앞의 {len(sql_result)}개 행만 포함된 표본입니다. "
+                "보고서에 표본 기준임을 밝히세요.)"
+            )
+
+        # 후속 질문이면 직전 결과에 적용한 후처리를 함께 알려 질문 문맥을 이해하게 함
+        refinement_note = ""
+        if state.refinement:
+            refinement_note = f"\n        3. **직전 결과에 적용한 후처리:** {state.refinement}"
 
-        json_result = json.dumps(sql_result, indent=2, ensure_ascii=False, default=default_converter)
+        # 이전 대화 문맥 (요약 + 최근 질문)이 있으면 질문이 무엇을 이어받는지 알 수 있게 함
+        context = conversation_context(state.messages, state.conversation_summary)
+        context_note = ""
+        if context:
+            context_note = "\n\n        ### 이전 대화 (참고용)\n        " + context.replace("\n", "\n        ")
 
         # [전문가 수정] SQL 쿼리를 프롬프트에 포함하여 데이터 문맥(Context) 이해도 향상
         prompt = f"""
@@ -240,9 +320,9 @@ async def report_generation_node(state: AnalysisState) -> Dict[str, Any]:
         
         ### 분석 작업 정보
         1. **사용자 질문:** {original_query}
-        2. **실행된 SQL 쿼리:** {sql_query}
+        2. **실행된 SQL 쿼리:** {sql_query}{refinement_note}{context_note}
         
-        ### 데이터베이스 조회 결과:
+        ### 데이터베이스 조회 결과:{sample_note}
         {json_result}
 
         ### 작성 가이드
@@ -251,47 +331,124 @@ async def report_generation_node(state: AnalysisState) -> Dict[str, Any]:
         - 금액 단위가 크다면 '억', '천만' 등으로 가독성 있게 표현하세요.
         - 보고서는 깔끔한 마크다운 형식으로 작성하세요.
         """
-        response = await llm.ainvoke(prompt)
-        report = response.content
+        # 토큰 단위 스트리밍 (stream_agent의 "messages" 모드로 UI에 실시간 전달됨)
+        report = ""
+        async for chunk in get_llm().astream(prompt):
+            report += chunk.content
+
+    # 정상 처리된 질문의 SQL과 보고서를 메모 캐시에 저장
+    # (후속 질문이나 "그럼 강남구는?"처럼 이전 대화 문맥으로 SQL을 만든 질문은 질문만으로 재현되지 않으므로 제외)
+    if not state.refinement and not state.sql_from_context:
+        query_memo.remember(original_query, state.sql_query, report if sql_result else "", state.sql_params)
 
     final_content = f"### 분석 보고서\n{report}\n\n---\n\n### 실행된 SQL 쿼리\n```sql\n{sql_query}\n```"
-    return {"messages": [AIMessage(content=final_content)]}
+    if state.refinement:
+        final_content += f"\n\n(직전 결과에 적용한 후처리: {state.refinement})"
+    return _append_answer(state, final_content)
 
 ### 6. 그래프 생성 함수
 def create_agent():
-    memory = MemorySaver()
+    # 첫 질문에서 스키마 조회 지연이 생기지 않도록 카탈로그를 미리 로드
+    schema_catalog.preload()
+    # METRICS_PORT가 설정되어 있으면 /metrics 엔드포인트 시작 (프로세스당 1회)
+    start_metrics_server()
+    # 유휴 시간 / 전체 용량 상한이 있는 체크포인트 저장소 (CHECKPOINT_BACKEND=sqlite 이면 로컬 파일에 영속화)
+    memory = create_checkpointer()
     
     graph_builder = StateGraph(AnalysisState)
-    graph_builder.add_node("generate_sql", sql_generation_node)
-    graph_builder.add_node("validate_sql", sql_validation_node)
-    graph_builder.add_node("execute_sql", sql_execution_node)
-    graph_builder.add_node("generate_report", report_generation_node)
+    graph_builder.add_node("refine_result", traced_node("refine_result", refine_result_node))
+    graph_builder.add_node("generate_sql", traced_node("generate_sql", sql_generation_node))
+    graph_builder.add_node("validate_sql", traced_node("validate_sql", sql_validation_node))
+    graph_builder.add_node("route_sql", traced_node("route_sql", sql_routing_node))
+    graph_builder.add_node("execute_sql", traced_node("execute_sql", sql_execution_node))
+    graph_builder.add_node("generate_report", traced_node("generate_report", report_generation_node))
     
-    graph_builder.set_entry_point("generate_sql")
+    graph_builder.set_entry_point("refine_result")
+
+    # 후속 질문 분기: 새 질문이면 SQL 생성, 로컬 처리했으면 바로 보고서, 서브쿼리로 감쌌으면 검증부터
+    def check_refinement(state: AnalysisState):
+        if not state.refinement:
+            return "generate_sql"
+        if state.refine_requery:
+            return "validate_sql"
+        return "generate_report"
+
+    graph_builder.add_conditional_edges(
+        "refine_result",
+        check_refinement,
+        {
+            "generate_sql": "generate_sql",
+            "validate_sql": "validate_sql",
+            "generate_report": "generate_report"
+        }
+    )
     graph_builder.add_edge("generate_sql", "validate_sql")
     
     # 조건부 엣지: 에러 발생 시 리포트 생성으로 건너뜀
     def check_error(state: AnalysisState):
         if state.error:
             return "generate_report"
-        return "execute_sql"
+        return "route_sql"
 
     graph_builder.add_conditional_edges(
         "validate_sql",
         check_error,
         {
             "generate_report": "generate_report",
-            "execute_sql": "execute_sql"
+            "route_sql": "route_sql"
         }
     )
     
+    graph_builder.add_edge("route_sql", "execute_sql")
     graph_builder.add_edge("execute_sql", "generate_report")
     graph_builder.add_edge("generate_report", END)
 
     return graph_builder.compile(checkpointer=memory)
 
-### 7. 메인 실행
+### 7. 스트리밍 실행 헬퍼
+def describe_progress(node_name: str, update: Dict[str, Any] | None) -> str | None:
+    """노드 완료 이벤트를 사용자에게 보여줄 진행 메시지로 변환합니다."""
+    update = update or {}
+    if update.get("error"):
+        return f"⚠️ {update['error']}"
+    if node_name == "refine_result":
+        if update.get("refinement"):
+            return f"✅ 직전 결과를 이어서 분석합니다. ({update['refinement']})"
+        return None
+    if node_name == "generate_sql":
+        if update.get("cached_report"):
+            return "✅ 이전에 분석한 질문입니다. 저장된 SQL을 재사용합니다."
+        if update.get("sql_template"):
+            return "✅ SQL 생성 완료 (자주 묻는 질문 유형)"
+        return "✅ SQL 생성 완료"
+    if node_name == "validate_sql":
+        return "✅ SQL 검증 완료"
+    if node_name == "execute_sql":
+        if update.get("sql_truncated"):
+            return f"✅ 데이터 조회 완료 (전체 {update['sql_row_count']}개 중 {len(update['sql_result'])}개 행)"
+        return f"✅ 데이터 조회 완료 ({len(update.get('sql_result', []))}개 행)"
+    return None
+
+async def stream_agent(agent, inputs: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """그래프를 실행하며 ("progress", 메시지), ("token", 보고서 토큰), ("final", 최종 상태) 이벤트를 순서대로 내보냅니다."""
+    async for mode, payload in agent.astream(inputs, config=config, stream_mode=["updates", "messages"]):
+        if mode == "messages":
+            chunk, metadata = payload
+            # 보고서 노드의 LLM 토큰만 전달 (SQL 생성 토큰 및 완성된 최종 메시지는 제외)
+            if isinstance(chunk, AIMessageChunk) and metadata.get("langgraph_node") == "generate_report" and chunk.content:
+                yield "token", chunk.content
+        elif mode == "updates":
+            for node_name, update in payload.items():
+                message = describe_progress(node_name, update)
+                if message:
+                    yield "progress", message
+
+    snapshot = await agent.aget_state(config)
+    yield "final", snapshot.values
+
+### 8. 메인 실행
 async def main():
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(message)s")
     agent_executor = create_agent()
     
     print("==================================================")
@@ -309,14 +466,31 @@ async def main():
             config = {"configurable": {"thread_id": thread_id}}
             print("AI 에이전트: (분석 중...)")
 
-            final_state = await agent_executor.ainvoke(
-                {"messages": [HumanMessage(content=user_input)]}, 
+            final_state = None
+            streamed = False
+            async for kind, payload in stream_agent(
+                agent_executor,
+                {"messages": [HumanMessage(content=user_input)]},
                 config=config
-            )
-            
-            final_answer = final_state['messages'][-1].content
-            print("\n" + "="*25 + " 최종 결과 " + "="*25)
-            print(final_answer)
+            ):
+                if kind == "progress":
+                    print(payload, flush=True)
+                elif kind == "token":
+                    if not streamed:
+                        print("\n" + "="*25 + " 최종 결과 " + "="*25)
+                        print("### 분석 보고서")
+                        streamed = True
+                    print(payload, end="", flush=True)
+                elif kind == "final":
+                    final_state = payload
+
+            if streamed:
+                # 보고서 본문은 이미 출력했으므로 실행된 SQL만 덧붙임
+                print(f"\n\n---\n\n### 실행된 SQL 쿼리\n```sql\n{inline_binds(final_state['sql_query'], final_state.get('sql_params'))}\n```")
+            else:
+                final_answer = final_state['messages'][-1].content
+                print("\n" + "="*25 + " 최종 결과 " + "="*25)
+                print(final_answer)
             print("="*62)
 
         except KeyboardInterrupt:
@@ -324,8 +498,50 @@ async def main():
         except Exception as e:
             print(f"[CRITICAL] 오류 발생: {e}")
 
+async def main_batch(args) -> None:
+    """JSONL 질문 파일을 동시에 실행하고 결과를 JSONL로 기록합니다. (batch_runner 참고)"""
+    from batch_runner import TokenRateLimiter, load_batch_questions, run_batch
+
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "WARNING"), format="%(message)s")
+    limiter = None
+    if args.rpm or args.tpm:
+        # LLM 호출마다 분당 요청 / 토큰 한도를 지키도록 모델에 리미터를 연결
+        limiter = TokenRateLimiter(requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+        set_llm(get_llm().model_copy(update={"rate_limiter": limiter}))
+
+    agent_executor = create_agent()
+    questions = load_batch_questions(args.batch)
+    start = time.perf_counter()
+    summary = await run_batch(
+        agent_executor,
+        questions,
+        args.output,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        limiter=limiter,
+    )
+    print(
+        f"완료: 성공 {summary['ok']}건, 실패 {summary['error']}건, 건너뜀 {summary['skipped']}건 "
+        f"({time.perf_counter() - start:.1f}초) → {args.output}"
+    )
+
+async def run_cli(args) -> None:
+    """CLI 진입점: asyncio.run이 루프를 닫기 전에 그 루프에 묶인 커넥션 풀을 닫습니다."""
+    try:
+        await (main_batch(args) if args.batch else main())
+    finally:
+        await query_pool.close()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="서울시 상권 분석 AI 에이전트")
+    parser.add_argument("--batch", help="JSONL 질문 파일 (지정하면 대화형 대신 일괄 실행)")
+    parser.add_argument("--output", default="batch_results.jsonl", help="일괄 실행 결과 JSONL 파일 (이어 실행 기준)")
+    parser.add_argument("--concurrency", type=int, default=4, help="동시에 실행할 질문 수")
+    parser.add_argument("--rpm", type=int, default=0, help="LLM 분당 요청 수 한도 (0이면 제한 없음)")
+    parser.add_argument("--tpm", type=int, default=0, help="LLM 분당 토큰 수 한도 (0이면 제한 없음)")
+    parser.add_argument("--retries", type=int, default=3, help="질문별 최대 재시도 횟수")
+    cli_args = parser.parse_args()
     try:
-        asyncio.run(main())
+        asyncio.run(run_cli(cli_args))
     except KeyboardInterrupt:
         print("\n프로그램 실행이 중단되었습니다.")
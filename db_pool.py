@@ -0,0 +1,255 @@
+### asyncio 기반 PostgreSQL 커넥션 풀
+# 질문마다 새 커넥션을 여는 대신 psycopg 3의 AsyncConnectionPool을 재사용합니다.
+# - 최소/최대 풀 크기 제한, 커넥션 대여 시 헬스 체크
+# - 쿼리별 statement_timeout
+# - 태스크 취소(세션 이탈, 타임아웃) 시 서버 측 쿼리 취소 (cancel_safe로 이벤트 루프를 막지 않음)
+# - 이벤트 루프가 바뀌면 이전 루프의 풀은 그 루프에서 닫음 (asyncio.run으로 루프를 소유하는 진입점은 끝날 때 close())
+# - 서버 측(named) 커서 + fetchmany 배치로 행 수 / 바이트 상한까지만 가져오기
+# - numeric(SUM(bigint) 결과 등)은 드라이버 단계에서 Decimal 대신 int / float로 읽기
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import psycopg
+from psycopg.adapt import Loader
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from result_cache import estimate_size
+from telemetry import metrics, record_db
+
+logger = logging.getLogger(__name__)
+
+# 커넥션마다 한 번에 하나의 커서만 열리므로 고정 이름을 사용
+CURSOR_NAME = "agent_result_cursor"
+
+# 서버 측 쿼리 취소 요청을 기다리는 최대 시간
+CANCEL_TIMEOUT_SEC = 5.0
+
+
+def sql_backend() -> str:
+    """SQL 실행 백엔드 이름 (postgres 또는 duckdb)"""
+    return os.environ.get("SQL_BACKEND", "postgres").lower()
+
+
+class NumericToNumberLoader(Loader):
+    """numeric 값을 정수면 int, 소수면 float으로 읽는 텍스트 로더
+    (Decimal로 받으면 pandas가 object 컬럼으로 취급하고, 보고서 / 캐시 단계에서 매번 변환해야 함)"""
+
+    def load(self, data) -> int | float:
+        text = bytes(data)
+        if text.lstrip(b"-").isdigit():
+            return int(text)
+        # 소수, NaN / Infinity
+        return float(text)
+
+
+async def configure_connection(conn: psycopg.AsyncConnection) -> None:
+    """풀에서 새 커넥션을 만들 때 한 번 실행되는 드라이버 설정"""
+    conn.adapters.register_loader("numeric", NumericToNumberLoader)
+
+
+@dataclass
+class QueryResult:
+    """상한이 적용된 조회 결과"""
+    rows: List[Dict]
+    total_rows: int
+    truncated: bool
+
+
+async def _cancel_server_query(conn: psycopg.AsyncConnection) -> None:
+    """클라이언트 측 태스크만 멈추면 서버는 계속 쿼리를 실행하므로 명시적으로 취소합니다.
+    (동기 cancel()은 취소 요청 연결을 맺는 동안 이벤트 루프를 막음)"""
+    try:
+        await conn.cancel_safe(timeout=CANCEL_TIMEOUT_SEC)
+    except psycopg.Error:
+        # 취소 요청이 실패해도 서버 측 statement_timeout이 쿼리를 끝냄
+        pass
+
+
+class QueryPool:
+    """이벤트 루프별로 하나의 AsyncConnectionPool을 관리합니다."""
+
+    def __init__(self):
+        self._pool: Optional[AsyncConnectionPool] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def statement_timeout_ms(self) -> int:
+        return int(os.environ.get("SQL_STATEMENT_TIMEOUT_MS", "15000"))
+
+    async def get_pool(self) -> AsyncConnectionPool | str:
+        """현재 이벤트 루프에 묶인 풀을 반환합니다. (필요 시 생성)"""
+        db_url = os.environ.get('DATABASE_URL')
+        if not db_url:
+            return "DATABASE_URL 환경변수가 설정되지 않았습니다."
+
+        loop = asyncio.get_running_loop()
+        if self._pool is not None and self._loop is loop:
+            return self._pool
+
+        # 풀은 생성된 이벤트 루프에서만 사용할 수 있으므로, 루프가 바뀌면 이전 풀을 닫고 새로 만듭니다.
+        if self._loop is not loop:
+            self._detach()
+            self._lock = asyncio.Lock()
+            self._loop = loop
+
+        async with self._lock:
+            if self._pool is None:
+                pool = AsyncConnectionPool(
+                    db_url,
+                    min_size=int(os.environ.get("DB_POOL_MIN_SIZE", "1")),
+                    max_size=int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                    max_idle=float(os.environ.get("DB_POOL_MAX_IDLE", "300")),
+                    timeout=float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", "10")),
+                    check=AsyncConnectionPool.check_connection,
+                    configure=configure_connection,
+                    open=False,
+                )
+                await pool.open()
+                self._pool = pool
+        return self._pool
+
+    @property
+    def max_rows(self) -> int:
+        return int(os.environ.get("SQL_MAX_ROWS", "500"))
+
+    @property
+    def max_bytes(self) -> int:
+        return int(os.environ.get("SQL_MAX_BYTES", str(5 * 1024 * 1024)))
+
+    async def fetch_bounded(
+        self,
+        sql: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout_ms: Optional[int] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> QueryResult | str:
+        """읽기 전용 트랜잭션에서 SQL을 서버 측 커서로 실행하고, 상한까지만 배치로 가져옵니다.
+        params는 SQL의 %(name)s 자리표시자에 바인딩할 값입니다. (없으면 SQL의 %를 그대로 둠)"""
+        pool = await self.get_pool()
+        if isinstance(pool, str):
+            return pool
+
+        if timeout_ms is None:
+            timeout_ms = self.statement_timeout_ms
+        if max_rows is None:
+            max_rows = self.max_rows
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        batch_size = int(os.environ.get("SQL_FETCH_BATCH", "100"))
+
+        try:
+            acquire_start = time.perf_counter()
+            async with pool.connection() as conn:
+                record_db("postgres", "connect", time.perf_counter() - acquire_start)
+                try:
+                    async with conn.transaction():
+                        await conn.execute("SET TRANSACTION READ ONLY")
+                        await conn.execute(
+                            "SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),)
+                        )
+                        async with conn.cursor(name=CURSOR_NAME, row_factory=dict_row) as cursor:
+                            execute_start = time.perf_counter()
+                            await cursor.execute(sql, params or None)
+                            fetch_start = time.perf_counter()
+                            record_db("postgres", "execute", fetch_start - execute_start)
+
+                            rows: List[Dict] = []
+                            used_bytes = 0
+                            truncated = False
+                            while len(rows) < max_rows:
+                                batch = await cursor.fetchmany(min(batch_size, max_rows - len(rows)))
+                                if not batch:
+                                    break
+                                for row in batch:
+                                    used_bytes += estimate_size(row)
+                                    if used_bytes > max_bytes:
+                                        truncated = True
+                                        break
+                                    rows.append(row)
+                                if truncated or len(batch) < batch_size:
+                                    break
+
+                            # 상한에 걸렸을 때 남은 행은 전송하지 않고 서버에서 개수만 셈
+                            total_rows = len(rows)
+                            if truncated or len(rows) >= max_rows:
+                                moved = await conn.execute(f'MOVE FORWARD ALL IN "{CURSOR_NAME}"')
+                                # 바이트 상한으로 중단한 경우 이미 받았지만 버린 행도 포함
+                                fetched = cursor.rownumber or len(rows)
+                                total_rows = fetched + max(moved.rowcount, 0)
+                                truncated = total_rows > len(rows)
+                            record_db("postgres", "fetch", time.perf_counter() - fetch_start)
+                            metrics.inc("agent_db_rows_total", len(rows), backend="postgres")
+                            return QueryResult(rows=rows, total_rows=total_rows, truncated=truncated)
+                except asyncio.CancelledError:
+                    await _cancel_server_query(conn)
+                    raise
+        except psycopg.Error as e:
+            return f"SQL 실행 오류: {e}"
+
+    async def explain(
+        self, sql: str, params: Optional[Dict[str, Any]] = None, timeout_ms: Optional[int] = None,
+    ) -> Dict | str:
+        """SQL을 실행하지 않고 EXPLAIN (FORMAT JSON)의 최상위 Plan(추정 비용 / 행 수)을 반환합니다."""
+        pool = await self.get_pool()
+        if isinstance(pool, str):
+            return pool
+        if timeout_ms is None:
+            timeout_ms = self.statement_timeout_ms
+
+        try:
+            async with pool.connection() as conn:
+                try:
+                    async with conn.transaction():
+                        await conn.execute("SET TRANSACTION READ ONLY")
+                        await conn.execute(
+                            "SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),)
+                        )
+                        cursor = await conn.execute(f"EXPLAIN (FORMAT JSON) {sql}", params or None)
+                        (plan,) = await cursor.fetchone()
+                except asyncio.CancelledError:
+                    await _cancel_server_query(conn)
+                    raise
+        except psycopg.Error as e:
+            return f"SQL 실행 오류: {e}"
+        # json 타입은 드라이버가 파싱하지만, 텍스트로 오는 경우도 처리
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    def _detach(self) -> None:
+        """다른 이벤트 루프에 묶인 현재 풀을 떼어 내고, 그 루프가 아직 돌고 있으면 거기서 닫게 합니다.
+        (풀의 작업자 태스크와 락이 그 루프에 묶여 있어 다른 루프에서는 닫을 수 없음)"""
+        pool, loop = self._pool, self._loop
+        self._pool = None
+        self._loop = None
+        if pool is None:
+            return
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(pool.close(), loop)
+        else:
+            # 루프가 풀을 닫지 않고 끝났으면 작업자 태스크도 이미 사라졌으므로 남은 커넥션은 GC 때 닫힘
+            logger.warning("이벤트 루프가 커넥션 풀을 닫지 않고 종료되었습니다. (진입점에서 query_pool.close() 필요)")
+
+    async def close(self) -> None:
+        """풀을 닫습니다. (이벤트 루프를 소유한 진입점이 루프가 끝나기 전에 호출)"""
+        if self._pool is None:
+            return
+        if self._loop is not asyncio.get_running_loop():
+            self._detach()
+            return
+        pool = self._pool
+        self._pool = None
+        self._loop = None
+        await pool.close()
+
+
+# 프로세스 전역 풀 인스턴스
+query_pool = QueryPool()
@@ -0,0 +1,347 @@
+### DuckDB(Parquet 스냅샷) 실행 백엔드
+# SQL_BACKEND=duckdb 로 설정하면 execute_sql_query가 PostgreSQL 대신
+# 로컬 Parquet 스냅샷 위의 DuckDB 벡터화 컬럼 스캔으로 쿼리를 실행합니다.
+# - 스냅샷은 PostgreSQL에서 COPY로 내려받아 year_quarter 순으로 정렬된 Parquet로 저장 (행 그룹 min/max로 분기 필터 가지치기)
+# - sql_generation_node가 만드는 PostgreSQL 방언은 sqlglot으로 DuckDB 방언으로 변환
+#
+# 사용법:
+#   python duckdb_backend.py export   # PostgreSQL → Parquet 스냅샷 갱신
+import asyncio
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import duckdb
+import psycopg2
+import sqlglot
+
+from db_pool import QueryResult
+from result_cache import estimate_size, result_cache
+from telemetry import metrics, record_db
+from schema_catalog import schema_catalog, SchemaSnapshot, TABLE_NAME, DEFAULT_COLUMN_DESCRIPTIONS, SAMPLE_COLUMNS, SAMPLE_LIMIT
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+# PostgreSQL 타입 → DuckDB 타입 (CSV 읽기 시 명시적 타입 지정용)
+_PG_TO_DUCKDB_TYPES = {
+    "text": "VARCHAR",
+    "character varying": "VARCHAR",
+    "smallint": "SMALLINT",
+    "integer": "INTEGER",
+    "bigint": "BIGINT",
+    "numeric": "DOUBLE",
+    "real": "FLOAT",
+    "double precision": "DOUBLE",
+    "date": "DATE",
+}
+
+# DuckDB 타입 → 스키마 카탈로그(PostgreSQL 명칭) 타입
+_DUCKDB_TO_PG_TYPES = {
+    "VARCHAR": "text",
+    "SMALLINT": "smallint",
+    "INTEGER": "integer",
+    "BIGINT": "bigint",
+    "HUGEINT": "numeric",
+    "FLOAT": "real",
+    "DOUBLE": "double precision",
+    "DATE": "date",
+}
+
+
+def snapshot_path() -> str:
+    return os.environ.get("DUCKDB_SNAPSHOT_PATH", os.path.join(folder_path, ".cache", "quarterly_sales.parquet"))
+
+
+@functools.lru_cache(maxsize=1024)
+def translate_sql(sql: str) -> str:
+    """PostgreSQL 방언 SQL을 DuckDB 방언으로 변환합니다. 변환에 실패하면 원문을 그대로 사용합니다.
+    (원문 실행이 실패했을 때만 사용하여, 변환으로 결과 컬럼명이 바뀌는 것을 피합니다.)"""
+    try:
+        return sqlglot.transpile(sql, read="postgres", write="duckdb")[0]
+    except sqlglot.errors.SqlglotError:
+        return sql
+
+
+### 1. 스냅샷 내보내기
+
+def export_snapshot(path: Optional[str] = None) -> str:
+    """PostgreSQL의 quarterly_sales를 COPY로 내려받아 Parquet 스냅샷으로 저장합니다."""
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        return "DATABASE_URL 환경변수가 설정되지 않았습니다."
+    path = path or snapshot_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    csv_path = None
+    try:
+        with psycopg2.connect(db_url) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_name = %s
+                ORDER BY ordinal_position;
+            """, (TABLE_NAME,))
+            columns = cursor.fetchall()
+            if not columns:
+                return "테이블 정보를 찾을 수 없습니다."
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", dir=os.path.dirname(path), delete=False) as csv_file:
+                csv_path = csv_file.name
+                cursor.copy_expert(
+                    f"COPY (SELECT * FROM {TABLE_NAME} ORDER BY year_quarter) TO STDOUT WITH (FORMAT csv, HEADER true)",
+                    csv_file,
+                )
+    except psycopg2.Error as e:
+        if csv_path:
+            os.remove(csv_path)
+        return f"스냅샷 내보내기 오류: {e}"
+
+    try:
+        column_types = ", ".join(
+            f"'{name}': '{_PG_TO_DUCKDB_TYPES.get(data_type, 'VARCHAR')}'" for name, data_type in columns
+        )
+        tmp_path = path + ".tmp"
+        with duckdb.connect() as conn:
+            conn.execute(f"""
+                COPY (
+                    SELECT * FROM read_csv({_quote(csv_path)}, header = true, columns = {{{column_types}}})
+                ) TO {_quote(tmp_path)} (FORMAT parquet, COMPRESSION zstd)
+            """)
+        # 실행 중인 조회가 반쯤 쓰인 파일을 읽지 않도록 원자적으로 교체
+        os.replace(tmp_path, path)
+    finally:
+        os.remove(csv_path)
+
+    duckdb_backend.reload()
+    schema_catalog.invalidate()
+    result_cache.invalidate()
+    return f"스냅샷 저장 완료: {path}"
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+### 2. 쿼리 실행
+
+class _Snapshot:
+    """한 스냅샷 파일에 연결된 DuckDB 연결과 그 연결에서 만든 사용 중 커서 수"""
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, mtime: float):
+        self.conn = conn
+        self.mtime = mtime
+        self.users = 0
+        self.retired = False
+
+
+class DuckDBBackend:
+    """Parquet 스냅샷 위에 quarterly_sales 뷰를 올린 DuckDB 연결을 관리합니다."""
+
+    def __init__(self):
+        self._current: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> Tuple[_Snapshot, duckdb.DuckDBPyConnection] | str:
+        """스냅샷이 바뀌었으면 새 연결로 교체하고, 현재 연결에서 만든 커서를 사용 중으로 등록해 반환합니다.
+        교체된 이전 연결은 사용 중인 커서가 모두 반납된 뒤 _release에서 닫습니다."""
+        path = snapshot_path()
+        if not os.path.exists(path):
+            return f"DuckDB 스냅샷 파일이 없습니다: {path} (python duckdb_backend.py export 로 생성하세요)"
+
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            current = self._current
+            if current is None or current.mtime != mtime:
+                conn = duckdb.connect()
+                conn.execute(f"CREATE VIEW {TABLE_NAME} AS SELECT * FROM read_parquet({_quote(path)})")
+                # 생성된 SQL이 스냅샷 외의 로컬 파일(.env 등)을 읽지 못하도록 파일 접근을 스냅샷 하나로 제한하고 설정을 잠금
+                conn.execute(f"SET allowed_paths = [{_quote(path)}]")
+                conn.execute("SET enable_external_access = false")
+                conn.execute("SET lock_configuration = true")
+                if current is not None:
+                    current.retired = True
+                    if current.users == 0:
+                        current.conn.close()
+                current = self._current = _Snapshot(conn, mtime)
+            current.users += 1
+            # 스레드별 커서 (DuckDB 커서는 같은 데이터베이스를 공유하는 독립 연결)
+            return current, current.conn.cursor()
+
+    def _release(self, snapshot: _Snapshot, cursor: duckdb.DuckDBPyConnection) -> None:
+        cursor.close()
+        with self._lock:
+            snapshot.users -= 1
+            if snapshot.retired and snapshot.users == 0:
+                snapshot.conn.close()
+
+    def reload(self) -> None:
+        """다음 조회에서 스냅샷을 다시 열도록 합니다."""
+        with self._lock:
+            if self._current is not None:
+                self._current.mtime = None
+
+    def load_schema_snapshot(self) -> SchemaSnapshot | str:
+        """스키마 카탈로그가 DuckDB 백엔드일 때 사용하는 메타데이터 로더"""
+        acquired = self._acquire()
+        if isinstance(acquired, str):
+            return acquired
+        snapshot, cursor = acquired
+        try:
+            rows = cursor.execute("""
+                SELECT column_name, data_type
+                FROM information_schema.columns
+                WHERE table_name = ?
+                ORDER BY ordinal_position
+            """, [TABLE_NAME]).fetchall()
+            if not rows:
+                return "테이블 정보를 찾을 수 없습니다."
+            columns = [
+                (name, _DUCKDB_TO_PG_TYPES.get(data_type, data_type.lower()), DEFAULT_COLUMN_DESCRIPTIONS.get(name, ""))
+                for name, data_type in rows
+            ]
+            column_names = {name for name, _ in rows}
+
+            samples = {}
+            for col_name in SAMPLE_COLUMNS:
+                if col_name in column_names:
+                    values = cursor.execute(
+                        f'SELECT DISTINCT "{col_name}" FROM {TABLE_NAME} WHERE "{col_name}" IS NOT NULL ORDER BY 1 LIMIT ?',
+                        [SAMPLE_LIMIT],
+                    ).fetchall()
+                    samples[col_name] = [str(value) for (value,) in values]
+
+            quarter_range = None
+            if "year_quarter" in column_names:
+                first, last = cursor.execute(f"SELECT MIN(year_quarter), MAX(year_quarter) FROM {TABLE_NAME}").fetchone()
+                if first is not None:
+                    quarter_range = (str(first), str(last))
+            return SchemaSnapshot(columns=columns, samples=samples, quarter_range=quarter_range)
+        except duckdb.Error as e:
+            return f"스키마 조회 중 오류 발생: {e}"
+        finally:
+            self._release(snapshot, cursor)
+
+    def _fetch_bounded_sync(
+        self, snapshot: _Snapshot, cursor: duckdb.DuckDBPyConnection, sql: str, params: Optional[Dict[str, Any]],
+        max_rows: int, max_bytes: int,
+    ) -> QueryResult | str:
+        batch_size = int(os.environ.get("SQL_FETCH_BATCH", "100"))
+        try:
+            execute_start = time.perf_counter()
+            executed = sql
+            if params:
+                # %(name)s 자리표시자는 DuckDB의 $name 으로 바꿔야 하므로 바로 변환
+                executed = translate_sql(sql)
+                cursor.execute(executed, params)
+            else:
+                try:
+                    # DuckDB는 대부분의 PostgreSQL 문법(CTE, LIKE, ::캐스트)을 그대로 실행하므로 원문을 먼저 시도
+                    cursor.execute(sql)
+                except duckdb.Error:
+                    executed = translate_sql(sql)
+                    if executed == sql:
+                        raise
+                    cursor.execute(executed)
+            columns = [desc[0] for desc in cursor.description]
+            # DECIMAL 컬럼은 Decimal 대신 float으로 읽음 (PostgreSQL 백엔드의 numeric 로더와 같은 결과 타입)
+            decimal_columns = [i for i, desc in enumerate(cursor.description) if str(desc[1]).startswith("DECIMAL")]
+            fetch_start = time.perf_counter()
+            record_db("duckdb", "execute", fetch_start - execute_start)
+
+            rows: List[Dict] = []
+            used_bytes = 0
+            truncated = False
+            while not truncated:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                for values in batch:
+                    if len(rows) >= max_rows:
+                        truncated = True
+                        break
+                    if decimal_columns:
+                        values = list(values)
+                        for i in decimal_columns:
+                            if values[i] is not None:
+                                values[i] = float(values[i])
+                    row = dict(zip(columns, values))
+                    used_bytes += estimate_size(row)
+                    if used_bytes > max_bytes:
+                        truncated = True
+                        break
+                    rows.append(row)
+
+            # 상한에 걸렸으면 남은 행을 끝까지 읽지 않고 같은 쿼리의 COUNT(*)로 전체 행 수만 계산
+            total_rows = len(rows)
+            if truncated:
+                inner = executed.strip().rstrip(";")
+                try:
+                    (total_rows,) = cursor.execute(
+                        f"SELECT COUNT(*) FROM (\n{inner}\n) AS bounded_result", params or None
+                    ).fetchone()
+                except duckdb.Error:
+                    # 셀 수 없으면 "상한보다 많음"만 표시
+                    total_rows = len(rows) + 1
+                truncated = total_rows > len(rows)
+            record_db("duckdb", "fetch", time.perf_counter() - fetch_start)
+            metrics.inc("agent_db_rows_total", len(rows), backend="duckdb")
+            return QueryResult(rows=rows, total_rows=total_rows, truncated=truncated)
+        except duckdb.Error as e:
+            return f"SQL 실행 오류: {e}"
+        finally:
+            # 스냅샷이 그 사이 교체되었다면 마지막 커서가 반납될 때 이전 연결이 닫힘
+            self._release(snapshot, cursor)
+
+    async def fetch_bounded(
+        self,
+        sql: str,
+        params: Optional[Dict[str, Any]] = None,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> QueryResult | str:
+        """DuckDB에서 SQL을 실행하고 행/바이트 상한이 적용된 결과를 반환합니다. (params는 %(name)s 자리표시자 값)"""
+        if max_rows is None:
+            max_rows = int(os.environ.get("SQL_MAX_ROWS", "500"))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("SQL_MAX_BYTES", str(5 * 1024 * 1024)))
+        acquired = self._acquire()
+        if isinstance(acquired, str):
+            return acquired
+        snapshot, cursor = acquired
+
+        # 커서 반납은 먼저 claim을 잡은 쪽이 한 번만 수행 (스레드가 시작되기 전에 취소되면 여기서 반납)
+        claim = threading.Lock()
+
+        def run() -> QueryResult | str:
+            if not claim.acquire(blocking=False):
+                return "SQL 실행 오류: 실행 전에 취소되었습니다."
+            return self._fetch_bounded_sync(snapshot, cursor, sql, params, max_rows, max_bytes)
+
+        try:
+            return await asyncio.to_thread(run)
+        except asyncio.CancelledError:
+            if claim.acquire(blocking=False):
+                self._release(snapshot, cursor)
+            else:
+                # 스레드에서 실행 중인 쿼리를 중단 (커서 반납은 스레드 쪽 finally에서)
+                cursor.interrupt()
+            raise
+
+
+# 프로세스 전역 DuckDB 백엔드 인스턴스
+duckdb_backend = DuckDBBackend()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(folder_path, '.env'))
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    if command == "export":
+        print(export_snapshot())
+    else:
+        print("사용법: python duckdb_backend.py export")
@@ -0,0 +1,479 @@
+### quarterly_sales 대량 적재 (서울시 상권분석 추정매출 CSV / JSON 덤프)
+# - quarterly_sales를 year_quarter 기준 LIST 파티션 테이블로 만들고, 분기마다 파티션을 하나씩 둡니다.
+#   (생성되는 쿼리는 거의 모두 year_quarter로 필터링하므로 실행 계획이 해당 분기 파티션만 읽음)
+# - 파일은 행 단위 INSERT 대신 COPY로 임시 스테이징 테이블에 넣은 뒤, 한 번의 INSERT ... ON CONFLICT로 반영합니다.
+#   같은 파일을 다시 적재해도 결과가 같고(멱등), 값이 바뀐 행만 갱신합니다.
+# - 적재가 끝나면 ANALYZE로 통계를 갱신하고 롤업 / 스키마 카탈로그 / 결과 캐시 / 질문 메모의 보고서 / DuckDB 스냅샷을 갱신합니다.
+#   (다른 프로세스의 메모리 캐시는 각자의 TTL로 만료)
+#
+# 사용법:
+#   python ingest.py init                                  # 파티션 테이블 / 인덱스 생성
+#   python ingest.py migrate                               # 기존 일반 테이블을 파티션 테이블로 변환
+#   python ingest.py load sales_2024.csv --quarter 20244   # 파일에서 2024년 4분기만 적재
+#   python ingest.py load rows.json                        # OpenAPI JSON 응답 / JSON 배열 / JSONL
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import psycopg2
+from psycopg2 import sql as pgsql
+
+from schema_catalog import schema_catalog, TABLE_NAME, DEFAULT_COLUMN_DESCRIPTIONS
+from result_cache import result_cache
+
+# 차원(텍스트) 컬럼 — 나머지 컬럼은 모두 bigint 지표
+DIMENSION_COLUMNS = (
+    "year_quarter", "district_type", "district_code", "district_name",
+    "service_category_code", "service_category_name",
+)
+# 한 분기 안에서 행을 식별하는 키 (파티션 키 year_quarter 포함)
+KEY_COLUMNS = ("year_quarter", "district_code", "service_category_code")
+
+# 테이블 컬럼 → 원본 파일 헤더 (서울 열린데이터광장 CSV 한글 헤더, OpenAPI JSON 필드명)
+SOURCE_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "year_quarter": ("기준_년분기_코드", "STDR_YYQU_CD"),
+    "district_type": ("상권_구분_코드_명", "TRDAR_SE_CD_NM"),
+    "district_code": ("상권_코드", "TRDAR_CD"),
+    "district_name": ("상권_코드_명", "TRDAR_CD_NM"),
+    "service_category_code": ("서비스_업종_코드", "SVC_INDUTY_CD"),
+    "service_category_name": ("서비스_업종_코드_명", "SVC_INDUTY_CD_NM"),
+    "monthly_sales_amount": ("당월_매출_금액", "THSMON_SELNG_AMT"),
+    "monthly_sales_count": ("당월_매출_건수", "THSMON_SELNG_CO"),
+    "weekday_sales_amount": ("주중_매출_금액", "MDWK_SELNG_AMT"),
+    "weekend_sales_amount": ("주말_매출_금액", "WKEND_SELNG_AMT"),
+    "sales_time_11_14": ("시간대_11~14_매출_금액", "TMZON_11_14_SELNG_AMT"),
+    "sales_time_17_21": ("시간대_17~21_매출_금액", "TMZON_17_21_SELNG_AMT"),
+    "male_sales_amount": ("남성_매출_금액", "ML_SELNG_AMT"),
+    "female_sales_amount": ("여성_매출_금액", "FML_SELNG_AMT"),
+    "sales_by_age_10s": ("연령대_10_매출_금액", "AGRDE_10_SELNG_AMT"),
+    "sales_by_age_20s": ("연령대_20_매출_금액", "AGRDE_20_SELNG_AMT"),
+    "sales_by_age_30s": ("연령대_30_매출_금액", "AGRDE_30_SELNG_AMT"),
+    "sales_by_age_40s": ("연령대_40_매출_금액", "AGRDE_40_SELNG_AMT"),
+    "sales_by_age_50s": ("연령대_50_매출_금액", "AGRDE_50_SELNG_AMT"),
+    "sales_by_age_60s_above": ("연령대_60_이상_매출_금액", "AGRDE_60_ABOVE_SELNG_AMT"),
+}
+TABLE_COLUMNS = tuple(SOURCE_ALIASES)
+
+# 조회 패턴별 인덱스 (파티션 테이블에 만들면 모든 분기 파티션에 자동으로 생성됨)
+INDEXES = (
+    ("quarterly_sales_district_name_idx", ("district_name",)),
+    ("quarterly_sales_district_type_idx", ("district_type", "district_name")),
+    ("quarterly_sales_service_category_idx", ("service_category_name",)),
+)
+
+_QUARTER_PATTERN = re.compile(r"^\d{4}[1-4]$")
+
+
+def _connect():
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        raise psycopg2.OperationalError("DATABASE_URL 환경변수가 설정되지 않았습니다.")
+    return psycopg2.connect(db_url)
+
+
+def partition_name(quarter: str) -> str:
+    return f"{TABLE_NAME}_p{quarter}"
+
+
+### 1. 파티션 테이블 / 인덱스
+
+def _table_kind(cursor) -> Optional[str]:
+    """'p' = 파티션 테이블, 'r' = 일반 테이블, None = 없음"""
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = %s AND n.nspname = current_schema();
+    """, (TABLE_NAME,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def ensure_table(cursor) -> str:
+    """파티션 테이블과 인덱스를 만듭니다. 문제가 없으면 빈 문자열, 아니면 에러 메시지를 반환합니다."""
+    kind = _table_kind(cursor)
+    if kind == "r":
+        return f"기존 {TABLE_NAME}가 파티션 테이블이 아닙니다. 먼저 'python ingest.py migrate'로 변환하세요."
+
+    if kind is None:
+        column_defs = [
+            pgsql.SQL("{col} {type}{not_null}").format(
+                col=pgsql.Identifier(col),
+                type=pgsql.SQL("text" if col in DIMENSION_COLUMNS else "bigint"),
+                not_null=pgsql.SQL(" NOT NULL" if col in KEY_COLUMNS else ""),
+            )
+            for col in TABLE_COLUMNS
+        ]
+        cursor.execute(pgsql.SQL("""
+            CREATE TABLE {table} ({columns}, PRIMARY KEY ({key}))
+            PARTITION BY LIST (year_quarter)
+        """).format(
+            table=pgsql.Identifier(TABLE_NAME),
+            columns=pgsql.SQL(", ").join(column_defs),
+            key=pgsql.SQL(", ").join(map(pgsql.Identifier, KEY_COLUMNS)),
+        ))
+        # 스키마 카탈로그가 프롬프트에 그대로 쓰는 컬럼 설명
+        for col, description in DEFAULT_COLUMN_DESCRIPTIONS.items():
+            if col in TABLE_COLUMNS:
+                cursor.execute(pgsql.SQL("COMMENT ON COLUMN {table}.{col} IS {text}").format(
+                    table=pgsql.Identifier(TABLE_NAME), col=pgsql.Identifier(col), text=pgsql.Literal(description),
+                ))
+
+    for index_name, columns in INDEXES:
+        cursor.execute(pgsql.SQL("CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})").format(
+            index=pgsql.Identifier(index_name),
+            table=pgsql.Identifier(TABLE_NAME),
+            columns=pgsql.SQL(", ").join(map(pgsql.Identifier, columns)),
+        ))
+    return ""
+
+
+def ensure_partition(cursor, quarter: str) -> None:
+    cursor.execute(pgsql.SQL("CREATE TABLE IF NOT EXISTS {partition} PARTITION OF {table} FOR VALUES IN ({quarter})").format(
+        partition=pgsql.Identifier(partition_name(quarter)),
+        table=pgsql.Identifier(TABLE_NAME),
+        quarter=pgsql.Literal(quarter),
+    ))
+
+
+def init_table() -> str:
+    try:
+        with _connect() as conn:
+            error = ensure_table(conn.cursor())
+    except psycopg2.Error as e:
+        return f"테이블 생성 오류: {e}"
+    if error:
+        return error
+    schema_catalog.invalidate()
+    return f"{TABLE_NAME} 파티션 테이블 준비 완료"
+
+
+def migrate_table() -> str:
+    """create_database_openapi.py로 만든 일반 테이블을 같은 이름의 파티션 테이블로 옮깁니다.
+    롤업 물리화 뷰는 기존 테이블에 묶여 있으므로 삭제 후 다시 생성합니다."""
+    from rollups import ROLLUPS, build_rollups
+
+    legacy = f"{TABLE_NAME}_legacy"
+    try:
+        with _connect() as conn:
+            cursor = conn.cursor()
+            if _table_kind(cursor) != "r":
+                return f"변환할 일반 {TABLE_NAME} 테이블이 없습니다."
+
+            cursor.execute("""
+                SELECT column_name FROM information_schema.columns
+                WHERE table_name = %s AND table_schema = current_schema();
+            """, (TABLE_NAME,))
+            existing = {name for (name,) in cursor.fetchall()}
+            for rollup in ROLLUPS:
+                cursor.execute(pgsql.SQL("DROP MATERIALIZED VIEW IF EXISTS {view}").format(view=pgsql.Identifier(rollup.name)))
+            cursor.execute(pgsql.SQL("ALTER TABLE {table} RENAME TO {legacy}").format(
+                table=pgsql.Identifier(TABLE_NAME), legacy=pgsql.Identifier(legacy),
+            ))
+            # 기존 테이블에 딸린 인덱스 이름과 겹치지 않도록 인덱스도 함께 이름을 바꿈
+            for index_name, _ in INDEXES:
+                cursor.execute(pgsql.SQL("ALTER INDEX IF EXISTS {index} RENAME TO {legacy_index}").format(
+                    index=pgsql.Identifier(index_name), legacy_index=pgsql.Identifier(f"{index_name}_legacy"),
+                ))
+            ensure_table(cursor)
+
+            cursor.execute(pgsql.SQL("SELECT DISTINCT year_quarter::text FROM {legacy}").format(legacy=pgsql.Identifier(legacy)))
+            quarters = sorted(quarter for (quarter,) in cursor.fetchall() if quarter)
+            invalid = [quarter for quarter in quarters if not _QUARTER_PATTERN.match(quarter)]
+            if invalid:
+                conn.rollback()
+                return f"분기 형식이 올바르지 않은 행이 있습니다: {', '.join(invalid[:5])}"
+            for quarter in quarters:
+                ensure_partition(cursor, quarter)
+
+            select = [
+                pgsql.SQL("{col}::{type}").format(
+                    col=pgsql.Identifier(col), type=pgsql.SQL("text" if col in DIMENSION_COLUMNS else "bigint"),
+                ) if col in existing else pgsql.SQL("NULL")
+                for col in TABLE_COLUMNS
+            ]
+            cursor.execute(pgsql.SQL("""
+                INSERT INTO {table} ({columns}) SELECT {select} FROM {legacy}
+                ON CONFLICT DO NOTHING
+            """).format(
+                table=pgsql.Identifier(TABLE_NAME),
+                columns=pgsql.SQL(", ").join(map(pgsql.Identifier, TABLE_COLUMNS)),
+                select=pgsql.SQL(", ").join(select),
+                legacy=pgsql.Identifier(legacy),
+            ))
+            moved = cursor.rowcount
+            cursor.execute(pgsql.SQL("DROP TABLE {legacy}").format(legacy=pgsql.Identifier(legacy)))
+    except psycopg2.Error as e:
+        return f"테이블 변환 오류: {e}"
+
+    analyze(quarters)
+    print(f"-> {build_rollups()}")
+    refresh_dependents(refresh_rollup_views=False)
+    return f"{moved}개 행을 {len(quarters)}개 분기 파티션으로 옮겼습니다."
+
+
+### 2. 원본 파일 읽기
+
+def _normalize_header(name: str) -> str:
+    return unicodedata.normalize("NFKC", name).lstrip("\ufeff").strip().strip('"').lower()
+
+
+_ALIAS_LOOKUP = {
+    _normalize_header(alias): column
+    for column, aliases in SOURCE_ALIASES.items()
+    for alias in (column, *aliases)
+}
+
+
+def map_headers(headers: Sequence[str]) -> Tuple[Dict[str, int], List[str]]:
+    """파일 헤더를 테이블 컬럼에 대응시킵니다. ({테이블 컬럼: 파일 열 위치}, 없는 테이블 컬럼 목록)"""
+    positions: Dict[str, int] = {}
+    for position, header in enumerate(headers):
+        column = _ALIAS_LOOKUP.get(_normalize_header(header))
+        if column and column not in positions:
+            positions[column] = position
+    missing = [col for col in TABLE_COLUMNS if col not in positions]
+    return positions, missing
+
+
+def _detect_encoding(path: str) -> str:
+    """열린데이터광장 CSV는 CP949인 경우가 많아 첫 부분이 UTF-8로 읽히지 않으면 CP949로 간주합니다."""
+    with open(path, "rb") as f:
+        head = f.read(64 * 1024)
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # 잘라 읽은 끝부분의 멀티바이트 문자 때문에 실패한 경우는 UTF-8
+        if e.start < len(head) - 3:
+            return "cp949"
+    return "utf-8"
+
+
+# 파이썬 인코딩 이름 → COPY ENCODING 옵션
+_COPY_ENCODINGS = {"utf-8": "UTF8", "utf-8-sig": "UTF8", "cp949": "UHC", "euc-kr": "EUC_KR"}
+
+
+def _json_rows(path: str) -> List[Dict[str, Any]]:
+    """OpenAPI 응답({"서비스명": {"row": [...]}}), JSON 배열, JSONL을 모두 행 목록으로 읽습니다."""
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def find_rows(value: Any) -> Optional[List[Dict[str, Any]]]:
+        if isinstance(value, list) and (not value or isinstance(value[0], dict)):
+            return value
+        if isinstance(value, dict):
+            for child in value.values():
+                rows = find_rows(child)
+                if rows is not None:
+                    return rows
+        return None
+
+    if isinstance(data, dict) and all(not isinstance(v, (dict, list)) for v in data.values()):
+        return [data]
+    return find_rows(data) or []
+
+
+def _copy_source(path: str, encoding: str) -> Tuple[List[str], io.IOBase, str]:
+    """(헤더, COPY에 넘길 파일 객체, COPY 인코딩)을 반환합니다. JSON은 메모리 안에서 CSV로 바꿔 넘깁니다."""
+    if path.lower().endswith((".json", ".jsonl")):
+        rows = _json_rows(path)
+        headers = list(rows[0].keys()) if rows else []
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(["" if row.get(h) is None else row.get(h) for h in headers])
+        buffer.seek(0)
+        return headers, buffer, "UTF8"
+
+    if encoding == "auto":
+        encoding = _detect_encoding(path)
+    with open(path, encoding=encoding, newline="") as f:
+        headers = next(csv.reader(f), [])
+    copy_encoding = _COPY_ENCODINGS.get(encoding.lower())
+    if copy_encoding is None:
+        raise ValueError(f"지원하지 않는 인코딩입니다: {encoding}")
+    # 헤더 줄은 COPY의 HEADER 옵션으로 건너뛰므로 BOM이 있어도 문제없음
+    return headers, open(path, "rb"), copy_encoding
+
+
+### 3. 적재
+
+def _cast(column: str, source: pgsql.Composable) -> pgsql.Composable:
+    if column in DIMENSION_COLUMNS:
+        return pgsql.SQL("NULLIF(trim({src}), '')").format(src=source)
+    # '1234.0' 처럼 소수점이 붙은 값도 허용
+    return pgsql.SQL("round(NULLIF(trim({src}), '')::numeric)::bigint").format(src=source)
+
+
+def load_file(cursor, path: str, quarters: Optional[Sequence[str]] = None, encoding: str = "auto") -> Dict[str, Tuple[int, int]]:
+    """파일 하나를 적재합니다. 반환값: {분기: (새로 추가한 행 수, 갱신한 행 수)}"""
+    headers, source, copy_encoding = _copy_source(path, encoding)
+    positions, missing = map_headers(headers)
+    missing_keys = [col for col in KEY_COLUMNS if col in missing]
+    if missing_keys:
+        source.close()
+        raise ValueError(f"{os.path.basename(path)}: 필수 컬럼을 찾을 수 없습니다 ({', '.join(missing_keys)})")
+    if missing:
+        print(f"-> {os.path.basename(path)}: 파일에 없는 컬럼은 NULL로 적재합니다 ({', '.join(missing)})")
+
+    # 1) 파일 전체를 텍스트 스테이징 테이블로 COPY (행 단위 왕복 없음)
+    staging_columns = [f"c{i}" for i in range(len(headers))]
+    cursor.execute(pgsql.SQL("CREATE TEMP TABLE ingest_staging ({columns}) ON COMMIT DROP").format(
+        columns=pgsql.SQL(", ").join(pgsql.SQL("{col} text").format(col=pgsql.Identifier(c)) for c in staging_columns),
+    ))
+    with source:
+        cursor.copy_expert(
+            f"COPY ingest_staging FROM STDIN WITH (FORMAT csv, HEADER true, ENCODING '{copy_encoding}')", source,
+        )
+
+    selected = {
+        col: _cast(col, pgsql.Identifier(staging_columns[positions[col]])) if col in positions
+        else pgsql.SQL("NULL::text" if col in DIMENSION_COLUMNS else "NULL::bigint")
+        for col in TABLE_COLUMNS
+    }
+
+    # 2) 적재할 분기 파티션 준비
+    cursor.execute(pgsql.SQL("SELECT DISTINCT {quarter} FROM ingest_staging").format(quarter=selected["year_quarter"]))
+    file_quarters = sorted(quarter for (quarter,) in cursor.fetchall() if quarter)
+    invalid = [quarter for quarter in file_quarters if not _QUARTER_PATTERN.match(quarter)]
+    if invalid:
+        raise ValueError(f"{os.path.basename(path)}: 분기 형식이 올바르지 않습니다 ({', '.join(invalid[:5])})")
+    targets = [quarter for quarter in file_quarters if not quarters or quarter in quarters]
+    for quarter in targets:
+        ensure_partition(cursor, quarter)
+
+    # 3) 멱등 upsert: 파일 안 중복 키는 마지막 행만, 값이 실제로 바뀐 행만 갱신 (불필요한 dead tuple 방지)
+    columns = pgsql.SQL(", ").join(map(pgsql.Identifier, TABLE_COLUMNS))
+    value_columns = [col for col in TABLE_COLUMNS if col not in KEY_COLUMNS]
+    cursor.execute(pgsql.SQL("""
+        WITH source AS (
+            SELECT {selected}, ctid AS source_order FROM ingest_staging
+        ), deduplicated AS (
+            SELECT DISTINCT ON ({key}) {columns} FROM source
+            WHERE year_quarter = ANY(%s)
+            ORDER BY {key}, source_order DESC
+        ), upserted AS (
+            INSERT INTO {table} ({columns}) SELECT {columns} FROM deduplicated
+            ON CONFLICT ({key}) DO UPDATE SET {updates}
+            WHERE ({current}) IS DISTINCT FROM ({incoming})
+            RETURNING year_quarter, (xmax = 0) AS inserted
+        )
+        SELECT year_quarter, COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM upserted GROUP BY year_quarter
+    """).format(
+        selected=pgsql.SQL(", ").join(
+            pgsql.SQL("{expr} AS {col}").format(expr=expr, col=pgsql.Identifier(col)) for col, expr in selected.items()
+        ),
+        key=pgsql.SQL(", ").join(map(pgsql.Identifier, KEY_COLUMNS)),
+        columns=columns,
+        table=pgsql.Identifier(TABLE_NAME),
+        updates=pgsql.SQL(", ").join(
+            pgsql.SQL("{col} = EXCLUDED.{col}").format(col=pgsql.Identifier(col)) for col in value_columns
+        ),
+        current=pgsql.SQL(", ").join(
+            pgsql.SQL("{table}.{col}").format(table=pgsql.Identifier(TABLE_NAME), col=pgsql.Identifier(col))
+            for col in value_columns
+        ),
+        incoming=pgsql.SQL(", ").join(pgsql.SQL("EXCLUDED.{col}").format(col=pgsql.Identifier(col)) for col in value_columns),
+    ), (targets,))
+    counts = {quarter: (inserted, updated) for quarter, inserted, updated in cursor.fetchall()}
+    cursor.execute("DROP TABLE ingest_staging")
+    return {quarter: counts.get(quarter, (0, 0)) for quarter in targets}
+
+
+def analyze(quarters: Sequence[str]) -> None:
+    """적재한 분기 파티션과 부모 테이블의 통계를 갱신합니다. (파티션 부모는 autovacuum이 ANALYZE하지 않음)"""
+    with _connect() as conn:
+        cursor = conn.cursor()
+        for quarter in quarters:
+            cursor.execute(pgsql.SQL("ANALYZE {partition}").format(partition=pgsql.Identifier(partition_name(quarter))))
+        cursor.execute(pgsql.SQL("ANALYZE {table}").format(table=pgsql.Identifier(TABLE_NAME)))
+
+
+def refresh_dependents(refresh_rollup_views: bool = True) -> None:
+    """데이터가 바뀐 뒤 파생 데이터와 캐시를 갱신합니다."""
+    from rollups import ROLLUPS, refresh_rollups
+    from query_memo import query_memo
+    from duckdb_backend import export_snapshot, snapshot_path
+
+    if refresh_rollup_views:
+        with _connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT matviewname FROM pg_matviews WHERE matviewname = ANY(%s)", ([r.name for r in ROLLUPS],))
+            has_rollups = len(cursor.fetchall()) == len(ROLLUPS)
+        print(f"-> {refresh_rollups()}" if has_rollups else "-> 롤업 없음 (python rollups.py build 로 생성 가능)")
+
+    schema_catalog.invalidate()
+    result_cache.invalidate()
+    # 질문 → SQL 매핑은 유효하지만 저장된 보고서는 이전 데이터 기준
+    query_memo.invalidate_reports()
+    # 로컬 DuckDB 스냅샷을 쓰고 있었다면 새 데이터로 다시 내보냄
+    if os.path.exists(snapshot_path()):
+        print(f"-> {export_snapshot()}")
+
+
+def load_files(paths: Sequence[str], quarters: Optional[Sequence[str]] = None, encoding: str = "auto", refresh: bool = True) -> str:
+    """파일들을 하나의 트랜잭션으로 적재합니다. (중간에 실패하면 아무것도 반영되지 않음)"""
+    start = time.perf_counter()
+    loaded: Dict[str, Tuple[int, int]] = {}
+    try:
+        with _connect() as conn:
+            cursor = conn.cursor()
+            error = ensure_table(cursor)
+            if error:
+                return error
+            for path in paths:
+                file_start = time.perf_counter()
+                counts = load_file(cursor, path, quarters, encoding)
+                for quarter, (inserted, updated) in counts.items():
+                    previous = loaded.get(quarter, (0, 0))
+                    loaded[quarter] = (previous[0] + inserted, previous[1] + updated)
+                print(f"-> {os.path.basename(path)}: {len(counts)}개 분기, {time.perf_counter() - file_start:.1f}초")
+    except (psycopg2.Error, ValueError, OSError) as e:
+        return f"적재 오류: {e}"
+
+    if not loaded:
+        return "적재할 분기가 없습니다."
+    analyze(sorted(loaded))
+    if refresh:
+        refresh_dependents()
+
+    lines = [f"- {quarter}: 추가 {inserted:,}행 / 갱신 {updated:,}행" for quarter, (inserted, updated) in sorted(loaded.items())]
+    return f"적재 완료 ({time.perf_counter() - start:.1f}초)\n" + "\n".join(lines)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+    parser = argparse.ArgumentParser(description="quarterly_sales 대량 적재")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="파티션 테이블 / 인덱스 생성")
+    commands.add_parser("migrate", help="기존 일반 테이블을 파티션 테이블로 변환")
+    load_parser = commands.add_parser("load", help="CSV / JSON 파일 적재")
+    load_parser.add_argument("paths", nargs="+", help="CSV, JSON, JSONL 파일")
+    load_parser.add_argument("--quarter", action="append", help="이 분기만 적재 (예: 20244, 여러 번 지정 가능)")
+    load_parser.add_argument("--encoding", default="auto", help="CSV 인코딩 (auto, utf-8, cp949, euc-kr)")
+    load_parser.add_argument("--no-refresh", action="store_true", help="롤업 / 캐시 / 스냅샷 갱신 생략")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        print(init_table())
+    elif args.command == "migrate":
+        print(migrate_table())
+    else:
+        result = load_files(args.paths, args.quarter, args.encoding, refresh=not args.no_refresh)
+        print(result)
+        if result.startswith(("적재 오류", "기존")):
+            sys.exit(1)
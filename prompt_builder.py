@@ -0,0 +1,111 @@
+### SQL 생성 프롬프트 구성
+# 제공자 측 프롬프트 캐시(동일 접두사 재사용)가 적중하도록
+# - 고정 부분(역할·작성 가이드·스키마 스냅샷)은 바이트 단위로 동일한 시스템 메시지로 맨 앞에 두고
+# - 질문마다 달라지는 부분(유사 예시, 이전 대화 문맥, 사용자 질문)은 마지막 메시지에 둡니다.
+# few-shot 예시는 sql_examples.jsonl 라이브러리에서 질문과 어휘 유사도가 높은 순으로 토큰 예산 안에서 고릅니다.
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from query_memo import LexicalIndex, normalize_question
+from result_encoding import estimate_tokens
+from schema_catalog import schema_catalog
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+# 질문과 무관한 고정 지침 (이 문자열이 바뀌면 프롬프트 캐시가 초기화되므로 불필요하게 수정하지 말 것)
+SQL_GUIDELINES = """당신은 대한민국 서울시 상권분석을 위한 PostgreSQL 쿼리 작성 전문가입니다.
+아래 가이드라인을 엄격히 준수하여 사용자 질문에 가장 적합한 SQL을 작성하세요.
+
+### 1. [필수] SQL 작성 전략 가이드
+- `quarterly_sales` 테이블은 '상권+업종' 단위로 데이터가 있습니다. 특정 업종을 언급하지 않았다면 반드시 `district_name`으로 `GROUP BY`하여 합계(`SUM`)를 구하세요.
+- 시계열 비교(성장률, 증가량)는 반드시 WITH문(CTE)으로 각 시점을 먼저 집계한 후 조인(JOIN)하세요.
+- 단순 순위 및 조건 검색은 `WHERE` 절로 조건을 걸고 `GROUP BY` 후 `SUM`을 사용하세요.
+- 상권구분은 `district_type LIKE '%골목상권%'`, 연도 전체는 `year_quarter IN ('20241', '20242', '20243', '20244')` 처럼 분기를 나열합니다. (분기 파티션만 읽도록 `LIKE`는 쓰지 마세요)
+- 비율을 구할 때는 `NULLIF(분모, 0)`으로 0으로 나누기를 막으세요.
+
+### 2. 출력 제약 사항
+- 오직 실행 가능한 순수 PostgreSQL 쿼리 텍스트만 반환하세요.
+- Markdown 코드 블록(```sql ... ```)이나 설명은 절대 포함하지 마세요.
+- 결과 행 수는 질문에 명시되지 않았다면 기본 `LIMIT 5`를 적용하세요.
+"""
+
+
+class ExampleLibrary:
+    """질문 → SQL 예시 라이브러리 (문자 bigram 어휘 유사도 색인)"""
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            path = os.environ.get("SQL_EXAMPLES_PATH", os.path.join(folder_path, "sql_examples.jsonl"))
+        self.path = path
+        self._examples: Optional[Dict[str, Dict[str, str]]] = None  # 정규화 질문 -> 예시
+        self._index = LexicalIndex()
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            if self._examples is None:
+                examples = {}
+                if os.path.exists(self.path):
+                    with open(self.path, encoding="utf-8") as f:
+                        for line in f:
+                            line = line.strip()
+                            if not line:
+                                continue
+                            record = json.loads(line)
+                            key = normalize_question(record["question"])
+                            examples[key] = {"question": record["question"], "sql": record["sql"]}
+                            self._index.add(key)
+                self._examples = examples
+            return self._examples
+
+    def select(self, question: str, token_budget: int, max_examples: int = 3) -> List[Dict[str, str]]:
+        """질문과 유사한 예시를 토큰 예산 안에서 유사도 높은 순으로 고릅니다."""
+        examples = self._load()
+        selected = []
+        used = 0
+        for key, score in self._index.rank(normalize_question(question), max_examples * 3):
+            example = examples[key]
+            cost = estimate_tokens(example["question"]) + estimate_tokens(example["sql"])
+            if used + cost > token_budget:
+                continue
+            selected.append(example)
+            used += cost
+            if len(selected) >= max_examples:
+                break
+        return selected
+
+
+# 프로세스 전역 예시 라이브러리
+example_library = ExampleLibrary()
+
+
+def static_prefix() -> str:
+    """질문과 무관한 시스템 프롬프트 (스키마 스냅샷이 바뀌기 전까지 바이트 단위로 동일)"""
+    return f"{SQL_GUIDELINES}\n### 3. 데이터베이스 스키마 정보\n{schema_catalog.get_prompt()}"
+
+
+def build_sql_prompt(question: str, context: str = "") -> List[BaseMessage]:
+    """SQL 생성용 메시지 목록을 만듭니다. [고정 시스템 메시지, 예시 + 이전 대화 문맥 + 질문 메시지]"""
+    token_budget = int(os.environ.get("FEWSHOT_TOKEN_BUDGET", "600"))
+    max_examples = int(os.environ.get("FEWSHOT_MAX_EXAMPLES", "3"))
+    examples = example_library.select(question, token_budget, max_examples) if token_budget > 0 else []
+
+    variable = ""
+    if examples:
+        # 가장 유사한 예시가 질문 바로 앞에 오도록 역순으로 배치
+        variable += "### 참고 예시 (질문 → SQL)\n"
+        for example in reversed(examples):
+            variable += f"질문: {example['question']}\nSQL: {example['sql']}\n\n"
+    if context:
+        # 대화마다 달라지므로 고정 접두사가 아닌 가변 메시지에 둠
+        variable += (
+            "### 이전 대화 (질문이 '그중', '같은 기간'처럼 이전 대화를 가리킬 때만 참고)\n"
+            f"{context}\n\n"
+        )
+    # 질문은 항상 맨 마지막
+    variable += f"### 사용자의 질문:\n{question}"
+    return [SystemMessage(content=static_prefix()), HumanMessage(content=variable)]
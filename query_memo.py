@@ -0,0 +1,275 @@
+### 질문 → SQL 메모이제이션 (SQLite 영속 캐시)
+# 같은(또는 거의 같은) 질문이 다시 들어오면 SQL 생성 LLM 호출을 건너뜁니다.
+# - 정규화된 질문 텍스트가 정확히 일치하면 SQL과 최종 보고서까지 재사용
+# - 정확히 일치하지 않으면 문자 bigram 어휘 유사도 인덱스로 근사 중복을 찾아 SQL만 재사용
+#   (연도·분기·순위 등 숫자나 지표·성별·요일·시간대·업종·상권 표현이 하나라도 다르면 다른 질문으로 간주하고,
+#    저장된 SQL의 문자열 조건 값이 새 질문에 그대로 나오지 않아도 재사용하지 않음)
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from schema_catalog import schema_catalog, SchemaSnapshot, SAMPLE_COLUMNS
+from sql_templates import DEFAULT_DISTRICT_TYPES, METRIC_PATTERNS, inline_binds
+
+folder_path = os.path.dirname(os.path.abspath(__file__))
+
+
+def normalize_question(question: str) -> str:
+    """대소문자·공백·문장부호 차이를 제거한 질문 키를 만듭니다."""
+    text = unicodedata.normalize("NFKC", question).lower()
+    return re.sub(r"[\W_]+", " ", text).strip()
+
+
+def _bigrams(text: str) -> Set[str]:
+    compact = text.replace(" ", "")
+    if len(compact) < 2:
+        return {compact} if compact else set()
+    return {compact[i:i + 2] for i in range(len(compact) - 1)}
+
+
+def _numbers(text: str) -> Tuple[str, ...]:
+    return tuple(re.findall(r"\d+", text))
+
+
+# 지표 컬럼(METRIC_PATTERNS) 외에 SQL 조건을 바꾸는 요일·시간대·상권구분 표현
+FILTER_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    (r"월요일", "monday"),
+    (r"화요일", "tuesday"),
+    (r"수요일", "wednesday"),
+    (r"목요일", "thursday"),
+    (r"금요일", "friday"),
+    (r"토요일", "saturday"),
+    (r"일요일", "sunday"),
+    (r"새벽|심야", "time_00_06"),
+    (r"아침|오전|출근", "time_06_11"),
+    (r"오후", "time_14_17"),
+    (r"밤|야간|퇴근", "time_21_24"),
+) + tuple((re.escape(value), value) for value in DEFAULT_DISTRICT_TYPES)
+
+
+def _keywords(text: str, terms: Sequence[str] = ()) -> FrozenSet[str]:
+    """질문에 나온 지표·성별·요일·시간대·상권구분 키워드와 카탈로그 값(업종명 등) 집합"""
+    found = set()
+    for pattern, name in METRIC_PATTERNS + FILTER_PATTERNS:
+        if re.search(pattern, text):
+            found.add(name)
+            text = re.sub(pattern, " ", text)
+    compact = text.replace(" ", "")
+    # 긴 값부터 찾아 '커피-음료'가 더 짧은 값에 잘려 나가지 않게 함 (terms는 정규화된 값)
+    for term in terms:
+        if term and term in compact:
+            found.add(term)
+            compact = compact.replace(term, " ")
+    return frozenset(found)
+
+
+def _catalog_terms() -> List[str]:
+    """스키마 카탈로그의 범주형 샘플 값(업종명, 상권구분)을 질문 키와 같은 방식으로 정규화한 목록"""
+    snapshot = schema_catalog.get()
+    if not isinstance(snapshot, SchemaSnapshot):
+        return []
+    values = {
+        normalize_question(value).replace(" ", "")
+        for column in SAMPLE_COLUMNS for value in snapshot.samples.get(column, [])
+    }
+    return sorted(values, key=len, reverse=True)
+
+
+def _sql_filter_values(sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[Set[str]]:
+    """SQL의 문자열 조건 값 (바인드 값 포함, 숫자만으로 된 값과 LIKE의 %는 제외). 파싱할 수 없으면 None"""
+    try:
+        tree = sqlglot.parse_one(inline_binds(sql, params), read="postgres")
+    except sqlglot.errors.ParseError:
+        return None
+    values = set()
+    for literal in tree.find_all(exp.Literal):
+        if not literal.is_string:
+            continue
+        value = normalize_question(literal.name.replace("%", " ")).replace(" ", "")
+        if value and not value.isdigit():
+            values.add(value)
+    return values
+
+
+class LexicalIndex:
+    """문자 bigram 역색인 기반 유사 질문 검색 (Dice 계수)"""
+
+    def __init__(self):
+        self._grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+
+    def add(self, key: str) -> None:
+        if key in self._grams:
+            return
+        grams = _bigrams(key)
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def clear(self) -> None:
+        self._grams.clear()
+        self._postings.clear()
+
+    def _scores(self, key: str) -> Dict[str, float]:
+        grams = _bigrams(key)
+        overlap: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                overlap[candidate] += 1
+        return {
+            candidate: 2 * common / (len(grams) + len(self._grams[candidate]))
+            for candidate, common in overlap.items()
+        }
+
+    def search(self, key: str, min_score: float, terms: Sequence[str] = ()) -> Tuple[Optional[str], float]:
+        """가장 유사한 키와 점수를 반환합니다. 숫자 구성이나 지표·조건 키워드(terms 포함)가 다른 후보는 제외합니다."""
+        numbers = _numbers(key)
+        keywords = _keywords(key, terms)
+        best_key, best_score = None, 0.0
+        for candidate, score in self._scores(key).items():
+            if score <= best_score or score < min_score:
+                continue
+            if _numbers(candidate) == numbers and _keywords(candidate, terms) == keywords:
+                best_key, best_score = candidate, score
+        return best_key, best_score
+
+    def rank(self, key: str, limit: int) -> List[Tuple[str, float]]:
+        """유사도 높은 순으로 최대 limit개의 (키, 점수)를 반환합니다. (숫자 구성은 따지지 않음)"""
+        scores = self._scores(key)
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+@dataclass
+class MemoHit:
+    question: str
+    sql: str
+    report: str
+    exact: bool
+    score: float
+    params: Dict[str, Any]
+
+
+class QueryMemo:
+    """질문 → SQL(및 보고서) 영속 캐시"""
+
+    def __init__(self, path: Optional[str] = None, similarity_threshold: Optional[float] = None):
+        if path is None:
+            path = os.environ.get("QUERY_MEMO_PATH", os.path.join(folder_path, ".cache", "query_memo.sqlite3"))
+        if similarity_threshold is None:
+            similarity_threshold = float(os.environ.get("QUERY_MEMO_SIMILARITY", "0.9"))
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.enabled = os.environ.get("QUERY_MEMO_ENABLED", "1") != "0"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._index = LexicalIndex()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_sql (
+                    question_key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    report TEXT NOT NULL DEFAULT '',
+                    updated_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    params TEXT NOT NULL DEFAULT '{}'
+                )
+            """)
+            # 바인드 매개변수 컬럼이 생기기 전에 만든 메모 파일
+            if "params" not in {row[1] for row in conn.execute("PRAGMA table_info(question_sql)")}:
+                conn.execute("ALTER TABLE question_sql ADD COLUMN params TEXT NOT NULL DEFAULT '{}'")
+            for (key,) in conn.execute("SELECT question_key FROM question_sql"):
+                self._index.add(key)
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, question: str) -> Optional[MemoHit]:
+        """정확히 일치하는 질문을 먼저 찾고, 없으면 유사도 임계값 이상인 질문을 찾습니다."""
+        if not self.enabled:
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            conn = self._connect()
+            exact = True
+            score = 1.0
+            row = conn.execute(
+                "SELECT question, sql, report, params FROM question_sql WHERE question_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                similar_key, score = self._index.search(key, self.similarity_threshold, _catalog_terms())
+                if similar_key is None:
+                    return None
+                row = conn.execute(
+                    "SELECT question, sql, report, params FROM question_sql WHERE question_key = ?", (similar_key,)
+                ).fetchone()
+                # 저장된 SQL이 거는 조건 값(업종명, 상권명 등)이 새 질문에 모두 나와야 같은 질문으로 봄
+                filters = _sql_filter_values(row[1], json.loads(row[3])) if row is not None else None
+                if filters is None or not all(value in key.replace(" ", "") for value in filters):
+                    return None
+                exact = False
+                key = similar_key
+
+            conn.execute("UPDATE question_sql SET hits = hits + 1 WHERE question_key = ?", (key,))
+            conn.commit()
+
+        stored_question, sql, report, params = row
+        # 근사 일치일 때는 질문 표현이 다를 수 있으므로 보고서는 재사용하지 않음
+        return MemoHit(
+            question=stored_question, sql=sql, report=report if exact else "", exact=exact, score=score,
+            params=json.loads(params),
+        )
+
+    def remember(self, question: str, sql: str, report: str = "", params: Optional[Dict[str, Any]] = None) -> None:
+        """검증·실행이 끝난 SQL(및 보고서, 바인드 매개변수)을 저장합니다."""
+        if not self.enabled or not sql:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("""
+                INSERT INTO question_sql (question_key, question, sql, report, updated_at, params)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(question_key) DO UPDATE SET
+                    question = excluded.question,
+                    sql = excluded.sql,
+                    report = excluded.report,
+                    updated_at = excluded.updated_at,
+                    params = excluded.params
+            """, (key, question, sql, report, time.time(), json.dumps(params or {}, ensure_ascii=False)))
+            conn.commit()
+            self._index.add(key)
+
+    def invalidate_reports(self) -> None:
+        """데이터가 재적재되면 보고서만 비웁니다. (질문 → SQL 매핑은 여전히 유효)"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE question_sql SET report = ''")
+            conn.commit()
+
+    def clear(self) -> None:
+        """모든 메모를 삭제합니다."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM question_sql")
+            conn.commit()
+            self._index.clear()
+
+
+# 프로세스 전역 메모 인스턴스
+query_memo = QueryMemo()
@@ -0,0 +1,139 @@
+### SQL 결과 캐시
+# 정규화된 SQL 텍스트를 키로 조회 결과를 보관합니다.
+# - 항목 수가 아닌 결과 행의 추정 바이트 크기로 메모리 상한을 관리 (LRU 제거)
+# - TTL 만료, 테이블 재적재 시 invalidate()로 무효화
+# - hit / miss 통계 제공
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# 문자열 리터럴('...'), 따옴표 식별자("..."), 주석, 그 외 토큰을 분리하는 정규식
+_SQL_TOKEN_RE = re.compile(
+    r"(?P<literal>'(?:[^']|'')*')"
+    r"|(?P<ident>\"(?:[^\"]|\"\")*\")"
+    r"|(?P<line_comment>--[^\n]*)"
+    r"|(?P<block_comment>/\*.*?\*/)"
+    r"|(?P<other>[^'\"\-/]+|[\-/])",
+    re.DOTALL,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """캐시 키로 쓰기 위해 SQL의 주석·공백·대소문자 차이를 제거합니다. (리터럴은 보존)"""
+    parts = []
+    buffer = []
+
+    def flush():
+        text = re.sub(r"\s+", " ", "".join(buffer).lower())
+        parts.append(re.sub(r"\s*([(),;=<>+*])\s*", r"\1", text))
+        buffer.clear()
+
+    for match in _SQL_TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("literal", "ident"):
+            flush()
+            parts.append(match.group())
+        elif kind in ("line_comment", "block_comment"):
+            buffer.append(" ")
+        else:
+            buffer.append(match.group())
+    flush()
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def estimate_size(value: Any) -> int:
+    """결과 객체가 차지하는 메모리 바이트를 대략적으로 추정합니다."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    if hasattr(value, "__dict__"):
+        # QueryResult 같은 결과 래퍼 객체
+        return sys.getsizeof(value) + estimate_size(vars(value))
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """바이트 크기 기반 LRU + TTL 결과 캐시 (스레드 안전)"""
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("RESULT_CACHE_TTL", "86400"))
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, size, stored_at)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, sql: str) -> Any:
+        """캐시된 결과를 반환합니다. 없거나 만료되었으면 None을 반환합니다."""
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, stored_at = entry
+            if time.monotonic() - stored_at >= self.ttl_seconds:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, sql: str, value: Any) -> None:
+        """결과를 저장하고, 용량을 넘으면 가장 오래 사용되지 않은 항목부터 제거합니다."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # 단일 결과가 캐시 전체보다 크면 저장하지 않음
+            return
+        key = normalize_sql(sql)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic())
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, table_name: Optional[str] = None) -> int:
+        """테이블 재적재 시 호출합니다. table_name을 참조하는 항목(미지정 시 전체)을 제거합니다."""
+        with self._lock:
+            if table_name is None:
+                keys = list(self._entries)
+            else:
+                keys = [key for key in self._entries if table_name.lower() in key]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """hit / miss 및 사용량 통계를 반환합니다."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+
+# 프로세스 전역 결과 캐시 인스턴스
+result_cache = ResultCache()
@@ -0,0 +1,168 @@
+### 보고서 프롬프트용 결과 인코딩
+# json.dumps(indent=2)는 행마다 컬럼명을 반복하고 공백을 채우므로 행 수에 비례해 토큰이 늘어납니다.
+# - json: 기존 방식 (행이 적을 때 그대로 사용)
+# - compact: 컬럼 헤더 1회 + 구분자 테이블, 큰 금액은 억/천만 단위로 미리 환산
+# - 행이 많으면 앞부분 행 + 컬럼 통계(min/max/sum/top-k) 요약으로 대체
+# REPORT_ENCODING=auto(기본)이면 토큰 예산 추정치로 위 방식 중 하나를 고릅니다.
+import decimal
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+    _ENCODER = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken 미설치 또는 인코딩 파일 다운로드 불가
+    _ENCODER = None
+
+# 단위 환산에서 제외할 컬럼 (건수, 코드, 연도 등)
+_NON_AMOUNT_KEYWORDS = ("count", "cnt", "code", "year", "quarter", "rank", "id", "ratio", "rate", "pct", "share")
+
+
+def estimate_tokens(text: str) -> int:
+    """프롬프트 토큰 수를 추정합니다. tiktoken이 없으면 문자 종류별 근사치를 사용합니다."""
+    if _ENCODER is not None:
+        return len(_ENCODER.encode(text))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    # 영문·숫자는 약 4자당 1토큰, 한글은 대략 1자당 1토큰
+    return ascii_chars // 4 + (len(text) - ascii_chars)
+
+
+def _to_plain(value: Any) -> Any:
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _numeric_columns(columns: List[str], rows: List[Dict]) -> List[str]:
+    return [
+        col for col in columns
+        if any(row.get(col) is not None for row in rows)
+        and all(row.get(col) is None or _is_number(row.get(col)) for row in rows)
+    ]
+
+
+def _unit_for(col: str, values: List[float]) -> Tuple[str, float]:
+    """컬럼 값 크기에 맞는 표시 단위와 나눌 값을 결정합니다."""
+    if any(k in col.lower() for k in _NON_AMOUNT_KEYWORDS) or not values:
+        return "", 1
+    peak = max(abs(v) for v in values)
+    if peak >= 1e8:
+        return "억", 1e8
+    if peak >= 1e7:
+        return "천만", 1e7
+    return "", 1
+
+
+def _format_number(value: Any, divisor: float) -> str:
+    if value is None:
+        return ""
+    if divisor == 1:
+        return f"{value:,}" if isinstance(value, int) else f"{value:,.2f}"
+    return f"{value / divisor:,.2f}"
+
+
+def encode_json(rows: List[Dict]) -> str:
+    """기존 방식의 JSON 인코딩"""
+    return json.dumps(rows, indent=2, ensure_ascii=False, default=lambda o: _to_plain(o) if isinstance(o, decimal.Decimal) else str(o))
+
+
+def encode_table(rows: List[Dict], columns: List[str], numeric_cols: List[str], units: Dict[str, Tuple[str, float]]) -> str:
+    """헤더를 한 번만 쓰는 '|' 구분 테이블로 인코딩합니다."""
+    header = []
+    for col in columns:
+        unit = units.get(col, ("", 1))[0]
+        header.append(f"{col}({unit})" if unit else col)
+    lines = [" | ".join(header)]
+    for row in rows:
+        cells = []
+        for col in columns:
+            value = row.get(col)
+            if col in numeric_cols:
+                cells.append(_format_number(value, units[col][1]))
+            else:
+                cells.append("" if value is None else str(value))
+        lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def summarize_columns(rows: List[Dict], columns: List[str], numeric_cols: List[str],
+                      units: Dict[str, Tuple[str, float]], top_k: int) -> str:
+    """전체 행에 대한 컬럼 통계 요약 (수치: min/max/sum/top-k, 문자열: 고유값 수)"""
+    label_col = next((col for col in columns if col not in numeric_cols), None)
+    lines = [f"[컬럼 통계 요약: 전체 {len(rows)}개 행 기준]"]
+    for col in columns:
+        if col in numeric_cols:
+            unit, divisor = units[col]
+            values = [row[col] for row in rows if row.get(col) is not None]
+            suffix = f" (단위: {unit})" if unit else ""
+            line = (
+                f"- {col}{suffix}: min={_format_number(min(values), divisor)}, "
+                f"max={_format_number(max(values), divisor)}, sum={_format_number(sum(values), divisor)}"
+            )
+            if label_col:
+                ranked = sorted(
+                    (row for row in rows if row.get(col) is not None), key=lambda r: r[col], reverse=True
+                )[:top_k]
+                tops = ", ".join(f"{row.get(label_col)}={_format_number(row[col], divisor)}" for row in ranked)
+                line += f", top{top_k}: {tops}"
+            lines.append(line)
+        else:
+            distinct = {row.get(col) for row in rows}
+            lines.append(f"- {col}: 고유값 {len(distinct)}개")
+    return "\n".join(lines)
+
+
+def encode_compact(rows: List[Dict], head_rows: Optional[int] = None, top_k: int = 5) -> str:
+    """컬럼형 테이블 인코딩. head_rows가 주어지면 앞부분 행만 싣고 전체 통계 요약을 덧붙입니다."""
+    rows = [{k: _to_plain(v) for k, v in row.items()} for row in rows]
+    columns = list(rows[0].keys()) if rows else []
+    numeric_cols = _numeric_columns(columns, rows)
+    units = {col: _unit_for(col, [row[col] for row in rows if row.get(col) is not None]) for col in numeric_cols}
+
+    if head_rows is None or head_rows >= len(rows):
+        return encode_table(rows, columns, numeric_cols, units)
+
+    table = encode_table(rows[:head_rows], columns, numeric_cols, units)
+    summary = summarize_columns(rows, columns, numeric_cols, units, top_k)
+    return f"[앞 {head_rows}개 행]\n{table}\n\n{summary}"
+
+
+def encode_result_for_prompt(rows: List[Dict], mode: Optional[str] = None,
+                             token_budget: Optional[int] = None) -> Tuple[str, str]:
+    """보고서 프롬프트에 넣을 결과 문자열과 실제 사용한 인코딩 이름을 반환합니다."""
+    if mode is None:
+        mode = os.environ.get("REPORT_ENCODING", "auto")
+    if token_budget is None:
+        token_budget = int(os.environ.get("REPORT_TOKEN_BUDGET", "1500"))
+    summary_threshold = int(os.environ.get("REPORT_SUMMARY_ROWS", "30"))
+
+    if mode == "json":
+        return encode_json(rows), "json"
+
+    if mode == "compact":
+        if len(rows) > summary_threshold:
+            return encode_compact(rows, head_rows=summary_threshold), "compact+summary"
+        return encode_compact(rows), "compact"
+
+    # auto: 예산 안에 들어가는 가장 충실한 인코딩을 선택
+    json_text = encode_json(rows)
+    if estimate_tokens(json_text) <= token_budget:
+        return json_text, "json"
+
+    if len(rows) <= summary_threshold:
+        table_text = encode_compact(rows)
+        if estimate_tokens(table_text) <= token_budget:
+            return table_text, "compact"
+
+    # 앞부분 행 수를 줄여가며 예산에 맞춤 (통계 요약은 항상 전체 행 기준)
+    head_rows = min(len(rows), summary_threshold)
+    while True:
+        text = encode_compact(rows, head_rows=head_rows)
+        if estimate_tokens(text) <= token_budget or head_rows <= 3:
+            return text, "compact+summary"
+        head_rows //= 2
@@ -0,0 +1,262 @@
+### 후속 질문의 로컬 처리 (직전 결과 재사용)
+# "상위 3개만", "주말 매출 순으로 정렬", "전체 대비 비중으로 보여줘" 같은 후속 질문은
+# SQL 생성 → 실행을 다시 거치지 않고 체크포인트에 남아 있는 직전 결과(sql_result)를 pandas 벡터 연산으로 가공합니다.
+# - 직전 결과가 행 상한이나 직전 SQL의 ORDER BY ... LIMIT으로 잘렸다면 일부 행만으로는 정렬·비중이 틀리므로,
+#   요청이 직전 순서·개수 안에서 답할 수 있을 때만 로컬로 처리하고 아니면 직전 SQL을 서브쿼리로 감싼 SQL을 대신 만듭니다.
+# - 질문의 모든 어절을 정렬 / 개수 / 비중 요청으로 해석할 수 있을 때만 적용하고, 아니면 None을 반환해 전체 경로로 넘깁니다.
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from chart_data import detect_axes, to_frame
+from sql_templates import METRIC_PATTERNS
+
+# 비중 컬럼 이름 (result_encoding의 단위 환산 / chart_data의 Y축 탐지에서 제외되는 이름)
+SHARE_COLUMN = "share_pct"
+
+_NEW_PERIOD = re.compile(r"\d{4}\s*년|\d\s*분기")
+_TOP_N = re.compile(r"(?:상위|top)\s*(\d{1,3})\s*(?:개|곳|위)?", re.IGNORECASE)
+_BOTTOM_N = re.compile(r"(?:하위|bottom)\s*(\d{1,3})\s*(?:개|곳|위)?", re.IGNORECASE)
+_ONLY_N = re.compile(r"(\d{1,3})\s*(?:개|곳)")
+_ASCENDING = re.compile(r"오름차순|낮은\s*순|적은\s*순|작은\s*순")
+_DESCENDING = re.compile(r"내림차순|높은\s*순|많은\s*순|큰\s*순")
+_SORT = re.compile(r"순서?\s*(?:으로|대로)?|정렬|기준")
+_SHARE = re.compile(r"비중|비율|점유율|퍼센트|share|%", re.IGNORECASE)
+_GENERIC_METRIC = re.compile(r"매출\s*(?:액|금액)?|금액")
+
+# 해석 후 남아도 되는 어절 (조사·어미는 따로 떼고 비교)
+FILLER_WORDS = {
+    "", "만", "그중", "그", "중", "이", "중에서", "여기서", "거기서", "위", "결과", "이걸", "그걸", "이거", "그거",
+    "다시", "전체", "대비", "상권", "업종", "으로", "로", "해줘", "해", "주세요", "보여줘", "보여", "줘",
+    "알려줘", "바꿔줘", "남겨줘", "추려줘", "나타내줘", "계산해줘", "표시해줘", "표시", "now", "only", "sort", "by",
+    "가장", "값", "기준으로",
+}
+_PARTICLE = re.compile(r"(?:은|는|이|가|을|를|의|에서|으로|로|만|도|요|만으로|로만|으로만)?[?!.,~]*$")
+
+
+@dataclass
+class Refinement:
+    """직전 결과에 적용할 후처리"""
+    description: str
+    sort_column: Optional[str] = None
+    ascending: bool = False
+    limit: Optional[int] = None
+    share_column: Optional[str] = None
+
+
+def _is_filler(word: str) -> bool:
+    word = word.lower()
+    return word in FILLER_WORDS or _PARTICLE.sub("", word) in FILLER_WORDS
+
+
+def match_refinement(question: str, columns: List[str], primary_column: Optional[str]) -> Optional[Refinement]:
+    """직전 결과 컬럼만으로 답할 수 있는 후속 질문이면 Refinement를, 아니면 None을 반환합니다."""
+    text = unicodedata.normalize("NFKC", question)
+    # 새 기간을 말하면 새 질문
+    if _NEW_PERIOD.search(text) or not primary_column:
+        return None
+
+    # "상위 / 하위 N개"는 주 지표로 다시 정렬, 방향 없는 "N개만"은 직전 순서를 유지
+    limit, ascending, ranked = None, False, False
+    for pattern, is_ascending in ((_TOP_N, False), (_BOTTOM_N, True), (_ONLY_N, None)):
+        match = pattern.search(text)
+        if match:
+            if limit is not None:
+                return None
+            limit = int(match.group(1))
+            if is_ascending is not None:
+                ascending, ranked = is_ascending, True
+            text = pattern.sub(" ", text, count=1)
+    if limit is not None and not 1 <= limit <= 1000:
+        return None
+
+    # 언급한 지표 컬럼 (결과에 없는 컬럼이면 로컬로 답할 수 없음)
+    mentioned = set()
+    for pattern, column in METRIC_PATTERNS:
+        if re.search(pattern, text):
+            mentioned.add(column)
+            text = re.sub(pattern, " ", text)
+    if _GENERIC_METRIC.search(text):
+        text = _GENERIC_METRIC.sub(" ", text)
+        if not mentioned:
+            mentioned.add(primary_column)
+    if len(mentioned) > 1 or not mentioned <= set(columns):
+        return None
+    column = mentioned.pop() if mentioned else primary_column
+
+    share = bool(_SHARE.search(text))
+    text = _SHARE.sub(" ", text)
+    if _ASCENDING.search(text):
+        ascending = True
+    text = _DESCENDING.sub(" ", _ASCENDING.sub(" ", text))
+    sort = bool(_SORT.search(text)) or ranked or ascending
+    text = _SORT.sub(" ", text)
+
+    if not (limit or sort or share):
+        return None
+    if not all(_is_filler(word) for word in text.split()):
+        return None
+
+    parts = []
+    if sort:
+        parts.append(f"{column} {'오름차순' if ascending else '내림차순'} 정렬")
+    if limit:
+        parts.append(f"{'하위' if ascending else '상위'} {limit}개" if sort else f"앞의 {limit}개")
+    if share:
+        parts.append(f"{column}의 조회 결과 합계 대비 비중({SHARE_COLUMN}, %)")
+    return Refinement(
+        description=", ".join(parts),
+        sort_column=column if sort else None,
+        ascending=ascending,
+        limit=limit,
+        share_column=column if share else None,
+    )
+
+
+def primary_metric(rows: List[Dict]) -> Optional[str]:
+    """직전 결과의 주 지표 컬럼 (차트 Y축과 같은 기준)"""
+    if not rows:
+        return None
+    _, y_cols = detect_axes(to_frame(rows[:50]))
+    return y_cols[0] if y_cols else None
+
+
+def apply_refinement(rows: List[Dict], refinement: Refinement) -> List[Dict]:
+    """직전 결과 행 전체에 후처리를 벡터 연산으로 적용합니다."""
+    frame = to_frame(rows)
+    if refinement.share_column:
+        # 비중은 개수 제한 전에 전체 합계 기준으로 계산
+        total = frame[refinement.share_column].sum()
+        frame[SHARE_COLUMN] = (frame[refinement.share_column] * 100 / total).round(1) if total else 0.0
+    if refinement.sort_column:
+        frame = frame.sort_values(refinement.sort_column, ascending=refinement.ascending, kind="stable")
+    if refinement.limit:
+        frame = frame.head(refinement.limit)
+    # numpy 스칼라를 파이썬 int / float로 되돌려 체크포인트 / JSON 직렬화를 그대로 유지
+    return [
+        {key: (value.item() if hasattr(value, "item") else value) for key, value in record.items()}
+        for record in frame.to_dict("records")
+    ]
+
+
+@dataclass
+class Ordering:
+    """직전 SQL 바깥 쿼리의 정렬 / 개수 제한"""
+    column: Optional[str] = None
+    ascending: bool = False
+    limit: Optional[int] = None
+
+
+def _parse_select(sql: str) -> Optional[exp.Query]:
+    try:
+        tree = sqlglot.parse_one(sql.strip().rstrip(";"), read="postgres")
+    except sqlglot.errors.ParseError:
+        return None
+    return tree if isinstance(tree, exp.Query) else None
+
+
+def _output_name(tree: exp.Query, key: exp.Expression) -> Optional[str]:
+    """ORDER BY 키를 결과 컬럼 이름으로 바꿉니다. (별칭 / 컬럼 이름 / 같은 식의 별칭, 모르면 None)"""
+    for projection in tree.selects:
+        if projection.alias_or_name and (
+            projection == key or projection.unalias() == key
+            or (isinstance(key, exp.Column) and not key.table and key.name == projection.alias_or_name)
+        ):
+            return projection.alias_or_name
+    return None
+
+
+def _limit_value(tree: exp.Query) -> Tuple[Optional[int], bool]:
+    """(바깥 LIMIT 값, 해석 가능 여부) — OFFSET이나 식으로 된 LIMIT은 해석할 수 없는 것으로 봅니다."""
+    if tree.args.get("offset") is not None or tree.args.get("fetch") is not None:
+        return None, False
+    limit = tree.args.get("limit")
+    if limit is None:
+        return None, True
+    value = limit.expression
+    if isinstance(value, exp.Literal) and value.is_int:
+        return int(value.name), True
+    return None, False
+
+
+def previous_ordering(sql: str) -> Optional[Ordering]:
+    """직전 SQL의 바깥 ORDER BY 첫 키(결과 컬럼 기준)와 LIMIT. 해석할 수 없으면 None"""
+    tree = _parse_select(sql)
+    if tree is None:
+        return None
+    limit, ok = _limit_value(tree)
+    if not ok:
+        return None
+    ordering = Ordering(limit=limit)
+    order = tree.args.get("order")
+    if order is not None and order.expressions:
+        key = order.expressions[0]
+        ordering.column = _output_name(tree, key.this)
+        ordering.ascending = not key.args.get("desc")
+    return ordering
+
+
+def fits_previous_result(refinement: Refinement, sql: str, row_count: int, truncated: bool) -> bool:
+    """직전 결과 행만으로 후처리 결과가 정확한지 판단합니다.
+    결과가 LIMIT에 걸리지 않았으면 항상, 걸렸다면 같은 정렬(컬럼·방향) 안에서 직전 LIMIT 이하의 개수만 요청할 때만 참"""
+    if truncated:
+        return False
+    ordering = previous_ordering(sql)
+    if ordering is None:
+        return False
+    if ordering.limit is None or row_count < ordering.limit:
+        return True
+    # 직전 LIMIT으로 잘린 결과: 비중은 전체 합계가 필요하고, 다른 정렬 / 더 많은 개수는 빠진 행이 필요
+    if refinement.share_column:
+        return False
+    if refinement.sort_column is not None and (
+        refinement.sort_column != ordering.column or refinement.ascending != ordering.ascending
+    ):
+        return False
+    return refinement.limit is None or refinement.limit <= ordering.limit
+
+
+def wrap_sql(sql: str, refinement: Refinement) -> str:
+    """직전 결과가 잘렸을 때 사용할 SQL: 직전 SQL을 서브쿼리로 감싸 DB에서 같은 후처리를 수행합니다.
+    직전 SQL의 바깥 LIMIT은 떼어 내 전체 행을 대상으로 비중을 계산하고, 개수를 새로 요청하지 않았으면
+    직전 정렬·LIMIT을 바깥에서 다시 적용해 같은 행(예: 상위 5개)만 남긴 뒤 요청한 정렬을 적용합니다."""
+    inner = sql.strip().rstrip(";")
+    ordering = Ordering()
+    tree = _parse_select(inner)
+    if tree is not None and _limit_value(tree)[1] and tree.args.get("limit") is not None:
+        ordering = previous_ordering(inner)
+        tree.set("limit", None)
+        inner = tree.sql(dialect="postgres")
+
+    select = "prev.*"
+    if refinement.share_column:
+        column = exp.column(refinement.share_column).sql(dialect="postgres")
+        # 창 함수는 LIMIT보다 먼저 계산되므로 비중은 잘리기 전 전체 행의 합계 기준
+        select += f", ROUND({column} * 100.0 / NULLIF(SUM({column}) OVER (), 0), 1) AS {SHARE_COLUMN}"
+    wrapped = f"SELECT {select} FROM ({inner}) AS prev"
+
+    if refinement.limit or ordering.limit is None:
+        # 새 개수 요청 (또는 직전 LIMIT 없음): 요청한 정렬, 없으면 직전 순서로 정렬해 자름
+        sort_column, ascending = refinement.sort_column, refinement.ascending
+        if sort_column is None and ordering.column:
+            sort_column, ascending = ordering.column, ordering.ascending
+        limit = refinement.limit
+    else:
+        # 정렬 / 비중만 요청: 직전 정렬·LIMIT으로 같은 행을 고른 뒤 요청한 정렬은 한 겹 더 감싸 적용
+        sort_column, ascending, limit = ordering.column, ordering.ascending, ordering.limit
+    if sort_column:
+        column = exp.column(sort_column).sql(dialect="postgres")
+        wrapped += f" ORDER BY {column} {'ASC' if ascending else 'DESC'}"
+    if limit:
+        wrapped += f" LIMIT {limit}"
+
+    if not refinement.limit and ordering.limit is not None and refinement.sort_column:
+        column = exp.column(refinement.sort_column).sql(dialect="postgres")
+        wrapped = (
+            f"SELECT * FROM ({wrapped}) AS top ORDER BY {column} {'ASC' if refinement.ascending else 'DESC'}"
+        )
+    return wrapped + ";"
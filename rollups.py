@@ -0,0 +1,230 @@
+### quarterly_sales 사전 집계(롤업) 및 자동 쿼리 라우팅
+# 생성되는 쿼리 대부분은 year_quarter로 필터링한 뒤 district_name 등으로 SUM ... GROUP BY 합니다.
+# 같은 집계를 매번 팩트 테이블 전체 스캔으로 계산하지 않도록 물리화 뷰(롤업)를 만들어 두고,
+# 검증을 통과한 SQL 중 롤업으로 동일한 결과를 낼 수 있는 SELECT를 가장 작은 롤업으로 바꿔 실행합니다.
+#
+# 사용법:
+#   python rollups.py build     # 롤업 생성 (최초 1회)
+#   python rollups.py refresh   # 데이터 적재 후 갱신
+import os
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql as pgsql
+import sqlglot
+from sqlglot import exp
+
+from schema_catalog import schema_catalog, SchemaSnapshot, TABLE_NAME
+from result_cache import result_cache
+
+# 롤업 행 수를 합산하기 위한 컬럼 (COUNT(*) → SUM(row_count)로 재작성)
+ROW_COUNT_COLUMN = "row_count"
+
+
+@dataclass(frozen=True)
+class Rollup:
+    name: str
+    dimensions: Tuple[str, ...]
+
+
+# 작은 롤업부터 나열 (카탈로그에 추정 행 수가 없을 때 이 순서를 사용)
+ROLLUPS = (
+    Rollup("quarterly_sales_by_district_type", ("year_quarter", "district_type")),
+    Rollup("quarterly_sales_by_service_category", ("year_quarter", "service_category_code", "service_category_name")),
+    # 상권명 → 상권구분은 함수 종속이므로 district_type도 차원에 포함
+    Rollup("quarterly_sales_by_district", ("year_quarter", "district_type", "district_code", "district_name")),
+)
+
+
+def _metric_columns(snapshot: SchemaSnapshot) -> List[str]:
+    """롤업에 합계로 담을 수치 컬럼 (모든 롤업 차원을 제외한 숫자 컬럼)"""
+    all_dimensions = {dim for rollup in ROLLUPS for dim in rollup.dimensions}
+    return [col for col in snapshot.numeric_columns if col not in all_dimensions]
+
+
+### 1. 롤업 생성 / 갱신
+
+def build_rollups() -> str:
+    """롤업 물리화 뷰와 유니크 인덱스를 생성합니다. (이미 있으면 건너뜀)"""
+    snapshot = schema_catalog.get(force_refresh=True)
+    if isinstance(snapshot, str):
+        return snapshot
+
+    metrics = _metric_columns(snapshot)
+    db_url = os.environ.get('DATABASE_URL')
+    try:
+        with psycopg2.connect(db_url) as conn:
+            cursor = conn.cursor()
+            for rollup in ROLLUPS:
+                dims = [pgsql.Identifier(dim) for dim in rollup.dimensions]
+                sums = [
+                    pgsql.SQL("SUM({col})::bigint AS {col}").format(col=pgsql.Identifier(col))
+                    for col in metrics
+                ]
+                cursor.execute(pgsql.SQL("""
+                    CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS
+                    SELECT {dims}, {sums}, COUNT(*)::bigint AS {row_count}
+                    FROM {table}
+                    GROUP BY {dims}
+                """).format(
+                    view=pgsql.Identifier(rollup.name),
+                    dims=pgsql.SQL(", ").join(dims),
+                    sums=pgsql.SQL(", ").join(sums),
+                    row_count=pgsql.Identifier(ROW_COUNT_COLUMN),
+                    table=pgsql.Identifier(TABLE_NAME),
+                ))
+                # REFRESH ... CONCURRENTLY에 필요한 유니크 인덱스 (차원 조합이 키)
+                cursor.execute(pgsql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {view} ({dims})").format(
+                    index=pgsql.Identifier(f"{rollup.name}_key"),
+                    view=pgsql.Identifier(rollup.name),
+                    dims=pgsql.SQL(", ").join(dims),
+                ))
+                cursor.execute(pgsql.SQL("ANALYZE {view}").format(view=pgsql.Identifier(rollup.name)))
+                print(f"-> 롤업 생성: {rollup.name}")
+    except psycopg2.Error as e:
+        return f"롤업 생성 오류: {e}"
+
+    _invalidate_caches()
+    return f"{len(ROLLUPS)}개 롤업 생성 완료"
+
+
+def refresh_rollups() -> str:
+    """quarterly_sales 재적재 후 롤업을 갱신합니다. 조회를 막지 않도록 CONCURRENTLY로 갱신합니다."""
+    db_url = os.environ.get('DATABASE_URL')
+    if not db_url:
+        return "DATABASE_URL 환경변수가 설정되지 않았습니다."
+
+    try:
+        conn = psycopg2.connect(db_url)
+        # REFRESH ... CONCURRENTLY는 트랜잭션 블록 밖에서 실행해야 함
+        conn.autocommit = True
+        try:
+            cursor = conn.cursor()
+            for rollup in ROLLUPS:
+                view = pgsql.Identifier(rollup.name)
+                cursor.execute(pgsql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {view}").format(view=view))
+                cursor.execute(pgsql.SQL("ANALYZE {view}").format(view=view))
+                print(f"-> 롤업 갱신: {rollup.name}")
+        finally:
+            conn.close()
+    except psycopg2.Error as e:
+        return f"롤업 갱신 오류: {e}"
+
+    _invalidate_caches()
+    return f"{len(ROLLUPS)}개 롤업 갱신 완료"
+
+
+def _invalidate_caches() -> None:
+    schema_catalog.invalidate()
+    result_cache.invalidate()
+
+
+### 2. 쿼리 라우팅
+
+def _routable_dimensions(select: exp.Select, metrics: List[str]) -> Optional[set]:
+    """SELECT 한 단계가 롤업으로 대체 가능하면 사용한 차원 컬럼 집합을, 아니면 None을 반환합니다."""
+    from_clause = select.args.get("from") or select.args.get("from_")
+    if from_clause is None or select.args.get("joins"):
+        return None
+    table = from_clause.this
+    if not isinstance(table, exp.Table) or table.name != TABLE_NAME:
+        return None
+    # 하위 쿼리가 섞여 있으면 보수적으로 제외
+    if any(node is not select for node in select.find_all(exp.Select)):
+        return None
+    if any(isinstance(node, exp.Star) for node in select.find_all(exp.Star) if not isinstance(node.parent, exp.Count)):
+        return None
+    # 윈도 함수는 행 단위로 값을 내므로 롤업 행으로 바꾸면 결과 행 수와 의미가 달라짐
+    if any(select.find_all(exp.Window)):
+        return None
+    # GROUP BY가 있거나, 모든 프로젝션이 집계 안에만 컬럼을 쓰는 순수 집계여야 함
+    if not select.args.get("group"):
+        for projection in select.expressions:
+            if not any(projection.find_all(exp.AggFunc)):
+                return None
+            if any(column.find_ancestor(exp.AggFunc) is None for column in projection.find_all(exp.Column)):
+                return None
+
+    aliases = {projection.alias for projection in select.expressions if projection.alias}
+    dimensions = set()
+    for column in select.find_all(exp.Column):
+        aggregate = column.find_ancestor(exp.AggFunc)
+        if aggregate is None:
+            if column.name in aliases and not column.table:
+                continue
+            dimensions.add(column.name)
+        elif isinstance(aggregate, exp.Sum) and column.parent is aggregate and column.name in metrics:
+            # SUM(컬럼) 형태만 허용 (SUM(a * b)는 합계의 곱과 다르므로 제외)
+            continue
+        else:
+            # AVG/MIN/MAX/COUNT(컬럼) 등 행 단위 의미가 필요한 집계는 롤업으로 계산할 수 없음
+            return None
+
+    for count in select.find_all(exp.Count):
+        if not isinstance(count.this, exp.Star):
+            return None
+    return dimensions
+
+
+def route_to_rollup(sql: str) -> Tuple[str, List[str]]:
+    """롤업으로 대체 가능한 SELECT의 FROM을 가장 작은 롤업으로 바꾼 SQL과 사용한 롤업 목록을 반환합니다."""
+    if os.environ.get("ROLLUP_ROUTING", "1") == "0":
+        return sql, []
+
+    snapshot = schema_catalog.get()
+    if isinstance(snapshot, str):
+        return sql, []
+    available = [rollup for rollup in ROLLUPS if rollup.name in snapshot.materialized_views]
+    if not available:
+        return sql, []
+    # 추정 행 수가 작은 롤업 우선 (통계가 없으면 선언 순서)
+    available.sort(key=lambda r: (snapshot.materialized_views[r.name] <= 0, snapshot.materialized_views[r.name]))
+    metrics = _metric_columns(snapshot)
+
+    try:
+        tree = sqlglot.parse_one(sql, read="postgres")
+    except sqlglot.errors.ParseError:
+        return sql, []
+
+    used = []
+    for select in list(tree.find_all(exp.Select)):
+        dimensions = _routable_dimensions(select, metrics)
+        if dimensions is None:
+            continue
+        rollup = next((r for r in available if dimensions <= set(r.dimensions)), None)
+        if rollup is None:
+            continue
+
+        from_clause = select.args.get("from") or select.args.get("from_")
+        table = from_clause.this
+        if not table.alias:
+            # quarterly_sales.col 처럼 테이블명으로 한정한 컬럼이 계속 동작하도록 별칭 유지
+            table.set("alias", exp.TableAlias(this=exp.to_identifier(TABLE_NAME)))
+        table.set("this", exp.to_identifier(rollup.name))
+        for count in list(select.find_all(exp.Count)):
+            replacement = exp.Sum(this=exp.column(ROW_COUNT_COLUMN))
+            if count.parent is select:
+                # 별칭 없는 COUNT(*) 프로젝션은 결과 컬럼명(count)을 유지
+                replacement = exp.alias_(replacement, "count")
+            count.replace(replacement)
+        if rollup.name not in used:
+            used.append(rollup.name)
+
+    if not used:
+        return sql, []
+    return tree.sql(dialect="postgres"), used
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "refresh"
+    if command == "build":
+        print(build_rollups())
+    elif command == "refresh":
+        print(refresh_rollups())
+    else:
+        print("사용법: python rollups.py [build|refresh]")
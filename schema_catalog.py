@@ -0,0 +1,210 @@
+### quarterly_sales 스키마 카탈로그 캐시
+# 질문마다 information_schema를 조회하지 않도록 스키마 정보를 TTL 캐시로 보관합니다.
+# create_agent() 시점에 미리 로드하며, 데이터 적재 후에는 invalidate()로 무효화합니다.
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2
+from psycopg2 import sql as pgsql
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "quarterly_sales"
+
+# 프롬프트에 샘플 값을 함께 보여줄 범주형 컬럼
+SAMPLE_COLUMNS = ("district_type", "service_category_name")
+SAMPLE_LIMIT = 30
+
+NUMERIC_TYPES = ("smallint", "integer", "bigint", "numeric", "real", "double precision")
+
+# DB에 컬럼 코멘트가 없을 때 사용하는 기본 설명 (create_database_openapi.py 스키마 기준)
+DEFAULT_COLUMN_DESCRIPTIONS = {
+    "year_quarter": "예: '20241' = 2024년 1분기",
+    "district_type": "상권구분코드명",
+    "district_code": "상권코드",
+    "district_name": "상권명, 예: '강남역', '성수동카페거리'",
+    "service_category_code": "서비스업종코드",
+    "service_category_name": "서비스업종명, 예: '한식음식점', '커피-음료'",
+    "monthly_sales_amount": "월평균 매출액",
+    "monthly_sales_count": "월평균 매출건수",
+    "weekday_sales_amount": "주중 매출액",
+    "weekend_sales_amount": "주말 매출액",
+    "sales_time_11_14": "점심시간 11~14시 매출",
+    "sales_time_17_21": "저녁시간 17~21시 매출",
+    "male_sales_amount": "남성 매출액",
+    "female_sales_amount": "여성 매출액",
+    "sales_by_age_10s": "10대 매출액",
+    "sales_by_age_20s": "20대 매출액",
+    "sales_by_age_30s": "30대 매출액",
+    "sales_by_age_40s": "40대 매출액",
+    "sales_by_age_50s": "50대 매출액",
+    "sales_by_age_60s_above": "60대 이상 매출액",
+}
+
+
+@dataclass
+class SchemaSnapshot:
+    """한 시점의 quarterly_sales 메타데이터"""
+    columns: List[Tuple[str, str, str]]  # (컬럼명, 타입, 설명)
+    samples: Dict[str, List[str]] = field(default_factory=dict)
+    quarter_range: Optional[Tuple[str, str]] = None
+    materialized_views: Dict[str, float] = field(default_factory=dict)  # 이름 -> 추정 행 수
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def column_names(self) -> List[str]:
+        return [name for name, _, _ in self.columns]
+
+    @property
+    def numeric_columns(self) -> List[str]:
+        return [name for name, data_type, _ in self.columns if data_type in NUMERIC_TYPES]
+
+    def to_prompt(self) -> str:
+        """LLM 프롬프트에 넣을 스키마 설명 문자열을 만듭니다."""
+        schema_str = f"Table: {TABLE_NAME}\nColumns:\n"
+        for col_name, data_type, comment in self.columns:
+            schema_str += f"- {col_name}: {data_type}"
+            schema_str += f" ({comment})\n" if comment else "\n"
+
+        if self.samples:
+            schema_str += "Sample values:\n"
+            for col_name, values in self.samples.items():
+                schema_str += f"- {col_name}: {', '.join(values)}\n"
+
+        if self.quarter_range:
+            first, last = self.quarter_range
+            schema_str += f"Available year_quarter range: '{first}' ~ '{last}'\n"
+        return schema_str
+
+
+class SchemaCatalog:
+    """TTL 기반 스키마 카탈로그 캐시 (스레드 안전)"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("SCHEMA_CACHE_TTL", "3600"))
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and time.monotonic() - self._snapshot.loaded_at < self.ttl_seconds
+        )
+
+    def get(self, force_refresh: bool = False) -> SchemaSnapshot | str:
+        """캐시된 스냅샷을 반환하고, 만료되었으면 다시 로드합니다. 실패 시 에러 메시지를 반환합니다."""
+        if not force_refresh and self._is_fresh():
+            return self._snapshot
+
+        with self._lock:
+            # 다른 스레드가 먼저 로드했다면 그 결과를 그대로 사용
+            if not force_refresh and self._is_fresh():
+                return self._snapshot
+            result = self._load()
+            if isinstance(result, SchemaSnapshot):
+                self._snapshot = result
+            return result
+
+    def get_prompt(self) -> str:
+        """프롬프트용 스키마 문자열을 반환합니다."""
+        snapshot = self.get()
+        if isinstance(snapshot, str):
+            return snapshot
+        return snapshot.to_prompt()
+
+    def preload(self) -> None:
+        """에이전트 생성 시점에 카탈로그를 미리 채워 첫 질문의 지연을 없앱니다."""
+        result = self.get(force_refresh=True)
+        if isinstance(result, str):
+            logger.warning("-> 스키마 카탈로그 사전 로드 실패: %s", result)
+        else:
+            logger.info("-> 스키마 카탈로그 로드 완료: %s개 컬럼", len(result.columns))
+
+    def invalidate(self) -> None:
+        """데이터 적재·스키마 변경 후 호출하여 다음 요청에서 다시 로드하게 합니다."""
+        with self._lock:
+            self._snapshot = None
+
+    def _load(self) -> SchemaSnapshot | str:
+        from db_pool import sql_backend
+        if sql_backend() == "duckdb":
+            from duckdb_backend import duckdb_backend
+            return duckdb_backend.load_schema_snapshot()
+
+        db_url = os.environ.get('DATABASE_URL')
+        if not db_url:
+            return "DATABASE_URL 환경변수가 설정되지 않았습니다."
+
+        try:
+            with psycopg2.connect(db_url) as conn:
+                cursor = conn.cursor()
+                # 컬럼 목록과 코멘트를 한 번에 조회
+                cursor.execute("""
+                    SELECT c.column_name, c.data_type,
+                           col_description(
+                               format('%%I.%%I', c.table_schema, c.table_name)::regclass,
+                               c.ordinal_position
+                           )
+                    FROM information_schema.columns c
+                    WHERE c.table_name = %s
+                    ORDER BY c.ordinal_position;
+                """, (TABLE_NAME,))
+                rows = cursor.fetchall()
+                if not rows:
+                    return "테이블 정보를 찾을 수 없습니다."
+
+                columns = [
+                    (name, data_type, comment or DEFAULT_COLUMN_DESCRIPTIONS.get(name, ""))
+                    for name, data_type, comment in rows
+                ]
+                column_names = {name for name, _, _ in columns}
+
+                samples = {}
+                for col_name in SAMPLE_COLUMNS:
+                    if col_name not in column_names:
+                        continue
+                    cursor.execute(
+                        pgsql.SQL(
+                            "SELECT DISTINCT {col} FROM {table} WHERE {col} IS NOT NULL ORDER BY 1 LIMIT %s"
+                        ).format(col=pgsql.Identifier(col_name), table=pgsql.Identifier(TABLE_NAME)),
+                        (SAMPLE_LIMIT,),
+                    )
+                    samples[col_name] = [str(value) for (value,) in cursor.fetchall()]
+
+                quarter_range = None
+                if "year_quarter" in column_names:
+                    cursor.execute(
+                        pgsql.SQL("SELECT MIN(year_quarter), MAX(year_quarter) FROM {table}")
+                        .format(table=pgsql.Identifier(TABLE_NAME))
+                    )
+                    first, last = cursor.fetchone()
+                    if first is not None:
+                        quarter_range = (str(first), str(last))
+
+                # 롤업 라우팅에서 사용할 물리화 뷰 목록과 추정 행 수
+                cursor.execute("""
+                    SELECT c.relname, c.reltuples
+                    FROM pg_class c
+                    JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE c.relkind = 'm' AND n.nspname = current_schema();
+                """)
+                materialized_views = {name: float(reltuples) for name, reltuples in cursor.fetchall()}
+
+                return SchemaSnapshot(
+                    columns=columns,
+                    samples=samples,
+                    quarter_range=quarter_range,
+                    materialized_views=materialized_views,
+                )
+        except Exception as e:
+            return f"스키마 조회 중 오류 발생: {e}"
+
+
+# 프로세스 전역 카탈로그 인스턴스
+schema_catalog = SchemaCatalog()
@@ -0,0 +1,136 @@
+### 생성 SQL 검증 및 비용 기반 실행 허가
+# 금지 키워드 부분 문자열 검사는 updated_at 같은 정상 컬럼을 막고, 카테시안 조인 같은 폭주 쿼리는 통과시킵니다.
+# - check_sql: SQL을 AST로 파싱해 단일 읽기 전용 SELECT만 허용하고, 바깥 LIMIT이 없으면 자동으로 추가
+# - admit_sql: 실행 직전 PostgreSQL EXPLAIN의 추정 비용 / 행 수가 예산(SQL_MAX_COST, SQL_MAX_PLAN_ROWS)을 넘으면 거부
+#   (비용 초과 쿼리를 표본 추출 등으로 고쳐 쓰면 결과가 조용히 틀리므로 재작성하지 않고, 조건을 좁히라는 메시지로 거부)
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from db_pool import query_pool, sql_backend
+
+
+### 1. AST 구조 검증
+
+# 데이터 / 스키마를 바꾸거나 잠금을 잡는 구문
+_WRITE_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge, exp.Create, exp.Drop, exp.Alter,
+    exp.TruncateTable, exp.Command, exp.Into, exp.Lock, exp.Set, exp.Transaction,
+)
+
+# 읽기 전용 트랜잭션에서도 부작용이 있거나 서버 자원을 오래 점유하는 함수 (접두사 일치)
+_FORBIDDEN_FUNCTIONS = (
+    "pg_sleep", "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_read_file",
+    "pg_read_binary_file", "pg_ls_dir", "pg_stat_file", "pg_advisory", "pg_try_advisory",
+    "lo_import", "lo_export", "dblink", "set_config", "nextval", "setval", "query_to_xml",
+)
+
+# DuckDB 백엔드에서 로컬 파일 / 다른 DB / 설정을 읽는 테이블 함수 (접두사·접미사 일치, 정확히 일치)
+_DUCKDB_FORBIDDEN_PREFIXES = ("read_", "parquet_", "glob", "duckdb_", "sniff_csv", "iceberg_", "delta_scan")
+_DUCKDB_FORBIDDEN_SUFFIXES = ("_scan", "_attach")
+_DUCKDB_FORBIDDEN_NAMES = {"query", "query_table", "getenv", "which_secret"}
+
+
+def _function_name(node: exp.Func) -> str:
+    if isinstance(node, exp.Anonymous):
+        return str(node.name).lower()
+    return node.sql_name().lower()
+
+
+def _forbidden_for_backend(name: str, backend: str) -> bool:
+    if name.startswith(_FORBIDDEN_FUNCTIONS):
+        return True
+    if backend == "duckdb":
+        return (
+            name.startswith(_DUCKDB_FORBIDDEN_PREFIXES) or name.endswith(_DUCKDB_FORBIDDEN_SUFFIXES)
+            or name in _DUCKDB_FORBIDDEN_NAMES
+        )
+    return False
+
+
+def _is_file_table(table: exp.Table) -> bool:
+    """FROM '/etc/passwd' 같은 DuckDB 파일 경로 테이블(replacement scan) 또는 함수가 아닌 식을 테이블로 쓴 경우"""
+    if isinstance(table.this, exp.Identifier):
+        return any(ch in table.name for ch in "/\\.:*")
+    return not isinstance(table.this, exp.Func)
+
+
+def check_sql(sql: str, default_limit: Optional[int] = None) -> Tuple[str, str]:
+    """SQL 구조를 검증합니다. (실행할 SQL, 에러 메시지) 를 반환하며, 통과하면 에러 메시지는 빈 문자열입니다."""
+    # 프롬프트의 "기본 LIMIT 5"는 보여줄 행 수에 대한 LLM 지침이고, 여기 LIMIT은 LIMIT 없이 만든 시계열·전체 목록 같은
+    # 정상 쿼리를 자르지 않으면서 폭주만 막는 안전 상한이라 값이 다름 (결과 전달은 SQL_MAX_ROWS가 따로 제한)
+    if default_limit is None:
+        default_limit = int(os.environ.get("SQL_DEFAULT_LIMIT", "10000"))
+
+    try:
+        statements = [statement for statement in sqlglot.parse(sql, read="postgres") if statement is not None]
+    except sqlglot.errors.ParseError as e:
+        return sql, f"SQL 구문 오류: {str(e).splitlines()[0]}"
+
+    if len(statements) != 1:
+        return sql, f"보안 경고: 한 번에 하나의 SELECT 문만 실행할 수 있습니다. (문장 {len(statements)}개)"
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        return sql, f"보안 경고: SELECT 조회만 허용됩니다. ({tree.key.upper()})"
+
+    backend = sql_backend()
+    for node in tree.walk():
+        if isinstance(node, _WRITE_NODES):
+            return sql, f"보안 경고: 허용되지 않는 구문({node.key.upper()})이 포함되어 있습니다."
+        if isinstance(node, exp.Func):
+            name = _function_name(node)
+            if _forbidden_for_backend(name, backend):
+                return sql, f"보안 경고: 허용되지 않는 함수({name})가 포함되어 있습니다."
+        if backend == "duckdb" and isinstance(node, exp.Table) and _is_file_table(node):
+            return sql, f"보안 경고: 파일 경로는 테이블로 조회할 수 없습니다. ({node.sql(dialect='postgres')})"
+
+    # 바깥 LIMIT이 없으면 추가하여 서버가 필요한 행까지만 계산하게 함 (원문 형식은 가능한 한 유지)
+    if default_limit > 0 and tree.args.get("limit") is None and tree.args.get("fetch") is None:
+        return tree.limit(default_limit).sql(dialect="postgres"), ""
+    return sql, ""
+
+
+### 2. EXPLAIN 기반 비용 검사
+
+def _walk_plan(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _walk_plan(child)
+
+
+def evaluate_plan(plan: Dict[str, Any], max_cost: Optional[float] = None, max_rows: Optional[float] = None) -> str:
+    """EXPLAIN (FORMAT JSON)의 최상위 Plan을 예산과 비교합니다. 초과하면 에러 메시지를, 아니면 빈 문자열을 반환합니다."""
+    if max_cost is None:
+        max_cost = float(os.environ.get("SQL_MAX_COST", "5000000"))
+    if max_rows is None:
+        max_rows = float(os.environ.get("SQL_MAX_PLAN_ROWS", "10000000"))
+
+    total_cost = plan.get("Total Cost", 0)
+    if max_cost > 0 and total_cost > max_cost:
+        return (
+            f"비용 제한: 예상 실행 비용({total_cost:,.0f})이 허용 한도({max_cost:,.0f})를 넘습니다. "
+            "기간이나 조건을 좁혀 다시 질문해 주세요."
+        )
+    if max_rows > 0:
+        # 중간 단계(조인 등)에서 행이 폭증하는 경우도 차단 (예: 조인 조건이 빠진 카테시안 곱)
+        widest = max(_walk_plan(plan), key=lambda node: node.get("Plan Rows", 0))
+        if widest.get("Plan Rows", 0) > max_rows:
+            return (
+                f"비용 제한: {widest.get('Node Type', '실행')} 단계의 예상 행 수({widest['Plan Rows']:,.0f})가 "
+                f"허용 한도({max_rows:,.0f})를 넘습니다. 조인 조건을 확인하거나 조건을 좁혀 주세요."
+            )
+    return ""
+
+
+async def admit_sql(sql: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """PostgreSQL 백엔드에서 EXPLAIN으로 추정 비용을 확인합니다. 실행을 허가하면 빈 문자열, 아니면 에러 메시지를 반환합니다."""
+    # DuckDB 백엔드는 프로세스 안의 로컬 스냅샷이라 다른 사용자와 DB를 공유하지 않으므로 생략
+    if sql_backend() != "postgres" or os.environ.get("SQL_COST_CHECK", "1") == "0":
+        return ""
+    plan = await query_pool.explain(sql, params)
+    if isinstance(plan, str):
+        return plan
+    return evaluate_plan(plan)
+
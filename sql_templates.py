@@ -0,0 +1,190 @@
+### 자주 나오는 질문 유형의 템플릿 SQL (LLM 호출 생략)
+# "<분기> <지표> 상위 N개 상권 [상권구분 / 업종 조건]" 과 "<분기> 대비 <분기> <지표> 증가 상위 N개" 두 유형을
+# 결정적으로 해석해 매개변수화된 SQL을 바로 만듭니다.
+# - 분기·상권구분·업종 값은 SQL에 넣지 않고 %(name)s 자리표시자와 바인드 값(binds)으로 분리해 드라이버가 바인딩
+#   (지표 컬럼과 LIMIT은 바인딩할 수 없으므로 고정 목록 / 정수 범위로 검증한 값만 SQL에 넣음)
+# 질문의 모든 어절을 해석할 수 있을 때만 적용하고, 모르는 표현이 하나라도 남으면 None을 반환해 LLM 생성으로 넘깁니다.
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+
+from schema_catalog import schema_catalog, SchemaSnapshot, TABLE_NAME
+
+# 지표 표현 → 컬럼 (하나의 질문에 서로 다른 지표가 둘 이상 나오면 템플릿을 적용하지 않음)
+METRIC_PATTERNS: Tuple[Tuple[str, str], ...] = (
+    (r"10\s*대", "sales_by_age_10s"),
+    (r"20\s*대", "sales_by_age_20s"),
+    (r"30\s*대", "sales_by_age_30s"),
+    (r"40\s*대", "sales_by_age_40s"),
+    (r"50\s*대", "sales_by_age_50s"),
+    (r"60\s*대\s*(?:이상)?", "sales_by_age_60s_above"),
+    (r"주말", "weekend_sales_amount"),
+    (r"주중|평일", "weekday_sales_amount"),
+    (r"점심\s*(?:시간)?(?:대)?", "sales_time_11_14"),
+    (r"저녁\s*(?:시간)?(?:대)?", "sales_time_17_21"),
+    (r"여성|여자", "female_sales_amount"),
+    (r"남성|남자", "male_sales_amount"),
+    (r"매출\s*건수|결제\s*건수|건수", "monthly_sales_count"),
+)
+DEFAULT_METRIC = "monthly_sales_amount"
+
+# 카탈로그 샘플이 없을 때 사용하는 상권구분 값
+DEFAULT_DISTRICT_TYPES = ("골목상권", "발달상권", "전통시장", "관광특구")
+
+_QUARTER = re.compile(r"(\d{4})\s*년\s*([1-4])\s*분기")
+_TOP_N = re.compile(r"(?:상위|top)\s*(\d{1,3})\s*(?:개|곳|위)?|(\d{1,3})\s*(?:개|곳)|(\d{1,3})\s*위", re.IGNORECASE)
+_COMPARE = re.compile(r"대비|보다|(?:에\s*)?비해")
+_INCREASE = re.compile(r"늘어난|늘어|증가(?:한|량|폭)?|성장(?:한)?|상승(?:한)?|오른")
+_DECREASE = re.compile(r"줄어든|줄어|감소(?:한|량|폭)?|하락(?:한)?|떨어진")
+
+# 해석 후 남아도 되는 어절 (조사·어미는 따로 떼고 비교)
+FILLER_WORDS = {
+    "", "매출", "매출액", "상권", "가장", "많이", "높은", "많은", "큰", "순위", "순", "기준", "전체",
+    "보여줘", "보여주세요", "알려줘", "알려주세요", "어디", "어디야", "어디인가요", "뭐야", "무엇인가요",
+    "는", "조회", "목록", "리스트", "top",
+}
+_PARTICLE = re.compile(r"(?:은|는|이|가|을|를|의|에서|중|도|야|요|이야|인가요|에서의)?[?!.,~]*$")
+
+
+@dataclass
+class TemplateMatch:
+    """템플릿으로 해석한 질문과 생성된 SQL (sql의 %(name)s 자리표시자 값은 binds)"""
+    name: str
+    sql: str
+    params: Dict[str, object] = field(default_factory=dict)
+    binds: Dict[str, str] = field(default_factory=dict)
+
+
+def inline_binds(sql: str, binds: Optional[Dict[str, Any]]) -> str:
+    """%(name)s 자리표시자를 바인드 값의 SQL 리터럴로 바꾼 SQL (보고서 표시 / 캐시 키 / 조건 값 비교용, 실행에는 쓰지 않음)"""
+    if not binds:
+        return sql
+    try:
+        tree = sqlglot.parse_one(sql, read="postgres")
+    except sqlglot.errors.ParseError:
+        return sql
+
+    def replace(node: exp.Expression) -> exp.Expression:
+        if isinstance(node, exp.Placeholder) and node.name in binds:
+            value = binds[node.name]
+            return exp.Literal.number(value) if isinstance(value, (int, float)) else exp.Literal.string(str(value))
+        return node
+
+    inlined = tree.transform(replace).sql(dialect="postgres")
+    return inlined + ";" if sql.rstrip().endswith(";") else inlined
+
+
+def _filter_values(snapshot: Optional[SchemaSnapshot], column: str, default: Tuple[str, ...] = ()) -> List[str]:
+    values = list(snapshot.samples.get(column, [])) if snapshot else []
+    values = values or list(default)
+    # 긴 값부터 찾아야 '커피-음료'보다 짧은 값이 먼저 잘려 나가지 않음
+    return sorted({value for value in values if value}, key=len, reverse=True)
+
+
+def _take(pattern: str, text: str) -> Tuple[List[re.Match], str]:
+    matches = list(re.finditer(pattern, text, re.IGNORECASE))
+    return matches, re.sub(pattern, " ", text, flags=re.IGNORECASE)
+
+
+def _is_filler(word: str) -> bool:
+    word = word.lower()
+    return word in FILLER_WORDS or _PARTICLE.sub("", word) in FILLER_WORDS
+
+
+def _baseline_quarter(text: str, quarter_matches: List[re.Match]) -> Optional[int]:
+    """비교 기준 분기의 위치: 비교 표현("대비", "보다", "에 비해") 바로 앞에 나온 분기가 기준입니다.
+    비교 표현이 없거나 둘 이상이거나, 앞에 분기가 없으면 None"""
+    compares = list(_COMPARE.finditer(text))
+    if len(compares) != 1:
+        return None
+    before = [i for i, m in enumerate(quarter_matches) if m.end() <= compares[0].start()]
+    return before[-1] if before else None
+
+
+def match_template(question: str) -> Optional[TemplateMatch]:
+    """질문이 지원하는 유형이면 TemplateMatch를, 확신할 수 없으면 None을 반환합니다."""
+    text = unicodedata.normalize("NFKC", question)
+
+    quarter_matches = list(_QUARTER.finditer(text))
+    quarters = [f"{m.group(1)}{m.group(2)}" for m in quarter_matches]
+    if not quarters or len(quarters) > 2:
+        return None
+    baseline = _baseline_quarter(text, quarter_matches)
+    text = _QUARTER.sub(" ", text)
+
+    limits = {int(next(group for group in m.groups() if group)) for m in _TOP_N.finditer(text)}
+    text = _TOP_N.sub(" ", text)
+    if len(limits) > 1:
+        return None
+    limit = limits.pop() if limits else 5
+    if not 1 <= limit <= 100:
+        return None
+
+    metrics = set()
+    for pattern, column in METRIC_PATTERNS:
+        matches, text = _take(pattern, text)
+        if matches:
+            metrics.add(column)
+    if len(metrics) > 1:
+        return None
+    metric = metrics.pop() if metrics else DEFAULT_METRIC
+
+    snapshot = schema_catalog.get()
+    snapshot = snapshot if isinstance(snapshot, SchemaSnapshot) else None
+    filters: Dict[str, str] = {}
+    for column, default in (("district_type", DEFAULT_DISTRICT_TYPES), ("service_category_name", ())):
+        found = []
+        for value in _filter_values(snapshot, column, default):
+            if value in text:
+                found.append(value)
+                text = text.replace(value, " ")
+        if len(found) > 1:
+            return None
+        if found:
+            filters[column] = found[0]
+
+    compare, text = _take(_COMPARE.pattern, text)
+    increase, text = _take(_INCREASE.pattern, text)
+    decrease, text = _take(_DECREASE.pattern, text)
+
+    # 해석하지 못한 어절이 남아 있으면 (예: 모르는 업종명, 비율·평균 같은 다른 계산) LLM으로 넘김
+    if not all(_is_filler(word) for word in text.split()):
+        return None
+
+    filter_sql = "".join(f" AND {column} = %({column})s" for column in filters)
+    params: Dict[str, object] = {"quarters": quarters, "metric": metric, "limit": limit, **filters}
+
+    if len(quarters) == 1:
+        if compare or increase or decrease:
+            return None
+        sql = (
+            f"SELECT district_name, SUM({metric}) AS total_sales FROM {TABLE_NAME} "
+            f"WHERE year_quarter = %(quarter)s{filter_sql} GROUP BY district_name "
+            f"ORDER BY total_sales DESC LIMIT {limit};"
+        )
+        binds = {"quarter": quarters[0], **filters}
+        return TemplateMatch(name="top_districts", sql=sql, params=params, binds=binds)
+
+    # 두 분기 비교: 비교 표현과 증가 / 감소 방향이 분명할 때만
+    if not compare or bool(increase) == bool(decrease) or baseline is None or quarters[0] == quarters[1]:
+        return None
+    # "A 대비 B" / "B에 비해 A" / "A가 B보다": 비교 표현 바로 앞의 분기가 기준(이전) 분기
+    prev, curr = quarters[baseline], quarters[1 - baseline]
+    params["quarters"] = [prev, curr]
+    order = "DESC" if increase else "ASC"
+    sql = (
+        f"WITH q1 AS (SELECT district_name, SUM({metric}) AS sales_prev FROM {TABLE_NAME} "
+        f"WHERE year_quarter = %(prev_quarter)s{filter_sql} GROUP BY district_name), "
+        f"q2 AS (SELECT district_name, SUM({metric}) AS sales_curr FROM {TABLE_NAME} "
+        f"WHERE year_quarter = %(curr_quarter)s{filter_sql} GROUP BY district_name) "
+        "SELECT q2.district_name, (q2.sales_curr - q1.sales_prev) AS sales_increase "
+        "FROM q2 JOIN q1 ON q2.district_name = q1.district_name "
+        f"ORDER BY sales_increase {order} LIMIT {limit};"
+    )
+    params["direction"] = "increase" if increase else "decrease"
+    binds = {"prev_quarter": prev, "curr_quarter": curr, **filters}
+    return TemplateMatch(name="quarter_growth", sql=sql, params=params, binds=binds)
@@ -0,0 +1,297 @@
+### 구조화된 계측 (노드 / LLM / DB / 캐시)
+# 노드마다 print 배너를 찍는 대신, 실행 구간(span)을 측정해
+# - Prometheus 텍스트 형식 메트릭 (METRICS_PORT 설정 시 /metrics HTTP 엔드포인트)
+# - 선택적 JSON-lines span 로그 (TRACE_SPANS_PATH 설정 시)
+# 으로 내보냅니다. span에는 thread_id가 붙지만, 메트릭 라벨에는 카디널리티 문제로 넣지 않습니다.
+import contextvars
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+# 현재 실행 중인 대화 스레드 / 노드 (같은 태스크 안의 하위 span에 자동으로 붙음)
+current_thread_id: contextvars.ContextVar[str] = contextvars.ContextVar("current_thread_id", default="")
+current_node: contextvars.ContextVar[str] = contextvars.ContextVar("current_node", default="")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "agent_node_duration_seconds": ("histogram", "LangGraph 노드 실행 시간"),
+    "agent_llm_duration_seconds": ("histogram", "LLM 호출 시간"),
+    "agent_llm_tokens_total": ("counter", "LLM 프롬프트/완성 토큰 수"),
+    "agent_db_duration_seconds": ("histogram", "DB 커넥션 획득/실행/페치 시간"),
+    "agent_db_rows_total": ("counter", "DB에서 가져온 행 수"),
+    "agent_cache_requests_total": ("counter", "캐시 조회 수 (hit/miss)"),
+}
+
+
+### 1. 메트릭 레지스트리
+
+class MetricsRegistry:
+    """의존성 없는 최소한의 카운터 / 히스토그램 레지스트리"""
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], list] = {}  # -> [버킷별 개수, 합계, 개수]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            entry = self._histograms.get(key)
+            if entry is None:
+                entry = self._histograms[key] = [[0] * len(DEFAULT_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> str:
+        """Prometheus 텍스트 노출 형식(0.0.4)으로 변환합니다."""
+        def fmt(labels: Tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+            pairs = list(labels) + ([extra] if extra else [])
+            if not pairs:
+                return ""
+            escaped = (f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+            return "{" + ",".join(escaped) + "}"
+
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self._counters} | {name for name, _ in self._histograms})
+            for name in names:
+                kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{fmt(labels)} {value}")
+                for (metric, labels), (buckets, total, count) in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(DEFAULT_BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{fmt(labels, ('le', str(bound)))} {bucket_count}")
+                    lines.append(f"{name}_bucket{fmt(labels, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {total}")
+                    lines.append(f"{name}_count{fmt(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+# 프로세스 전역 메트릭 레지스트리
+metrics = MetricsRegistry()
+
+
+### 2. Span 기록
+
+_span_lock = threading.Lock()
+
+
+def _export_span(record: Dict[str, Any]) -> None:
+    path = os.environ.get("TRACE_SPANS_PATH")
+    if not path:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _span_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Dict[str, Any]]:
+    """구간 실행 시간을 측정합니다. yield된 dict에 속성을 추가하면 span 로그에 함께 기록됩니다."""
+    record: Dict[str, Any] = dict(attributes)
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["duration_s"] = time.perf_counter() - start
+        _export_span({
+            "span": name,
+            "thread_id": current_thread_id.get(),
+            "node": current_node.get(),
+            "start": started_at,
+            **record,
+        })
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    metrics.inc("agent_cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def record_db(backend: str, phase: str, seconds: float) -> None:
+    metrics.observe("agent_db_duration_seconds", seconds, backend=backend, phase=phase)
+
+
+def traced_node(name: str, fn):
+    """LangGraph 노드를 감싸 thread_id / 노드명을 컨텍스트에 심고 실행 시간을 기록합니다."""
+    # functools.wraps는 __wrapped__를 남겨 LangGraph가 원래 시그니처(config 없음)를 보게 하므로 사용하지 않음
+    def enter(config: RunnableConfig):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id", "")
+        return current_thread_id.set(str(thread_id)), current_node.set(name)
+
+    def leave(tokens, record: Dict[str, Any]):
+        if "duration_s" in record:
+            metrics.observe("agent_node_duration_seconds", record["duration_s"], node=name)
+            logger.info("[Node: %s] %.1fms", name, record["duration_s"] * 1000)
+        current_thread_id.reset(tokens[0])
+        current_node.reset(tokens[1])
+
+    if inspect.iscoroutinefunction(fn):
+        async def node(state, config: RunnableConfig):
+            tokens = enter(config)
+            record: Dict[str, Any] = {}
+            try:
+                with span("node") as record:
+                    return await fn(state)
+            finally:
+                leave(tokens, record)
+    else:
+        def node(state, config: RunnableConfig):
+            tokens = enter(config)
+            record: Dict[str, Any] = {}
+            try:
+                with span("node") as record:
+                    return fn(state)
+            finally:
+                leave(tokens, record)
+
+    node.__name__ = fn.__name__
+    node.__doc__ = fn.__doc__
+    return node
+
+
+### 3. LLM 호출 계측
+
+def token_usage(response) -> Tuple[int, int]:
+    """LLMResult에서 (프롬프트 토큰, 완성 토큰) 수를 꺼냅니다. (usage_metadata 우선, 없으면 llm_output)"""
+    generation = response.generations[0][0] if response.generations and response.generations[0] else None
+    usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    if response.llm_output and response.llm_output.get("token_usage"):
+        usage = response.llm_output["token_usage"]
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return 0, 0
+
+
+class LLMTelemetryHandler(BaseCallbackHandler):
+    """채팅 모델 호출의 지연과 프롬프트/완성 토큰 수를 기록하는 콜백"""
+
+    # 가벼운 기록만 하므로 토큰 이벤트마다 스레드 풀로 넘기지 않고 이벤트 루프에서 바로 실행
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[Any, Tuple[float, float, str, str]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs) -> None:
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node") or current_node.get()
+        thread_id = str(metadata.get("thread_id") or current_thread_id.get())
+        with self._lock:
+            self._started[run_id] = (time.time(), time.perf_counter(), node, thread_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        started_at, start, node, thread_id = started
+        duration = time.perf_counter() - start
+
+        prompt_tokens, completion_tokens = token_usage(response)
+        model = response.llm_output.get("model_name", "") if response.llm_output else ""
+
+        metrics.observe("agent_llm_duration_seconds", duration, node=node)
+        metrics.inc("agent_llm_tokens_total", prompt_tokens, node=node, type="prompt")
+        metrics.inc("agent_llm_tokens_total", completion_tokens, node=node, type="completion")
+        _export_span({
+            "span": "llm",
+            "thread_id": thread_id,
+            "node": node,
+            "start": started_at,
+            "duration_s": duration,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+        })
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        with self._lock:
+            self._started.pop(run_id, None)
+
+
+llm_telemetry_handler = LLMTelemetryHandler()
+
+# 모든 실행의 콜백 매니저에 계측 핸들러를 자동으로 추가
+# (모델에 with_config(callbacks=...)로 묶으면 LangGraph가 넘겨주는 상위 콜백(토큰 스트리밍 등)을 덮어쓰므로 훅으로 등록)
+# ContextVar 기본값으로 두어 백그라운드 루프 등 다른 스레드에서도 적용됨
+_llm_telemetry_var: contextvars.ContextVar[Optional[LLMTelemetryHandler]] = contextvars.ContextVar(
+    "llm_telemetry_handler", default=llm_telemetry_handler
+)
+register_configure_hook(_llm_telemetry_var, inheritable=True)
+
+
+### 4. /metrics HTTP 엔드포인트
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 스크레이프 요청마다 접근 로그를 남기지 않음
+        pass
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: Optional[int] = None) -> Optional[ThreadingHTTPServer]:
+    """METRICS_PORT(또는 port)가 설정되어 있으면 백그라운드 스레드에서 /metrics를 제공합니다. (중복 호출 시 무시)"""
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+    if port is None:
+        port = int(os.environ.get("METRICS_PORT", "0"))
+    if not port:
+        return None
+    try:
+        _metrics_server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsRequestHandler)
+    except OSError as e:
+        # Streamlit 등 다른 프로세스가 이미 포트를 쓰고 있으면 계측만 계속
+        logger.warning("메트릭 서버를 시작하지 못했습니다 (포트 %s): %s", port, e)
+        return None
+    threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("메트릭 엔드포인트: http://0.0.0.0:%s/metrics", port)
+    return _metrics_server
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import api_server
+from api_server import Flight, ThreadLocks, issue_thread_id, verify_thread_id
+
+
+def test_thread_id_is_bound_to_the_issuing_client():
+    thread_id = issue_thread_id("client-a")
+    assert verify_thread_id("client-a", thread_id)
+    assert not verify_thread_id("client-b", thread_id)
+    assert not verify_thread_id("client-a", "api-guessed-id")
+
+
+def test_foreign_thread_id_is_rejected():
+    body = json.dumps({"question": "2024년 1분기 매출 상위 5개", "thread_id": issue_thread_id("client-a")}).encode()
+    messages = iter([{"type": "http.request", "body": body}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"headers": [(b"x-client-id", b"client-b")], "client": ("127.0.0.1", 1)}
+    asyncio.run(api_server._handle_query(scope, receive, send, streaming=False))
+    assert sent[0]["status"] == 403
+
+
+def test_same_thread_runs_one_at_a_time():
+    locks = ThreadLocks()
+    active, peak = 0, 0
+
+    async def work():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async def main():
+        await asyncio.gather(*(locks.run("thread", work) for _ in range(3)), locks.run("other", work))
+
+    asyncio.run(main())
+    assert peak == 2  # "thread" 요청은 하나씩, "other"만 동시에 실행
+    assert len(locks) == 0
+
+
+def test_coalesced_caller_gets_its_own_thread(monkeypatch):
+    states = {"origin": {"messages": ["question", "answer"]}}
+
+    class FakeAgent:
+        async def aget_state(self, config):
+            return SimpleNamespace(values=states.get(config["configurable"]["thread_id"], {}))
+
+        async def aupdate_state(self, config, values, as_node=None):
+            states[config["configurable"]["thread_id"]] = values
+
+    monkeypatch.setattr(api_server, "get_agent", lambda: FakeAgent())
+    flight = Flight("key", "origin")
+    payload = {"thread_id": "origin", "report": "..."}
+
+    own = asyncio.run(api_server._own_final(payload, flight, "client-b", coalesced=False))
+    assert own["thread_id"] == "origin"
+    joined = asyncio.run(api_server._own_final(payload, flight, "client-b", coalesced=True))
+    assert joined["thread_id"] != "origin" and verify_thread_id("client-b", joined["thread_id"])
+    assert states[joined["thread_id"]] == states["origin"]
+
+
+def test_cancelled_queued_flight_releases_its_reservation(monkeypatch):
+    monkeypatch.setattr(api_server, "admission", api_server.AdmissionControl(per_client=4, max_running=4, max_queued=0))
+    monkeypatch.setattr(api_server, "thread_locks", ThreadLocks())
+    release = asyncio.Event()
+
+    async def slow_execute(flight, question):
+        await release.wait()
+
+    monkeypatch.setattr(api_server, "_execute", slow_execute)
+
+    async def main():
+        first = api_server._start_flight(None, "thread", "첫 질문")
+        queued = api_server._start_flight(None, "thread", "두 번째 질문")
+        await asyncio.sleep(0.01)
+        assert api_server.admission.pending == 2 and api_server.admission.running == 1
+
+        # 같은 대화의 앞선 실행을 기다리던 요청의 클라이언트가 떠남
+        api_server.singleflight.leave(queued)
+        await asyncio.sleep(0.01)
+        assert api_server.admission.pending == 1
+
+        release.set()
+        await first.task
+        assert api_server.admission.pending == 0 and api_server.admission.running == 0
+
+    asyncio.run(main())
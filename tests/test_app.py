@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import streamlit as st
+import streamlit_authenticator
+from streamlit.testing.v1 import AppTest
+
+
+def test_password_hash_is_computed_once_across_sessions(monkeypatch):
+    calls = []
+    original = streamlit_authenticator.Hasher.generate
+
+    def counting_generate(self):
+        calls.append(1)
+        return original(self)
+
+    monkeypatch.setattr(streamlit_authenticator.Hasher, "generate", counting_generate)
+    st.cache_resource.clear()
+
+    # 세션 두 개에서 각각 두 번씩 rerun
+    for _ in range(2):
+        app = AppTest.from_file("../app.py", default_timeout=30)
+        app.run()
+        app.run()
+        assert not app.exception
+    assert len(calls) == 1
+
+
+def test_agent_module_import_does_not_create_the_llm_client():
+    code = "import data_analysis_langgraph as m; assert m._llm is None"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], check=True, timeout=60, cwd=root)
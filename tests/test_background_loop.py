@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+
+from background_loop import BackgroundLoop
+
+
+@pytest.fixture
+def loop():
+    background = BackgroundLoop(name="test-loop")
+    yield background
+    background.stop()
+
+
+def test_coroutines_run_on_one_long_lived_loop_thread(loop):
+    async def where():
+        return asyncio.get_running_loop(), threading.current_thread().name
+
+    first = loop.run(where(), timeout=5)
+    second = loop.run(where(), timeout=5)
+    assert first == second
+    assert first[1] == "test-loop" != threading.current_thread().name
+
+
+def test_timeout_cancels_the_coroutine(loop):
+    cancelled = threading.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(TimeoutError):
+        loop.run(slow(), timeout=0.05)
+    assert cancelled.wait(5)
+
+
+def test_iterate_streams_items_to_the_calling_thread(loop):
+    async def numbers():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield i
+
+    assert list(loop.iterate(numbers(), timeout=5)) == [0, 1, 2]
+
+
+def test_iterate_propagates_errors_and_cancels_on_early_exit(loop):
+    async def failing():
+        yield 1
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        list(loop.iterate(failing(), timeout=5))
+
+    closed = threading.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield "tick"
+                await asyncio.sleep(0.01)
+        finally:
+            closed.set()
+
+    stream = loop.iterate(endless(), timeout=5)
+    assert next(stream) == "tick"
+    stream.close()
+    assert closed.wait(5)
@@ -0,0 +1,94 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage
+
+from batch_runner import BatchQuestion, TokenRateLimiter, run_batch
+
+
+class FakeAgent:
+    """질문별로 정해진 횟수만큼 실패한 뒤 답하는 가짜 그래프"""
+
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+        self._last = {}
+
+    async def astream(self, inputs, config, stream_mode):
+        question = inputs["messages"][0].content
+        self.calls.append(question)
+        if self.failures.get(question, 0) > 0:
+            self.failures[question] -= 1
+            raise RuntimeError("rate limited")
+        self._last[config["configurable"]["thread_id"]] = question
+        yield {"generate_report": {}}
+
+    async def aget_state(self, config):
+        question = self._last[config["configurable"]["thread_id"]]
+        return SimpleNamespace(values={"messages": [AIMessage(content=f"{question} 보고서")], "sql_query": "SELECT 1"})
+
+
+def _read(path):
+    """결과 파일의 레코드 (중단으로 잘린 줄은 건너뜀)"""
+    records = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return records
+
+
+def test_resume_skips_completed_questions(tmp_path):
+    output = tmp_path / "results.jsonl"
+    # 이전 실행: q1 성공, q2 실패, q3는 기록 도중 중단되어 마지막 줄이 잘림
+    output.write_text(
+        json.dumps({"id": "q1", "status": "ok"}) + "\n" + json.dumps({"id": "q2", "status": "error"}) + "\n{\"id\": \"q3\", \"sta",
+        encoding="utf-8",
+    )
+    questions = [BatchQuestion(id=f"q{i}", question=f"질문{i}") for i in range(1, 4)]
+    agent = FakeAgent()
+
+    summary = asyncio.run(run_batch(agent, questions, str(output), concurrency=2, retries=0))
+    assert summary == {"ok": 2, "error": 0, "skipped": 1}
+    assert sorted(agent.calls) == ["질문2", "질문3"]
+    new_records = [record for record in _read(output) if record.get("report")]
+    assert sorted(record["id"] for record in new_records) == ["q2", "q3"]
+
+
+
+def test_failed_question_is_retried_with_backoff(tmp_path):
+    output = tmp_path / "results.jsonl"
+    agent = FakeAgent(failures={"질문": 2})
+    summary = asyncio.run(
+        run_batch(agent, [BatchQuestion(id="q", question="질문")], str(output), retries=3, backoff_seconds=0.001)
+    )
+    assert summary["ok"] == 1
+    (record,) = _read(output)
+    assert record["attempts"] == 3 and record["sql"] == "SELECT 1"
+
+
+def test_exhausted_retries_are_recorded_as_errors(tmp_path):
+    output = tmp_path / "results.jsonl"
+    agent = FakeAgent(failures={"질문": 5})
+    summary = asyncio.run(
+        run_batch(agent, [BatchQuestion(id="q", question="질문")], str(output), retries=1, backoff_seconds=0.001)
+    )
+    assert summary["error"] == 1
+    (record,) = _read(output)
+    assert record["status"] == "error" and record["attempts"] == 2 and "rate limited" in record["error"]
+
+
+def test_request_limit_blocks_until_the_window_frees():
+    limiter = TokenRateLimiter(requests_per_minute=2)
+    assert limiter.acquire(blocking=False) and limiter.acquire(blocking=False)
+    assert not limiter.acquire(blocking=False)
+
+
+def test_token_limit_uses_recorded_usage():
+    limiter = TokenRateLimiter(tokens_per_minute=1000, initial_tokens_per_request=100)
+    assert limiter.acquire(blocking=False)
+    # 실제로는 900 토큰을 썼으므로 다음 예약(평균 갱신 후)은 한도를 넘음
+    limiter.record_usage(900)
+    assert not limiter.acquire(blocking=False)
@@ -0,0 +1,13 @@
+import os
+
+from benchmark import folder_path, load_questions, seeded_quarters, unseeded_quarters
+
+
+def test_default_corpus_stays_within_seeded_quarters():
+    questions = load_questions(os.path.join(folder_path, "benchmark_questions.jsonl"))
+    assert unseeded_quarters(questions, seeded_quarters(9)) == []
+
+
+def test_questions_outside_seeded_quarters_are_reported():
+    question = "2024년 1분기 대비 2025년 1분기 매출 증가 상위 3개"
+    assert unseeded_quarters([question], seeded_quarters(8)) == [question]
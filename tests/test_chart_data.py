@@ -0,0 +1,36 @@
+from psycopg.postgres import types as pg_types
+
+from chart_data import prepare_chart
+from db_pool import NumericToNumberLoader
+
+
+def test_numeric_loader_returns_native_numbers():
+    loader = NumericToNumberLoader(pg_types["numeric"].oid)
+    assert loader.load(b"1234567890123") == 1234567890123 and isinstance(loader.load(b"12"), int)
+    assert loader.load(b"-3") == -3
+    assert loader.load(b"12.5") == 12.5 and isinstance(loader.load(b"12.5"), float)
+
+
+def test_chart_frame_uses_numeric_dtypes_without_conversion():
+    rows = [{"district_name": f"상권{i}", "year_quarter": "20241", "total_sales": 1000 - i} for i in range(3)]
+    chart = prepare_chart(rows)
+    assert str(chart.frame["total_sales"].dtype) == "int64"
+    assert chart.x_col == "district_name" and chart.y_cols == ["total_sales"]
+    assert chart.chart_frame.index.tolist() == ["상권0", "상권1", "상권2"]
+
+
+def test_large_unsorted_results_are_downsampled_to_top_k():
+    rows = [{"district_name": f"상권{i}", "total_sales": (i * 7) % 20} for i in range(20)]
+    chart = prepare_chart(rows, top_k=5)
+    assert chart.downsampled
+    assert chart.chart_frame["total_sales"].tolist() == [19, 18, 17, 16, 15]
+
+
+def test_duplicate_labels_are_summed():
+    rows = [
+        {"district_name": "강남역", "service_category_name": "한식음식점", "total_sales": 10},
+        {"district_name": "강남역", "service_category_name": "커피-음료", "total_sales": 5},
+        {"district_name": "성수동", "service_category_name": "한식음식점", "total_sales": 7},
+    ]
+    chart = prepare_chart(rows)
+    assert chart.chart_frame["total_sales"].to_dict() == {"강남역": 15, "성수동": 7}
@@ -0,0 +1,49 @@
+from typing import Annotated, List
+import operator
+
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from checkpointing import BoundedCheckpointer
+
+
+class _State(TypedDict):
+    items: Annotated[List[str], operator.add]
+
+
+def _run_thread(checkpointer, thread_id, turns):
+    builder = StateGraph(_State)
+    builder.add_node("answer", lambda state: {"items": ["답변 " * 50]})
+    builder.add_edge(START, "answer")
+    builder.add_edge("answer", END)
+    graph = builder.compile(checkpointer=checkpointer)
+    for turn in range(turns):
+        graph.invoke({"items": [f"질문 {turn}"]}, {"configurable": {"thread_id": thread_id}})
+
+
+def test_restart_seeds_stored_thread_sizes():
+    inner = MemorySaver()
+    before = BoundedCheckpointer(inner, idle_ttl_seconds=3600, max_bytes=1 << 30)
+    _run_thread(before, "a", 3)
+    _run_thread(before, "b", 1)
+
+    after = BoundedCheckpointer(inner, idle_ttl_seconds=3600, max_bytes=1 << 30)
+    assert after.stats()["threads"] == 2
+    # 역직렬화된 값으로 다시 추정하므로 리스트 여유 용량 등의 차이는 있지만 같은 크기 수준이어야 함
+    assert before.stats()["bytes"] / 2 < after.stats()["bytes"] <= before.stats()["bytes"]
+    assert after._threads["a"][1] > after._threads["b"][1]
+
+
+def test_seeded_sizes_count_toward_the_byte_budget():
+    inner = MemorySaver()
+    _run_thread(BoundedCheckpointer(inner, idle_ttl_seconds=3600, max_bytes=1 << 30), "old", 3)
+
+    alone = BoundedCheckpointer(MemorySaver(), idle_ttl_seconds=3600, max_bytes=1 << 30)
+    _run_thread(alone, "new", 1)
+
+    # 새 스레드만으로는 한도 안이지만 저장돼 있던 스레드까지 더하면 넘으므로 가장 오래된 스레드가 제거되어야 함
+    restarted = BoundedCheckpointer(inner, idle_ttl_seconds=3600, max_bytes=2 * alone.stats()["bytes"])
+    _run_thread(restarted, "new", 1)
+    assert "old" not in restarted._threads
+    assert restarted.get_tuple({"configurable": {"thread_id": "old"}}) is None
@@ -0,0 +1,55 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+import prompt_builder
+from checkpointing import conversation_context, trim_history
+
+
+def test_trimmed_questions_reach_the_sql_prompt(monkeypatch):
+    monkeypatch.setenv("MESSAGE_WINDOW", "2")
+    monkeypatch.setenv("FEWSHOT_TOKEN_BUDGET", "0")
+    monkeypatch.setattr(prompt_builder.schema_catalog, "get_prompt", lambda: "Table: quarterly_sales")
+    messages = [
+        HumanMessage(content="2024년 1분기 매출 상위 5개 상권", id="1"), AIMessage(content="보고서", id="2"),
+        HumanMessage(content="그중 여성 매출은?", id="3"),
+    ]
+    _, summary = trim_history(messages, "")
+    assert "2024년 1분기 매출 상위 5개 상권" in summary
+
+    context = conversation_context(messages[2:], summary)
+    prompt = prompt_builder.build_sql_prompt(messages[-1].content, context)
+    assert "2024년 1분기 매출 상위 5개 상권" in prompt[-1].content
+    assert prompt[-1].content.endswith("그중 여성 매출은?")
+
+
+def test_context_excludes_current_question():
+    messages = [HumanMessage(content="첫 질문"), AIMessage(content="답"), HumanMessage(content="현재 질문")]
+    assert conversation_context(messages, "") == "- 이전 질문: 첫 질문"
+
+
+def test_context_dependent_sql_is_not_memoized(monkeypatch):
+    import asyncio
+
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    import data_analysis_langgraph as graph
+    from query_memo import QueryMemo
+
+    memo = QueryMemo(path=":memory:")
+    memo.enabled = True
+    monkeypatch.setattr(graph, "query_memo", memo)
+    monkeypatch.setenv("SQL_TEMPLATES_ENABLED", "0")
+    monkeypatch.setattr(graph, "build_sql_prompt", lambda question, context: question)
+    sql = "SELECT SUM(monthly_sales_amount) AS total_sales FROM quarterly_sales WHERE district_name = '강남구';"
+    monkeypatch.setattr(graph, "_llm", FakeListChatModel(responses=[sql, "보고서"]))
+
+    messages = [
+        HumanMessage(content="2024년 1분기 서초구 매출은?", id="1"), AIMessage(content="보고서", id="2"),
+        HumanMessage(content="그럼 강남구는?", id="3"),
+    ]
+    state = graph.AnalysisState(messages=messages)
+    state = state.model_copy(update=asyncio.run(graph.sql_generation_node(state)))
+    assert state.sql_from_context
+
+    state = state.model_copy(update={"sql_result": [{"total_sales": 1}], "sql_row_count": 1})
+    asyncio.run(graph.report_generation_node(state))
+    assert memo.lookup("그럼 강남구는?") is None
@@ -0,0 +1,49 @@
+import asyncio
+import threading
+
+import db_pool
+from db_pool import QueryPool
+
+
+class _FakePool:
+    def __init__(self):
+        self.closed_on = None
+
+    async def close(self):
+        self.closed_on = asyncio.get_running_loop()
+
+
+def test_pool_of_a_running_loop_is_closed_on_that_loop():
+    old_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=old_loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        pool = QueryPool()
+        fake = _FakePool()
+        pool._pool, pool._loop = fake, old_loop
+
+        # 다른 루프에서 close()하면 이전 루프에 닫기를 예약
+        asyncio.run(pool.close())
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), old_loop).result(timeout=5)
+        assert fake.closed_on is old_loop
+        assert pool._pool is None
+    finally:
+        old_loop.call_soon_threadsafe(old_loop.stop)
+        thread.join(timeout=5)
+        old_loop.close()
+
+
+def test_cancelled_query_uses_non_blocking_cancel():
+    class FakeConnection:
+        def __init__(self):
+            self.calls = []
+
+        def cancel(self):
+            self.calls.append("cancel")
+
+        async def cancel_safe(self, timeout):
+            self.calls.append("cancel_safe")
+
+    conn = FakeConnection()
+    asyncio.run(db_pool._cancel_server_query(conn))
+    assert conn.calls == ["cancel_safe"]
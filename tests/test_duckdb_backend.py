@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+
+import duckdb
+import pytest
+
+from duckdb_backend import DuckDBBackend
+
+
+def _write_snapshot(path, rows):
+    with duckdb.connect() as conn:
+        conn.execute(
+            f"COPY (SELECT 'q' || i::VARCHAR AS district_name, i AS sales FROM range({rows}) t(i)) "
+            f"TO '{path}' (FORMAT parquet)"
+        )
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "quarterly_sales.parquet")
+    _write_snapshot(path, 50)
+    monkeypatch.setenv("DUCKDB_SNAPSHOT_PATH", path)
+    return path
+
+
+def test_truncated_result_reports_total_rows(snapshot):
+    result = asyncio.run(DuckDBBackend().fetch_bounded("SELECT * FROM quarterly_sales ORDER BY sales", max_rows=10))
+    assert len(result.rows) == 10
+    assert result.total_rows == 50 and result.truncated
+
+
+def test_exact_row_cap_is_not_truncated(snapshot):
+    result = asyncio.run(DuckDBBackend().fetch_bounded("SELECT * FROM quarterly_sales LIMIT 10", max_rows=10))
+    assert len(result.rows) == 10 and result.total_rows == 10 and not result.truncated
+
+
+def test_reload_keeps_in_flight_cursor_open(snapshot):
+    backend = DuckDBBackend()
+    old_snapshot, cursor = backend._acquire()
+    cursor.execute("SELECT COUNT(*) FROM quarterly_sales")
+
+    _write_snapshot(snapshot, 80)
+    os.utime(snapshot, (time.time() + 5, time.time() + 5))
+    new_snapshot, new_cursor = backend._acquire()
+    assert new_snapshot is not old_snapshot and old_snapshot.retired
+
+    # 교체 전에 시작한 커서는 반납 전까지 계속 사용 가능
+    assert cursor.fetchone() == (50,)
+    assert new_cursor.execute("SELECT COUNT(*) FROM quarterly_sales").fetchone() == (80,)
+    backend._release(old_snapshot, cursor)
+    backend._release(new_snapshot, new_cursor)
+    with pytest.raises(duckdb.Error):
+        old_snapshot.conn.execute("SELECT 1")
+
+
+def test_local_files_outside_the_snapshot_are_not_readable(snapshot, tmp_path):
+    secret = tmp_path / ".env"
+    secret.write_text("OPENAI_API_KEY=secret\n")
+    backend = DuckDBBackend()
+    for sql in (f"SELECT content FROM read_text('{secret}')", f"SELECT * FROM read_csv('{secret}')"):
+        result = asyncio.run(backend.fetch_bounded(sql))
+        assert isinstance(result, str) and "SQL 실행 오류" in result
+    assert asyncio.run(backend.fetch_bounded("SELECT COUNT(*) AS n FROM quarterly_sales")).rows == [{"n": 50}]
+
+
+def test_bind_parameters_are_passed_to_duckdb(snapshot):
+    sql = "SELECT district_name FROM quarterly_sales WHERE district_name = %(name)s OR sales >= %(min_sales)s ORDER BY sales"
+    result = asyncio.run(DuckDBBackend().fetch_bounded(sql, {"name": "q1", "min_sales": 45}, max_rows=3))
+    assert [row["district_name"] for row in result.rows] == ["q1", "q45", "q46"]
+    assert result.total_rows == 6 and result.truncated
@@ -0,0 +1,86 @@
+import csv
+import json
+import os
+import uuid
+
+import psycopg2
+import pytest
+
+import ingest
+from ingest import KEY_COLUMNS, TABLE_COLUMNS, load_file, map_headers
+
+# 적재는 PostgreSQL의 COPY / ON CONFLICT에 의존하므로 테스트용 DB가 있을 때만 실행
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+requires_postgres = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL이 설정되지 않음")
+
+
+def _write_csv(path, rows):
+    # 열린데이터광장 CSV와 같은 한글 헤더
+    headers = [ingest.SOURCE_ALIASES[col][0] for col in TABLE_COLUMNS]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow([row.get(col, "") for col in TABLE_COLUMNS])
+
+
+def _row(district_code, amount, quarter="20241"):
+    return {
+        "year_quarter": quarter, "district_type": "골목상권", "district_code": district_code,
+        "district_name": f"상권{district_code}", "service_category_code": "CS100001",
+        "service_category_name": "한식음식점", "monthly_sales_amount": amount,
+    }
+
+
+def test_korean_and_openapi_headers_map_to_table_columns():
+    positions, missing = map_headers(["\ufeff기준_년분기_코드", "TRDAR_CD", "서비스_업종_코드", "당월_매출_금액"])
+    assert positions == {"year_quarter": 0, "district_code": 1, "service_category_code": 2, "monthly_sales_amount": 3}
+    assert not set(KEY_COLUMNS) & set(missing)
+
+
+def test_openapi_response_rows_are_found(tmp_path):
+    path = tmp_path / "rows.json"
+    rows = [{"STDR_YYQU_CD": "20241", "TRDAR_CD": "1"}]
+    path.write_text(json.dumps({"VwsmTrdarSelngQq": {"list_total_count": 1, "row": rows}}), encoding="utf-8")
+    assert ingest._json_rows(str(path)) == rows
+
+
+@pytest.fixture
+def cursor():
+    """테스트마다 빈 스키마에서 적재하고 끝나면 스키마를 지움"""
+    schema = f"test_ingest_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(TEST_DATABASE_URL)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        cursor.execute(f"SET search_path TO {schema}")
+        assert ingest.ensure_table(cursor) == ""
+        yield cursor
+    finally:
+        conn.rollback()
+        conn.cursor().execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+@requires_postgres
+def test_reloading_the_same_file_changes_nothing(cursor, tmp_path):
+    path = tmp_path / "sales.csv"
+    _write_csv(path, [_row("1", 100), _row("2", 200), _row("2", 250)])  # 파일 안 중복 키는 마지막 행
+
+    assert load_file(cursor, str(path)) == {"20241": (2, 0)}
+    assert load_file(cursor, str(path)) == {"20241": (0, 0)}
+    cursor.execute("SELECT district_code, monthly_sales_amount FROM quarterly_sales ORDER BY district_code")
+    assert cursor.fetchall() == [("1", 100), ("2", 250)]
+
+
+@requires_postgres
+def test_only_changed_rows_are_updated(cursor, tmp_path):
+    path = tmp_path / "sales.csv"
+    _write_csv(path, [_row("1", 100), _row("2", 200)])
+    load_file(cursor, str(path))
+
+    _write_csv(path, [_row("1", 100), _row("2", 300), _row("3", 50, quarter="20242")])
+    assert load_file(cursor, str(path), quarters=["20241"]) == {"20241": (0, 1)}
+    cursor.execute("SELECT COUNT(*), SUM(monthly_sales_amount) FROM quarterly_sales")
+    assert cursor.fetchone() == (2, 400)
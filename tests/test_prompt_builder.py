@@ -0,0 +1,49 @@
+import json
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import prompt_builder
+from prompt_builder import ExampleLibrary, build_sql_prompt
+
+
+def _library(tmp_path, examples):
+    path = tmp_path / "examples.jsonl"
+    path.write_text("".join(json.dumps(example, ensure_ascii=False) + "\n" for example in examples), encoding="utf-8")
+    return ExampleLibrary(str(path))
+
+
+EXAMPLES = [
+    {"question": "2024년 2분기 주말 매출 상위 5개 상권은?", "sql": "SELECT 'weekend'"},
+    {"question": "2024년 1분기 여성 매출 상위 3개 상권은?", "sql": "SELECT 'female'"},
+]
+
+
+def test_system_prefix_is_identical_across_questions(monkeypatch, tmp_path):
+    monkeypatch.setattr(prompt_builder.schema_catalog, "get_prompt", lambda: "Table: quarterly_sales")
+    monkeypatch.setattr(prompt_builder, "example_library", _library(tmp_path, EXAMPLES))
+
+    first = build_sql_prompt("2024년 2분기 주말 매출 상위 상권", "- 이전 질문: 첫 질문")
+    second = build_sql_prompt("2024년 1분기 여성 매출 상위 상권")
+
+    assert isinstance(first[0], SystemMessage) and isinstance(first[-1], HumanMessage)
+    # 질문·예시·대화 문맥이 달라도 시스템 메시지는 바이트 단위로 같아야 프롬프트 캐시가 적중
+    assert first[0].content == second[0].content
+    assert "Table: quarterly_sales" in first[0].content
+    for prompt in (first, second):
+        assert "SELECT '" not in prompt[0].content and "이전 대화" not in prompt[0].content
+
+
+def test_variable_message_puts_most_similar_example_last(monkeypatch, tmp_path):
+    monkeypatch.setattr(prompt_builder.schema_catalog, "get_prompt", lambda: "Table: quarterly_sales")
+    monkeypatch.setattr(prompt_builder, "example_library", _library(tmp_path, EXAMPLES))
+
+    content = build_sql_prompt("2024년 1분기 여성 매출 상위 3개 상권")[-1].content
+    assert content.index("SELECT 'weekend'") < content.index("SELECT 'female'")
+    assert content.endswith("### 사용자의 질문:\n2024년 1분기 여성 매출 상위 3개 상권")
+
+
+def test_examples_respect_token_budget(tmp_path):
+    library = _library(tmp_path, EXAMPLES)
+    assert library.select("2024년 1분기 여성 매출 상위 3개 상권", token_budget=0) == []
+    selected = library.select("2024년 1분기 여성 매출 상위 3개 상권", token_budget=10_000, max_examples=1)
+    assert [example["sql"] for example in selected] == ["SELECT 'female'"]
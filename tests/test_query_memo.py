@@ -0,0 +1,80 @@
+import pytest
+
+from query_memo import QueryMemo
+
+STORED = "2024년 1분기 남성 매출 상위 5개 상권은 어디인가요"
+STORED_SQL = (
+    "SELECT district_name, SUM(male_sales_amount) AS total_sales FROM quarterly_sales "
+    "WHERE year_quarter = '20241' GROUP BY district_name ORDER BY total_sales DESC LIMIT 5;"
+)
+
+
+@pytest.fixture
+def memo():
+    memo = QueryMemo(path=":memory:", similarity_threshold=0.9)
+    memo.enabled = True
+    memo.remember(STORED, STORED_SQL, "report")
+    return memo
+
+
+def test_exact_match_reuses_sql_and_report(memo):
+    hit = memo.lookup("2024년 1분기 남성 매출 상위 5개 상권은 어디인가요?")
+    assert hit is not None and hit.exact
+    assert hit.sql == STORED_SQL and hit.report == "report"
+
+
+def test_near_duplicate_with_same_keywords_reuses_sql(memo):
+    hit = memo.lookup("2024년 1분기 남성 매출 상위 5개 상권 어디인가요")
+    assert hit is not None and not hit.exact
+    assert hit.sql == STORED_SQL and hit.report == ""
+
+
+def test_different_gender_is_not_reused(memo):
+    assert memo.lookup("2024년 1분기 여성 매출 상위 5개 상권은 어디인가요") is None
+
+
+def test_different_weekday_metric_is_not_reused():
+    memo = QueryMemo(path=":memory:", similarity_threshold=0.9)
+    memo.enabled = True
+    memo.remember("2024년 1분기 주말 매출 상위 5개 상권은 어디인가요", "SELECT 1;")
+    assert memo.lookup("2024년 1분기 주중 매출 상위 5개 상권은 어디인가요") is None
+
+
+def test_different_time_slot_is_not_reused():
+    memo = QueryMemo(path=":memory:", similarity_threshold=0.9)
+    memo.enabled = True
+    memo.remember("2024년 1분기 점심시간 매출이 가장 높은 상위 5개 상권은 어디인가요", "SELECT 1;")
+    assert memo.lookup("2024년 1분기 저녁시간 매출이 가장 높은 상위 5개 상권은 어디인가요") is None
+
+
+def test_different_service_category_is_not_reused():
+    memo = QueryMemo(path=":memory:", similarity_threshold=0.9)
+    memo.enabled = True
+    memo.remember(
+        "2024년 1분기 일식음식점 매출 상위 5개 상권은 어디인가요",
+        "SELECT district_name, SUM(monthly_sales_amount) AS total_sales FROM quarterly_sales "
+        "WHERE year_quarter = '20241' AND service_category_name = '일식음식점' "
+        "GROUP BY district_name ORDER BY total_sales DESC LIMIT 5;",
+    )
+    assert memo.lookup("2024년 1분기 한식음식점 매출 상위 5개 상권은 어디인가요") is None
+
+
+def test_catalog_values_are_compared(monkeypatch):
+    import query_memo
+    from schema_catalog import SchemaSnapshot
+
+    snapshot = SchemaSnapshot(columns=[], samples={"service_category_name": ["한식음식점", "일식음식점"]})
+    monkeypatch.setattr(query_memo.schema_catalog, "get", lambda force_refresh=False: snapshot)
+    memo = QueryMemo(path=":memory:", similarity_threshold=0.9)
+    memo.enabled = True
+    memo.remember("2024년 1분기 일식음식점 매출 상위 5개 상권은 어디인가요", "SELECT 1;")
+    assert memo.lookup("2024년 1분기 한식음식점 매출 상위 5개 상권은 어디인가요") is None
+
+
+def test_bind_parameters_are_memoized_with_the_sql():
+    memo = QueryMemo(path=":memory:")
+    memo.enabled = True
+    sql = "SELECT district_name FROM quarterly_sales WHERE district_type = %(district_type)s;"
+    memo.remember("2024년 1분기 골목상권 매출 상위 5개", sql, params={"district_type": "골목상권"})
+    hit = memo.lookup("2024년 1분기 골목상권 매출 상위 5개")
+    assert hit.sql == sql and hit.params == {"district_type": "골목상권"}
@@ -0,0 +1,50 @@
+from result_cache import ResultCache, normalize_sql
+
+
+def test_whitespace_case_and_comments_share_a_key():
+    a = "SELECT district_name, SUM(x) FROM quarterly_sales -- 상위\nWHERE year_quarter = '20241';"
+    b = "select district_name,sum(x)\n  from QUARTERLY_SALES /* 조건 */ where year_quarter='20241'"
+    assert normalize_sql(a) == normalize_sql(b)
+
+
+def test_literals_and_quoted_identifiers_are_preserved():
+    assert normalize_sql("SELECT 1 WHERE a = 'Gangnam'") != normalize_sql("SELECT 1 WHERE a = 'gangnam'")
+    assert normalize_sql("SELECT \"Total\" FROM t") != normalize_sql("SELECT \"total\" FROM t")
+    assert normalize_sql("SELECT 1 WHERE a = 'x  y'") != normalize_sql("SELECT 1 WHERE a = 'x y'")
+
+
+def test_equivalent_sql_hits_the_same_entry():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.put("SELECT * FROM quarterly_sales", [{"a": 1}])
+    assert cache.get("select *\nfrom quarterly_sales;") == [{"a": 1}]
+    assert cache.stats()["hits"] == 1
+
+
+def test_invalidate_by_table_keeps_other_entries():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.put("SELECT * FROM quarterly_sales", [1])
+    cache.put("SELECT * FROM quarterly_sales_by_district", [2])
+    cache.put("SELECT * FROM other_table", [3])
+    assert cache.invalidate("quarterly_sales") == 2
+    assert cache.get("SELECT * FROM quarterly_sales") is None
+    assert cache.get("SELECT * FROM other_table") == [3]
+
+
+def test_expired_entry_is_a_miss():
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=0)
+    cache.put("SELECT 1", [1])
+    assert cache.get("SELECT 1") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_byte_budget_evicts_least_recently_used():
+    row = [{"district_name": "상권" * 20}]
+    cache = ResultCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.put("SELECT 1", row)
+    cache.max_bytes = cache.stats()["bytes"] * 2
+    cache.put("SELECT 2", row)
+    cache.get("SELECT 1")
+    cache.put("SELECT 3", row)
+    assert cache.get("SELECT 2") is None
+    assert cache.get("SELECT 1") == row and cache.get("SELECT 3") == row
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,38 @@
+import decimal
+import json
+
+from result_encoding import encode_compact, encode_result_for_prompt, estimate_tokens
+
+ROWS = [
+    {"district_name": f"상권{i}", "total_sales": 1_250_000_000 - i * 10_000_000, "sales_count": 100 + i}
+    for i in range(60)
+]
+
+
+def test_small_result_round_trips_as_json():
+    rows = [{"district_name": "강남역", "total_sales": decimal.Decimal("123"), "ratio": decimal.Decimal("0.5")}]
+    text, encoding = encode_result_for_prompt(rows, token_budget=1000)
+    assert encoding == "json"
+    assert json.loads(text) == [{"district_name": "강남역", "total_sales": 123, "ratio": 0.5}]
+
+
+def test_compact_table_keeps_every_row_and_scales_amounts():
+    text = encode_compact(ROWS[:3])
+    lines = text.splitlines()
+    assert lines[0] == "district_name | total_sales(억) | sales_count"
+    assert lines[1] == "상권0 | 12.50 | 100"
+    assert len(lines) == 4
+
+
+def test_budget_falls_back_to_head_rows_and_summary():
+    text, encoding = encode_result_for_prompt(ROWS, token_budget=400)
+    assert encoding == "compact+summary"
+    assert estimate_tokens(text) <= 400 or text.startswith("[앞 3개 행]")
+    # 통계 요약은 잘린 앞부분이 아니라 전체 행 기준
+    assert "전체 60개 행 기준" in text
+    assert "상권0=12.50" in text
+
+
+def test_forced_modes_are_respected():
+    assert encode_result_for_prompt(ROWS[:2], mode="json")[1] == "json"
+    assert encode_result_for_prompt(ROWS[:2], mode="compact")[1] == "compact"
@@ -0,0 +1,66 @@
+from langchain_core.messages import HumanMessage
+
+from data_analysis_langgraph import AnalysisState, refine_result_node
+from result_refine import match_refinement, fits_previous_result, wrap_sql
+
+TOP5_SQL = (
+    "SELECT district_name, SUM(monthly_sales_amount) AS total_sales FROM quarterly_sales "
+    "WHERE year_quarter = '20241' GROUP BY district_name ORDER BY total_sales DESC LIMIT 5"
+)
+TOP5_ROWS = [{"district_name": f"상권{i}", "total_sales": 1000 - i * 100} for i in range(5)]
+
+
+def _state(question, sql=TOP5_SQL, rows=TOP5_ROWS):
+    return AnalysisState(
+        messages=[HumanMessage(content=question)], sql_query=sql, sql_result=rows, sql_row_count=len(rows),
+    )
+
+
+def _refinement(question):
+    return match_refinement(question, ["district_name", "total_sales"], "total_sales")
+
+
+def test_top_n_within_previous_limit_is_local():
+    update = refine_result_node(_state("상위 3개만"))
+    assert not update["refine_requery"]
+    assert [row["district_name"] for row in update["sql_result"]] == ["상권0", "상권1", "상권2"]
+
+
+def test_bottom_n_after_top_n_requeries_without_previous_limit():
+    update = refine_result_node(_state("하위 3개"))
+    assert update["refine_requery"]
+    sql = update["sql_query"]
+    assert "LIMIT 5" not in sql
+    assert sql.endswith("ORDER BY total_sales ASC LIMIT 3;")
+
+
+def test_more_rows_than_previous_limit_requeries():
+    assert not fits_previous_result(_refinement("상위 10개"), TOP5_SQL, 5, False)
+
+
+def test_share_of_limited_result_requeries():
+    assert not fits_previous_result(_refinement("전체 대비 비중으로 보여줘"), TOP5_SQL, 5, False)
+
+
+def test_result_shorter_than_limit_is_complete():
+    assert fits_previous_result(_refinement("하위 3개"), TOP5_SQL, 4, False)
+
+
+def test_only_n_keeps_previous_order_when_requeried():
+    sql = wrap_sql(TOP5_SQL, _refinement("10개만"))
+    assert sql.endswith("ORDER BY total_sales DESC LIMIT 10;")
+
+
+def test_share_after_top_n_keeps_previous_limit():
+    update = refine_result_node(_state("전체 대비 비중으로 보여줘"))
+    assert update["refine_requery"]
+    sql = update["sql_query"]
+    # 비중은 LIMIT 없는 내부 결과 전체 합계 기준, 바깥에서 직전 순서·개수(상위 5개)를 다시 적용
+    assert "SUM(total_sales) OVER ()" in sql
+    assert "DESC LIMIT 5) AS prev" not in sql
+    assert sql.endswith("ORDER BY total_sales DESC LIMIT 5;")
+
+
+def test_resort_after_top_n_reorders_the_same_rows():
+    sql = wrap_sql(TOP5_SQL, _refinement("오름차순으로 정렬해줘"))
+    assert "ORDER BY total_sales DESC LIMIT 5) AS top ORDER BY total_sales ASC;" in sql
@@ -0,0 +1,55 @@
+import pytest
+
+import rollups
+from rollups import route_to_rollup
+from schema_catalog import SchemaSnapshot
+
+COLUMNS = [
+    ("year_quarter", "text", ""), ("district_type", "text", ""), ("district_code", "text", ""),
+    ("district_name", "text", ""), ("service_category_code", "text", ""), ("service_category_name", "text", ""),
+    ("monthly_sales_amount", "bigint", ""), ("weekend_sales_amount", "bigint", ""),
+]
+
+
+@pytest.fixture(autouse=True)
+def catalog(monkeypatch):
+    snapshot = SchemaSnapshot(
+        columns=COLUMNS, materialized_views={rollup.name: 0 for rollup in rollups.ROLLUPS},
+    )
+    monkeypatch.setattr(rollups.schema_catalog, "get", lambda force_refresh=False: snapshot)
+
+
+def test_group_by_query_is_routed():
+    sql, used = route_to_rollup(
+        "SELECT district_name, SUM(monthly_sales_amount) AS total FROM quarterly_sales "
+        "WHERE year_quarter = '20241' GROUP BY district_name"
+    )
+    assert used == ["quarterly_sales_by_district"]
+    assert "FROM quarterly_sales_by_district" in sql
+
+
+def test_pure_aggregate_is_routed():
+    _, used = route_to_rollup("SELECT SUM(monthly_sales_amount) FROM quarterly_sales WHERE year_quarter = '20241'")
+    assert used == ["quarterly_sales_by_district_type"]
+
+
+def test_window_aggregate_is_not_routed():
+    sql = (
+        "SELECT district_name, SUM(monthly_sales_amount) OVER () FROM quarterly_sales "
+        "WHERE year_quarter = '20241'"
+    )
+    assert route_to_rollup(sql) == (sql, [])
+
+
+def test_bare_column_without_group_by_is_not_routed():
+    sql = "SELECT district_name, MAX(year_quarter) FROM quarterly_sales"
+    assert route_to_rollup(sql) == (sql, [])
+
+
+def test_bind_placeholders_survive_routing():
+    sql, used = route_to_rollup(
+        "SELECT district_name, SUM(monthly_sales_amount) AS total FROM quarterly_sales "
+        "WHERE year_quarter = %(quarter)s AND district_type = %(district_type)s GROUP BY district_name"
+    )
+    assert used == ["quarterly_sales_by_district"]
+    assert "year_quarter = %(quarter)s AND district_type = %(district_type)s" in sql
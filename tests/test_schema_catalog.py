@@ -0,0 +1,51 @@
+import schema_catalog as catalog_module
+from schema_catalog import SchemaCatalog, SchemaSnapshot
+
+
+def _counting_catalog(monkeypatch, ttl_seconds):
+    catalog = SchemaCatalog(ttl_seconds=ttl_seconds)
+    loads = []
+
+    def load():
+        loads.append(len(loads))
+        return SchemaSnapshot(
+            columns=[("year_quarter", "text", f"load {len(loads)}")], loaded_at=catalog_module.time.monotonic(),
+        )
+
+    monkeypatch.setattr(catalog, "_load", load)
+    return catalog, loads
+
+
+def test_snapshot_is_reused_within_ttl(monkeypatch):
+    catalog, loads = _counting_catalog(monkeypatch, ttl_seconds=60)
+    first = catalog.get()
+    assert catalog.get() is first
+    assert len(loads) == 1
+
+
+def test_expired_snapshot_is_reloaded(monkeypatch):
+    catalog, loads = _counting_catalog(monkeypatch, ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(catalog_module.time, "monotonic", lambda: now[0])
+    first = catalog.get()
+
+    now[0] += 61
+    second = catalog.get()
+    assert second is not first and len(loads) == 2
+    assert "load 2" in catalog.get_prompt()
+
+
+def test_failed_reload_keeps_error_out_of_cache(monkeypatch):
+    catalog, loads = _counting_catalog(monkeypatch, ttl_seconds=60)
+    first = catalog.get()
+    monkeypatch.setattr(catalog, "_load", lambda: "DB 연결 실패")
+    assert catalog.get(force_refresh=True) == "DB 연결 실패"
+    assert catalog.get() is first
+
+
+def test_invalidate_forces_reload(monkeypatch):
+    catalog, loads = _counting_catalog(monkeypatch, ttl_seconds=60)
+    catalog.get()
+    catalog.invalidate()
+    catalog.get()
+    assert len(loads) == 2
@@ -0,0 +1,81 @@
+import pytest
+
+from sql_guard import check_sql
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT content FROM read_text('/etc/hostname')",
+    "SELECT * FROM read_csv('/etc/passwd')",
+    "SELECT * FROM parquet_metadata('/tmp/x.parquet')",
+    "SELECT * FROM sqlite_scan('/tmp/a.db', 't')",
+    "SELECT * FROM glob('/etc/*', 'x')",
+    "SELECT * FROM '/etc/passwd'",
+    "SELECT * FROM duckdb_secrets()",
+])
+def test_duckdb_file_functions_are_rejected(monkeypatch, sql):
+    monkeypatch.setenv("SQL_BACKEND", "duckdb")
+    _, error = check_sql(sql)
+    assert error.startswith("보안 경고")
+
+
+def test_duckdb_allows_the_snapshot_view(monkeypatch):
+    monkeypatch.setenv("SQL_BACKEND", "duckdb")
+    _, error = check_sql("SELECT district_name FROM quarterly_sales WHERE year_quarter LIKE '2024%'")
+    assert error == ""
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1; SELECT 2",
+    "SELECT 1; DROP TABLE quarterly_sales",
+])
+def test_multiple_statements_are_rejected(sql):
+    _, error = check_sql(sql)
+    assert error.startswith("보안 경고")
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM quarterly_sales",
+    "UPDATE quarterly_sales SET monthly_sales_amount = 0",
+    "INSERT INTO quarterly_sales (district_name) VALUES ('x')",
+    "DROP TABLE quarterly_sales",
+    "CREATE TABLE copy AS SELECT * FROM quarterly_sales",
+    "WITH gone AS (DELETE FROM quarterly_sales RETURNING *) SELECT * FROM gone",
+    "SELECT * INTO copy FROM quarterly_sales",
+    "SELECT * FROM quarterly_sales FOR UPDATE",
+])
+def test_writes_and_ddl_are_rejected(sql):
+    _, error = check_sql(sql)
+    assert error.startswith("보안 경고")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT pg_sleep(10)",
+    "SELECT pg_read_file('/etc/passwd')",
+    "SELECT set_config('statement_timeout', '0', false)",
+    "SELECT * FROM dblink('host=x', 'SELECT 1') AS t(a int)",
+])
+def test_forbidden_functions_are_rejected(monkeypatch, sql):
+    monkeypatch.setenv("SQL_BACKEND", "postgres")
+    _, error = check_sql(sql)
+    assert error.startswith("보안 경고")
+
+
+def test_keyword_inside_column_name_is_allowed():
+    _, error = check_sql("SELECT updated_at, deleted_flag FROM quarterly_sales LIMIT 5")
+    assert error == ""
+
+
+def test_missing_limit_is_injected():
+    sql, error = check_sql("SELECT district_name FROM quarterly_sales ORDER BY district_name", default_limit=100)
+    assert error == ""
+    assert sql.endswith("LIMIT 100")
+
+
+def test_existing_limit_is_kept():
+    original = "SELECT district_name FROM quarterly_sales LIMIT 5"
+    assert check_sql(original, default_limit=100) == (original, "")
+
+
+def test_limit_inside_subquery_does_not_count():
+    sql, _ = check_sql("SELECT * FROM (SELECT district_name FROM quarterly_sales LIMIT 5) AS t", default_limit=100)
+    assert sql.endswith("LIMIT 100")
@@ -0,0 +1,44 @@
+import pytest
+
+import sql_templates
+from sql_templates import inline_binds, match_template
+
+
+@pytest.fixture(autouse=True)
+def no_catalog(monkeypatch):
+    monkeypatch.setattr(sql_templates.schema_catalog, "get", lambda force_refresh=False: "offline")
+
+
+def test_top_districts():
+    match = match_template("2024년 1분기 매출 상위 5개 상권")
+    assert match.name == "top_districts"
+    assert "year_quarter = %(quarter)s" in match.sql and "LIMIT 5" in match.sql
+    assert match.binds == {"quarter": "20241"}
+
+
+def test_daebi_uses_first_quarter_as_baseline():
+    match = match_template("2024년 1분기 대비 2025년 1분기 매출이 가장 많이 늘어난 상권")
+    assert match.name == "quarter_growth"
+    sql = inline_binds(match.sql, match.binds)
+    assert "AS sales_prev FROM quarterly_sales WHERE year_quarter = '20241'" in sql
+    assert "AS sales_curr FROM quarterly_sales WHERE year_quarter = '20251'" in sql
+
+
+def test_boda_uses_quarter_before_particle_as_baseline():
+    match = match_template("2025년 1분기가 2024년 1분기보다 매출이 가장 많이 늘어난 상권")
+    assert match.name == "quarter_growth"
+    sql = inline_binds(match.sql, match.binds)
+    assert "AS sales_prev FROM quarterly_sales WHERE year_quarter = '20241'" in sql
+    assert "AS sales_curr FROM quarterly_sales WHERE year_quarter = '20251'" in sql
+    assert "ORDER BY sales_increase DESC" in match.sql
+
+
+def test_ambiguous_comparison_falls_back_to_llm():
+    assert match_template("매출 대비 2024년 1분기 2025년 1분기 많이 늘어난 상권") is None
+
+
+def test_filter_values_are_bound_not_inlined():
+    match = match_template("2024년 1분기 골목상권 매출 상위 3개 상권")
+    assert "'골목상권'" not in match.sql
+    assert "district_type = %(district_type)s" in match.sql
+    assert match.binds == {"quarter": "20241", "district_type": "골목상권"}
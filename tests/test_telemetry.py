@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import telemetry
+from telemetry import MetricsRegistry, span, traced_node
+
+
+def _spans(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.inc("agent_cache_requests_total", cache="result", result="hit")
+    registry.inc("agent_cache_requests_total", cache="result", result="hit")
+    registry.observe("agent_db_duration_seconds", 0.02, backend="postgres", phase="execute")
+    text = registry.render()
+    assert "# TYPE agent_cache_requests_total counter" in text
+    assert 'agent_cache_requests_total{cache="result",result="hit"} 2' in text
+    assert 'agent_db_duration_seconds_bucket{backend="postgres",phase="execute",le="0.01"} 0' in text
+    assert 'agent_db_duration_seconds_bucket{backend="postgres",phase="execute",le="0.025"} 1' in text
+    assert 'agent_db_duration_seconds_count{backend="postgres",phase="execute"} 1' in text
+
+
+def test_span_records_error_and_context(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setenv("TRACE_SPANS_PATH", str(path))
+
+    def failing(state):
+        with span("db.query", backend="duckdb") as record:
+            record["rows"] = 3
+            raise ValueError("boom")
+
+    node = traced_node("execute_sql", failing)
+    try:
+        node({}, {"configurable": {"thread_id": "t-1"}})
+    except ValueError:
+        pass
+
+    inner, outer = _spans(path)
+    assert inner["span"] == "db.query" and inner["thread_id"] == "t-1" and inner["node"] == "execute_sql"
+    assert inner["rows"] == 3 and inner["error"] == "ValueError: boom"
+    assert outer["span"] == "node" and outer["node"] == "execute_sql"
+    # 노드를 벗어나면 컨텍스트가 원래대로 돌아감
+    assert telemetry.current_thread_id.get() == "" and telemetry.current_node.get() == ""
+
+
+def test_llm_calls_are_measured_without_explicit_callbacks(tmp_path, monkeypatch):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setenv("TRACE_SPANS_PATH", str(path))
+    monkeypatch.setattr(telemetry, "metrics", MetricsRegistry())
+
+    async def report(state):
+        return await FakeListChatModel(responses=["보고서"]).ainvoke("질문")
+
+    asyncio.run(traced_node("generate_report", report)({}, {"configurable": {"thread_id": "t-2"}}))
+
+    llm = next(record for record in _spans(path) if record["span"] == "llm")
+    assert llm["node"] == "generate_report" and llm["thread_id"] == "t-2"
+    assert 'agent_llm_duration_seconds_count{node="generate_report"} 1' in telemetry.metrics.render()